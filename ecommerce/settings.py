@@ -12,8 +12,9 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 from dotenv import load_dotenv
-from urllib.parse import urlparse
+from ecommerce.utils.database import database_config
 
 
 load_dotenv()  # Loads .env file into environment variables
@@ -21,6 +22,12 @@ load_dotenv()  # Loads .env file into environment variables
 IMAGEKIT_PRIVATE_KEY = os.environ.get('IMAGEKIT_PRIVATE_KEY')
 IMAGEKIT_PUBLIC_KEY = os.environ.get('IMAGEKIT_PUBLIC_KEY')
 IMAGEKIT_URL_ENDPOINT = os.environ.get('IMAGEKIT_URL_ENDPOINT')
+IMAGEKIT_UPLOAD_URL = os.environ.get('IMAGEKIT_UPLOAD_URL', 'https://upload.imagekit.io/api/v1/files/upload')
+IMAGEKIT_CONNECT_TIMEOUT = float(os.environ.get('IMAGEKIT_CONNECT_TIMEOUT', 5))
+IMAGEKIT_READ_TIMEOUT = float(os.environ.get('IMAGEKIT_READ_TIMEOUT', 60))
+IMAGEKIT_POOL_SIZE = int(os.environ.get('IMAGEKIT_POOL_SIZE', 10))
+# Quality of resized images served through ImageKit URL transformations
+IMAGEKIT_IMAGE_QUALITY = int(os.environ.get('IMAGEKIT_IMAGE_QUALITY', 80))
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -47,16 +54,20 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'rest_framework',
     'store',
 ]
 
 MIDDLEWARE = [
+    'store.middleware.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'store.middleware.ReplicaPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'store.middleware.CartCookieMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
 ]
@@ -65,7 +76,8 @@ ROOT_URLCONF = 'ecommerce.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, with render times recorded for request timing
+        'BACKEND': 'store.instrumentation.InstrumentedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -82,6 +94,11 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'ecommerce.wsgi.application'
 
+# Serve the catalog, search and cart pages with the async views in
+# store.async_views. Meant for the ASGI launch mode (SERVER_MODE=asgi in
+# start.sh); under WSGI the sync views are faster.
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False') == 'True'
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -93,20 +110,152 @@ DATABASE_URL = os.getenv('DATABASE_URL')
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable not set!")
 
-# Parse the DATABASE_URL to extract connection details
-url = urlparse(DATABASE_URL)
-
+# Connections are pooled per process; tune the pool with query parameters on
+# DATABASE_URL (pool_min_size, pool_max_size, pool_timeout,
+# pool_max_lifetime, pool_max_idle, health_checks, or pool=false), see
+# ecommerce/utils/database.py. Keep gunicorn workers x pool_max_size below
+# PostgreSQL's max_connections.
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': url.path[1:],  # Remove the leading '/' from the database name
-        'USER': url.username,
-        'PASSWORD': url.password,
-        'HOST': url.hostname,
-        'PORT': url.port or 5432,  # Default PostgreSQL port if not specified
-    }
+    'default': database_config(DATABASE_URL),
 }
 
+# Read replicas: comma-separated database URLs (same query parameters as
+# DATABASE_URL). Catalog and cart reads are spread over them, see
+# store/routers.py; after a visitor writes, their reads stay on the primary
+# for REPLICA_PIN_SECONDS. Tests use the primary for every replica.
+DATABASE_REPLICAS = []
+for index, replica_url in enumerate(filter(None, os.getenv('DATABASE_REPLICA_URLS', '').split(',')), start=1):
+    alias = f'replica{index}'
+    DATABASES[alias] = {**database_config(replica_url.strip()), 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['store.routers.ReplicaRouter']
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', '15'))
+
+# Each worker logs its pool statistics at most this often (seconds, 0 = off).
+# /metrics/db-pool/ reports them to staff users or to METRICS_TOKEN bearers.
+DB_POOL_STATS_INTERVAL = int(os.getenv('DB_POOL_STATS_INTERVAL', '60'))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+# Share of requests (0.0-1.0) that get a Server-Timing header and a JSON
+# timing log line (SQL, template and view time). In those requests, a query
+# shape repeated N_PLUS_ONE_THRESHOLD times is logged as a likely N+1.
+# Off under `manage.py test`, whose requests would each log a line.
+TESTING = sys.argv[1:2] == ['test']
+REQUEST_TIMING_SAMPLE_RATE = float(os.getenv(
+    'REQUEST_TIMING_SAMPLE_RATE', '0' if TESTING else '1.0' if DEBUG else '0.01'
+))
+N_PLUS_ONE_THRESHOLD = int(os.getenv('N_PLUS_ONE_THRESHOLD', '5'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'ecommerce.utils.database': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'store.instrumentation': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+
+# Store
+# Product search backend (dotted path). When unset, PostgreSQL full-text
+# search is used on PostgreSQL and an in-process index on other databases.
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND')
+
+# Rank search box suggestions by how many carts each product appears in
+AUTOCOMPLETE_POPULARITY = os.getenv('AUTOCOMPLETE_POPULARITY', 'False') == 'True'
+
+# Shop pagination: 'offset' (numbered pages) or 'cursor' (keyset pagination
+# on created_at/id, constant cost at any depth). With cursor pagination,
+# SHOP_ESTIMATED_COUNT shows a planner-estimated product count.
+SHOP_PAGINATION = os.getenv('SHOP_PAGINATION', 'offset')
+SHOP_ESTIMATED_COUNT = os.getenv('SHOP_ESTIMATED_COUNT', 'False') == 'True'
+# Shop and product pages for visitors without cookies may be cached by
+# browsers and shared caches for this many seconds; everyone else
+# revalidates with ETag/Last-Modified.
+CATALOG_PAGE_MAX_AGE = int(os.getenv('CATALOG_PAGE_MAX_AGE', '60'))
+
+# CART_STORAGE = 'cookie' keeps anonymous carts in a signed cookie until
+# login or checkout, so browsing and adding to the cart write nothing to the
+# database. 'database' stores every cart in the Cart table.
+CART_STORAGE = os.getenv('CART_STORAGE', 'database')
+CART_COOKIE_NAME = 'cart'
+CART_COOKIE_AGE = 60 * 60 * 24 * 30  # 30 days
+CART_COOKIE_MAX_LINES = 100  # larger carts move to the database
+# `manage.py prune_carts` (run daily) deletes carts idle for this long,
+# along with expired sessions
+CART_PRUNE_AFTER_DAYS = int(os.getenv('CART_PRUNE_AFTER_DAYS', '30'))
+# Products shown under "Frequently bought together", precomputed from cart
+# contents by `manage.py build_recommendations`
+RECOMMENDATIONS_SHOWN = int(os.getenv('RECOMMENDATIONS_SHOWN', '4'))
+
+# REST API (/api/v1/). Catalog responses may be cached by clients and
+# edge caches for API_CACHE_MAX_AGE seconds, and are revalidated by ETag.
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+API_CACHE_MAX_AGE = int(os.getenv('API_CACHE_MAX_AGE', '60'))
+
+# Admin image uploads go through a background queue processed by
+# `manage.py process_image_uploads`; set IMAGE_UPLOAD_ASYNC=False to upload
+# inside the request instead.
+IMAGE_UPLOAD_ASYNC = os.getenv('IMAGE_UPLOAD_ASYNC', 'True') == 'True'
+IMAGE_UPLOAD_MAX_ATTEMPTS = 5
+IMAGE_UPLOAD_RETRY_DELAY = 30  # seconds, doubled after each failed attempt
+IMAGE_UPLOAD_MAX_RETRY_DELAY = 60 * 60
+IMAGE_UPLOAD_STALE_AFTER = 10 * 60  # reclaim jobs stuck in processing
+# Processes used to decode and resize uploaded images into derivatives
+IMAGE_PROCESS_WORKERS = int(os.getenv('IMAGE_PROCESS_WORKERS', '2'))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# REDIS_URL selects Redis, CACHE_DIR a file-based cache; otherwise each
+# process uses its own in-memory cache.
+
+REDIS_URL = os.getenv('REDIS_URL')
+CACHE_DIR = os.getenv('CACHE_DIR')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+elif CACHE_DIR:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': CACHE_DIR,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Product card fragments (see store/fragments.py)
+PRODUCT_CARD_CACHE = 'default'
+PRODUCT_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -9,17 +9,28 @@ The `urlpatterns` list routes URLs to views. For more information please see:
 
 URL Patterns:
     - /admin/: Django admin interface
+    - /api/v1/: REST API (included from store.api.urls)
+    - /metrics/db-pool/: Database connection pool statistics (staff or
+      METRICS_TOKEN only)
     - /: Main store application (included from store.urls)
 """
 
 from django.contrib import admin
 from django.urls import path, include
 
+from . import views
+
 # Main URL patterns for the e-commerce platform
 urlpatterns = [
     # Admin interface
     path('admin/', admin.site.urls),
     
+    # REST API, versioned by URL prefix
+    path('api/v1/', include('store.api.urls')),
+    
+    # Connection pool statistics for sizing pools
+    path('metrics/db-pool/', views.db_pool_metrics, name='db_pool_metrics'),
+    
     # Main store application
     path('', include('store.urls')),
 ]
@@ -0,0 +1,133 @@
+"""
+Image processing pipeline for the e-commerce store.
+
+This module turns an uploaded image into a fixed set of derivatives
+(thumbnail, card and detail sizes), each encoded as a progressive JPEG and
+as WebP. Decoding uses Pillow's draft mode, which lets the JPEG decoder
+scale down by up to 8x while decoding instead of building the full-size
+bitmap first.
+
+The work is CPU-bound, so ``render_derivatives`` runs it in a shared
+process pool rather than on the calling thread. ``process_image`` itself
+only depends on Pillow, so it can safely run in a freshly spawned process.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageOps
+import io
+import multiprocessing
+import threading
+
+# Longest edge, in pixels, of each derivative
+DERIVATIVE_SIZES = {
+    'thumb': 160,
+    'card': 480,
+    'detail': 1600,
+}
+
+JPEG_QUALITY = 85
+WEBP_QUALITY = 80
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def process_image(data, sizes=DERIVATIVE_SIZES):
+    """
+    Decode an image once and encode every derivative.
+
+    Args:
+        data (bytes): The original image file content
+        sizes (dict): Longest edge in pixels for each derivative name
+
+    Returns:
+        dict: For each derivative name, a dict of ``{'jpeg': bytes, 'webp': bytes}``
+
+    Raises:
+        ValueError: If the data is not a readable image
+    """
+    try:
+        img = Image.open(io.BytesIO(data))
+        largest = max(sizes.values())
+        # Let the JPEG decoder downscale while decoding (no-op for other formats)
+        img.draft('RGB', (largest, largest))
+        img = ImageOps.exif_transpose(img)
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+    except Exception as e:
+        raise ValueError(f"Could not decode image: {str(e)}")
+
+    derivatives = {}
+    # Work from the largest size down so each resize starts from the
+    # smallest image that is still big enough.
+    for name, size in sorted(sizes.items(), key=lambda item: item[1], reverse=True):
+        if max(img.size) > size:
+            img = img.copy()
+            img.thumbnail((size, size), Image.Resampling.LANCZOS)
+        jpeg = io.BytesIO()
+        img.save(jpeg, format='JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+        webp = io.BytesIO()
+        img.save(webp, format='WEBP', quality=WEBP_QUALITY, method=4)
+        derivatives[name] = {'jpeg': jpeg.getvalue(), 'webp': webp.getvalue()}
+    return derivatives
+
+
+def get_process_pool(max_workers=2):
+    """
+    Get the process pool used for image processing, creating it on first use.
+
+    Workers are spawned rather than forked, so they never inherit the
+    parent's threads, locks or database connections.
+
+    Args:
+        max_workers (int): Pool size, used when the pool is created
+
+    Returns:
+        ProcessPoolExecutor: The shared pool
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(
+                    max_workers=max_workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+    return _pool
+
+
+def render_derivatives(data, max_workers=2):
+    """
+    Produce an image's derivatives in the process pool.
+
+    Args:
+        data (bytes): The original image file content
+        max_workers (int): Pool size, used when the pool is created
+
+    Returns:
+        dict: The derivatives, as returned by ``process_image``
+
+    Raises:
+        ValueError: If the data is not a readable image
+    """
+    return get_process_pool(max_workers).submit(process_image, data).result()
+
+
+def validate_image(file, max_size=5 * 1024 * 1024):
+    """
+    Cheaply check an uploaded image before it is queued for processing.
+
+    Django's ``ImageField`` has already verified the file headers with
+    Pillow, so the image is not decoded here.
+
+    Args:
+        file: A Django UploadedFile
+        max_size (int): Maximum file size in bytes
+
+    Raises:
+        ValueError: If the file is too large or not an image
+    """
+    if file.size > max_size:
+        raise ValueError(f"Image file too large ( > {max_size // (1024 * 1024)}MB )")
+    if not file.content_type.startswith('image/'):
+        raise ValueError("File type not supported")
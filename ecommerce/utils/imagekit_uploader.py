@@ -3,33 +3,53 @@ ImageKit integration utilities for the e-commerce store.
 
 This module provides functionality for uploading and managing images using
 the ImageKit service, including client initialization and file upload handling.
+
+Uploads go through a single process-wide ``ImageKitUploadClient``, which
+keeps a pooled HTTP session open to the upload API and streams each file as
+multipart form data straight from its file object, without reading it into
+memory or base64-encoding it.
 """
 
 from imagekitio import ImageKit
-from imagekitio.models.UploadFileRequestOptions import UploadFileRequestOptions
 from django.conf import settings
+from django.core.files import File
+from requests.adapters import HTTPAdapter
+from requests_toolbelt import MultipartEncoder
 import os
-import base64
 import logging
+import threading
+import requests
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_UPLOAD_URL = 'https://upload.imagekit.io/api/v1/files/upload'
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def _check_settings():
+    """Raise RuntimeError if the ImageKit settings are missing."""
+    if not all([settings.IMAGEKIT_PRIVATE_KEY, settings.IMAGEKIT_PUBLIC_KEY, settings.IMAGEKIT_URL_ENDPOINT]):
+        raise RuntimeError("ImageKit settings (IMAGEKIT_PRIVATE_KEY, IMAGEKIT_PUBLIC_KEY, IMAGEKIT_URL_ENDPOINT) are not configured in Django settings.")
+
+
 def get_imagekit_client():
     """
-    Initialize and return an ImageKit client instance.
-    
+    Initialize and return an ImageKit SDK client instance.
+
     This function creates a new ImageKit client using the configured settings
-    from Django's settings module.
-    
+    from Django's settings module. Uploads do not use the SDK client; see
+    ``get_upload_client``.
+
     Returns:
         ImageKit: An initialized ImageKit client instance
-        
+
     Raises:
         RuntimeError: If required settings are missing or client initialization fails
     """
-    if not all([settings.IMAGEKIT_PRIVATE_KEY, settings.IMAGEKIT_PUBLIC_KEY, settings.IMAGEKIT_URL_ENDPOINT]):
-        raise RuntimeError("ImageKit settings (IMAGEKIT_PRIVATE_KEY, IMAGEKIT_PUBLIC_KEY, IMAGEKIT_URL_ENDPOINT) are not configured in Django settings.")
-    
+    _check_settings()
+
     try:
         return ImageKit(
             private_key=settings.IMAGEKIT_PRIVATE_KEY,
@@ -40,81 +60,170 @@ def get_imagekit_client():
         logger.error(f"Failed to initialize ImageKit client: {str(e)}")
         raise RuntimeError(f"Failed to initialize ImageKit client: {str(e)}")
 
+
+class _SizedStream:
+    """
+    Read-only view of a file object that reports how many bytes are left.
+
+    The multipart encoder needs the body length up front and reads the file
+    in small chunks, so wrapping the file this way avoids ever holding the
+    whole image in memory.
+    """
+
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+        position = fileobj.tell()
+        fileobj.seek(0, os.SEEK_END)
+        self.len = fileobj.tell() - position
+        fileobj.seek(position)
+
+    def read(self, size=-1):
+        chunk = self._fileobj.read(size)
+        self.len -= len(chunk)
+        return chunk
+
+
+class ImageKitUploadClient:
+    """
+    Streaming client for the ImageKit upload API.
+
+    A single instance is shared by the whole process. It holds a
+    ``requests`` session whose connection pool is reused across uploads, so
+    each upload skips the TCP and TLS handshakes.
+
+    Attributes:
+        upload_url (str): Upload API endpoint
+        timeout (tuple): ``(connect, read)`` timeouts in seconds
+    """
+
+    def __init__(self, private_key, upload_url=DEFAULT_UPLOAD_URL, connect_timeout=5, read_timeout=60, pool_size=10):
+        self.upload_url = upload_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        self.session.auth = (private_key, '')
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def upload(self, file, file_name, folder):
+        """
+        Stream a file to ImageKit as multipart form data.
+
+        Args:
+            file: A readable, seekable file-like object
+            file_name (str): The name to give the uploaded file
+            folder (str): The folder path in ImageKit
+
+        Returns:
+            dict: The decoded JSON response
+
+        Raises:
+            RuntimeError: If ImageKit rejects the upload
+            requests.RequestException: On network errors or timeouts
+        """
+        stream = _SizedStream(file)
+        encoder = MultipartEncoder(fields={
+            'file': (file_name, stream, 'application/octet-stream'),
+            'fileName': file_name,
+            'folder': folder,
+            'useUniqueFileName': 'true',
+        })
+        response = self.session.post(
+            self.upload_url,
+            data=encoder,
+            headers={'Content-Type': encoder.content_type},
+            timeout=self.timeout,
+        )
+        if response.status_code >= 400:
+            try:
+                message = response.json().get('message', response.text)
+            except ValueError:
+                message = response.text
+            raise RuntimeError(f"HTTP {response.status_code}: {message}")
+        return response.json()
+
+
+def get_upload_client():
+    """
+    Get the process-wide ImageKit upload client, creating it on first use.
+
+    Returns:
+        ImageKitUploadClient: The shared upload client
+
+    Raises:
+        RuntimeError: If required settings are missing
+    """
+    global _client
+    if _client is None:
+        _check_settings()
+        with _client_lock:
+            if _client is None:
+                _client = ImageKitUploadClient(
+                    settings.IMAGEKIT_PRIVATE_KEY,
+                    upload_url=getattr(settings, 'IMAGEKIT_UPLOAD_URL', DEFAULT_UPLOAD_URL),
+                    connect_timeout=getattr(settings, 'IMAGEKIT_CONNECT_TIMEOUT', 5),
+                    read_timeout=getattr(settings, 'IMAGEKIT_READ_TIMEOUT', 60),
+                    pool_size=getattr(settings, 'IMAGEKIT_POOL_SIZE', 10),
+                )
+    return _client
+
+
 def upload_image_to_imagekit(file, file_name, folder="/products/primary/"):
     """
     Upload an image file to ImageKit.
-    
+
     This function handles the process of uploading an image to ImageKit,
-    including file validation, base64 encoding, and response handling.
-    
+    including file validation, streaming the content, and response handling.
+
     Args:
         file: A file-like object containing the image data
         file_name (str): The name to give the uploaded file
         folder (str): The folder path in ImageKit where the file should be stored
-        
+
     Returns:
         str: The URL of the uploaded image
-        
+
     Raises:
         ValueError: If the file is invalid or empty
         RuntimeError: If the upload fails or returns an invalid response
     """
     try:
-        # Initialize ImageKit client
-        imagekit = get_imagekit_client()
-        
+        client = get_upload_client()
+
         # Ensure file is valid
         if not file or not hasattr(file, 'read'):
             raise ValueError("Invalid file object provided")
-            
-        # Read file content in binary mode
-        file_content = file.read()
-        if not file_content:
+
+        # Django file wrappers report the size of the original upload, which
+        # is stale once the image has been re-encoded, so stream the
+        # underlying file object instead.
+        if isinstance(file, File):
+            file = file.file
+
+        file.seek(0, os.SEEK_END)
+        if not file.tell():
             raise ValueError("Empty file content")
-            
+        file.seek(0)
+
+        response = client.upload(file, file_name, folder)
+
         # Reset file pointer
         file.seek(0)
-        
-        # Convert file content to base64
-        base64_file = base64.b64encode(file_content).decode('utf-8')
-        
-        # Create upload options
-        options = UploadFileRequestOptions(
-            folder=folder,
-            use_unique_file_name=True
-        )
-        
-        # Upload to ImageKit using base64
-        response = imagekit.upload(
-            file=base64_file,
-            file_name=file_name,
-            options=options
-        )
-        
+
         # Log the response for debugging
         logger.debug(f"ImageKit upload response: {response}")
-        
+
         if not response:
             logger.error("No response received from ImageKit")
             raise RuntimeError("No response received from ImageKit")
-            
-        if isinstance(response, dict) and response.get("error"):
-            logger.error(f"ImageKit error: {response['error']}")
-            raise RuntimeError(f"ImageKit error: {response['error']}")
-            
-        # Extract URL from response
-        url = None
-        if isinstance(response, dict):
-            url = response.get("url")
-        elif hasattr(response, "url"):
-            url = response.url
-            
+
+        url = response.get("url") if isinstance(response, dict) else None
         if not url:
             logger.error(f"Invalid response format from ImageKit: {response}")
             raise RuntimeError("No URL received in ImageKit response")
-            
+
         return url
 
     except Exception as e:
         logger.error(f"ImageKit upload failed: {str(e)}")
-        raise RuntimeError(f"ImageKit upload failed: {str(e)}") 
\ No newline at end of file
+        raise RuntimeError(f"ImageKit upload failed: {str(e)}")
@@ -0,0 +1,104 @@
+"""
+ImageKit URL transformations for the e-commerce store.
+
+ImageKit resizes and re-encodes images on its CDN when the URL carries a
+transformation, e.g. ``https://ik.imagekit.io/demo/tr:w-480,q-80,f-auto/a.jpg``.
+This module builds those URLs, so pages can request an image at the size
+it is displayed instead of downloading the stored original.
+
+URLs that do not belong to ``IMAGEKIT_URL_ENDPOINT`` are returned
+unchanged. Generated URLs are kept in an LRU cache, since the same images
+are rendered on many pages.
+"""
+
+from functools import lru_cache
+
+from django.conf import settings
+
+
+def transformation(width=None, quality=None):
+    """
+    Build an ImageKit transformation string.
+
+    Args:
+        width (int): Output width in pixels, or None to keep the width
+        quality (int): Output quality (1-100), or None for the default
+
+    Returns:
+        str: The transformation, e.g. ``w-480,q-80,f-auto``
+    """
+    if quality is None:
+        quality = getattr(settings, 'IMAGEKIT_IMAGE_QUALITY', 80)
+    parts = [f"w-{int(width)}"] if width else []
+    parts += [f"q-{int(quality)}", 'f-auto']
+    return ','.join(parts)
+
+
+@lru_cache(maxsize=4096)
+def _transform(url, endpoint, transform):
+    if not url or not endpoint or not url.startswith(endpoint + '/'):
+        return url
+    path = url[len(endpoint) + 1:]
+    if '?' in path:
+        return f"{url}&tr={transform}"
+    if path.startswith('tr:'):
+        # Already transformed; replace the existing transformation
+        path = path.split('/', 1)[1] if '/' in path else ''
+    return f"{endpoint}/tr:{transform}/{path}"
+
+
+def imagekit_url(url, width=None, quality=None):
+    """
+    Get the URL of an ImageKit image resized to a given width.
+
+    The image is served in the best format the browser accepts (WebP or
+    AVIF where supported).
+
+    Args:
+        url (str): Stored ImageKit URL of the image
+        width (int): Output width in pixels, or None to keep the width
+        quality (int): Output quality (1-100), or None for the default
+
+    Returns:
+        str: The transformation URL, or ``url`` unchanged if it is not an
+        ImageKit URL
+    """
+    endpoint = (getattr(settings, 'IMAGEKIT_URL_ENDPOINT', None) or '').rstrip('/')
+    return _transform(url, endpoint, transformation(width, quality))
+
+
+def imagekit_srcset(url, widths, quality=None):
+    """
+    Build a ``srcset`` attribute value with one candidate per width.
+
+    Args:
+        url (str): Stored ImageKit URL of the image
+        widths: Candidate widths in pixels
+        quality (int): Output quality (1-100), or None for the default
+
+    Returns:
+        str: The srcset, or an empty string if ``url`` is not an ImageKit URL
+    """
+    candidates = [(imagekit_url(url, width, quality), width) for width in widths]
+    if not candidates or candidates[0][0] == url:
+        return ''
+    return ', '.join(f"{candidate} {width}w" for candidate, width in candidates)
+
+
+def imagekit_original_url(url):
+    """
+    Get the URL that serves an ImageKit image exactly as it was uploaded.
+
+    Plain ImageKit URLs may still be re-encoded on delivery (automatic
+    format conversion and quality), so their bytes can differ from the
+    uploaded file; the ``orig-true`` transformation skips that.
+
+    Args:
+        url (str): Stored ImageKit URL of the image
+
+    Returns:
+        str: The original's URL, or ``url`` unchanged if it is not an
+        ImageKit URL
+    """
+    endpoint = (getattr(settings, 'IMAGEKIT_URL_ENDPOINT', None) or '').rstrip('/')
+    return _transform(url, endpoint, 'orig-true')
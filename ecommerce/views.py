@@ -0,0 +1,56 @@
+"""
+Project-level views for the e-commerce platform.
+"""
+
+import hmac
+import os
+
+from django.conf import settings
+from django.db import connections
+from django.http import Http404, JsonResponse
+from django.views.decorators.cache import never_cache
+
+from .utils.database import get_pool_stats
+
+
+def has_metrics_access(request):
+    """
+    Check whether a request may read operational metrics.
+
+    Staff users may, and so may clients sending ``METRICS_TOKEN`` as a
+    bearer token (for a metrics scraper).
+
+    Args:
+        request: The HTTP request object
+
+    Returns:
+        bool: True if access is allowed
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_staff:
+        return True
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    header = request.headers.get('Authorization', '')
+    return bool(token) and hmac.compare_digest(header, f"Bearer {token}")
+
+
+@never_cache
+def db_pool_metrics(request):
+    """
+    Report the database connection pool statistics of this worker.
+
+    Every worker process has its own pools, so the figures describe the
+    process that served the request; the periodic log lines cover all of
+    them.
+
+    Returns:
+        JsonResponse: The process id and the statistics of each pooled
+        database
+    """
+    if not has_metrics_access(request):
+        raise Http404
+    pools = {alias: get_pool_stats(alias) for alias in connections}
+    return JsonResponse({
+        'pid': os.getpid(),
+        'pools': {alias: stats for alias, stats in pools.items() if stats is not None},
+    })
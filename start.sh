@@ -15,5 +15,17 @@ if not User.objects.filter(username="batman").exists():
     User.objects.create_superuser("batman", "batman@example.com", "batman")
 EOF
 
-echo "Starting Gunicorn server..."
-gunicorn ecommerce.wsgi:application
+echo "Starting image upload worker..."
+python manage.py process_image_uploads &
+
+# SERVER_MODE=asgi runs Gunicorn with Uvicorn workers and the async views,
+# so each worker keeps serving other connections while requests wait on
+# slow clients or the database. The default is the sync WSGI stack.
+if [ "${SERVER_MODE:-wsgi}" = "asgi" ]; then
+    echo "Starting Gunicorn server with Uvicorn workers (ASGI)..."
+    export ASYNC_VIEWS=${ASYNC_VIEWS:-True}
+    gunicorn ecommerce.asgi:application -k uvicorn_worker.UvicornWorker
+else
+    echo "Starting Gunicorn server..."
+    gunicorn ecommerce.wsgi:application
+fi
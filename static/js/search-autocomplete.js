@@ -0,0 +1,49 @@
+document.addEventListener('DOMContentLoaded', function () {
+    const input = document.getElementById('search-input');
+    const datalist = document.getElementById('search-suggestions');
+    if (!input || !datalist) {
+        return;
+    }
+
+    const url = input.dataset.autocompleteUrl;
+    let timer = null;
+    let controller = null;
+    let suggestions = {};
+
+    input.addEventListener('input', () => {
+        const query = input.value.trim();
+
+        // Jump straight to a product when a suggestion is picked
+        if (suggestions[input.value]) {
+            window.location.href = suggestions[input.value];
+            return;
+        }
+
+        clearTimeout(timer);
+        if (query.length < 2) {
+            datalist.innerHTML = '';
+            return;
+        }
+
+        // Debounce keystrokes and cancel any request still in flight
+        timer = setTimeout(() => {
+            if (controller) {
+                controller.abort();
+            }
+            controller = new AbortController();
+            fetch(`${url}?query=${encodeURIComponent(query)}`, { signal: controller.signal })
+                .then(response => response.json())
+                .then(data => {
+                    suggestions = {};
+                    datalist.innerHTML = '';
+                    data.results.forEach(result => {
+                        const option = document.createElement('option');
+                        option.value = result.name;
+                        suggestions[result.name] = result.url;
+                        datalist.appendChild(option);
+                    });
+                })
+                .catch(() => {});
+        }, 150);
+    });
+});
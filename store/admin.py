@@ -1,16 +1,20 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Product, ProductImage
+from ecommerce.utils.imagekit_urls import imagekit_url
+from .models import ImageAsset, ImageUploadJob, Order, OrderLine, Product, ProductImage, UploadStatus
 from .forms import ProductAdminForm, ProductImageAdminForm
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     form = ProductAdminForm
-    list_display = ('name', 'price', 'primary_image_preview')
+    list_display = ('name', 'price', 'stock', 'primary_image_preview', 'upload_status')
+    list_filter = ('upload_status',)
 
     def primary_image_preview(self, obj):
+        if obj.upload_status == UploadStatus.PENDING:
+            return "Uploading..."
         if obj.primary_image_url:
-            return format_html('<img src="{}" style="height: 60px;" />', obj.primary_image_url)
+            return format_html('<img src="{}" style="height: 60px;" />', imagekit_url(obj.thumb_image['jpeg'], 120))
         return "-"
     primary_image_preview.short_description = 'Primary Image'
 
@@ -18,8 +22,42 @@ class ProductAdmin(admin.ModelAdmin):
 @admin.register(ProductImage)
 class ProductImageAdmin(admin.ModelAdmin):
     form = ProductImageAdminForm
-    list_display = ('product', 'order', 'image_preview')
+    list_display = ('product', 'order', 'image_preview', 'upload_status')
+    list_filter = ('upload_status',)
 
     def image_preview(self, obj):
-        return format_html('<img src="{}" style="height: 50px;" />', obj.image_url)
+        if not obj.image_url:
+            return obj.get_upload_status_display()
+        return format_html('<img src="{}" style="height: 50px;" />', imagekit_url(obj.thumb_image['jpeg'], 100))
     image_preview.short_description = 'Image'
+
+
+@admin.register(ImageUploadJob)
+class ImageUploadJobAdmin(admin.ModelAdmin):
+    list_display = ('file_name', 'status', 'attempts', 'next_attempt_at', 'updated_at')
+    list_filter = ('status',)
+    readonly_fields = ('product', 'product_image', 'file_name', 'folder', 'attempts', 'last_error', 'created_at', 'updated_at')
+    exclude = ('data',)
+
+
+@admin.register(ImageAsset)
+class ImageAssetAdmin(admin.ModelAdmin):
+    list_display = ('content_hash', 'url', 'created_at')
+    search_fields = ('content_hash', 'url')
+    readonly_fields = ('content_hash', 'url', 'derivatives', 'created_at')
+
+
+class OrderLineInline(admin.TabularInline):
+    model = OrderLine
+    extra = 0
+    readonly_fields = ('product', 'product_name', 'unit_price', 'quantity')
+    can_delete = False
+
+
+@admin.register(Order)
+class OrderAdmin(admin.ModelAdmin):
+    list_display = ('id', 'full_name', 'email', 'status', 'total_price', 'created_at')
+    list_filter = ('status',)
+    search_fields = ('full_name', 'email')
+    readonly_fields = ('user', 'total_price', 'created_at', 'updated_at')
+    inlines = [OrderLineInline]
@@ -0,0 +1,5 @@
+"""
+Versioned REST API for the store application, built on Django REST framework.
+
+Version 1 is mounted at ``/api/v1/`` (see ``store.api.urls``).
+"""
@@ -0,0 +1,57 @@
+"""
+Keyset pagination for the REST API.
+"""
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from ..pagination import InvalidCursor, paginate_by_cursor
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginate newest first by ``(created_at, id)`` using ``?after=``/``?before=``.
+
+    Wraps ``store.pagination.paginate_by_cursor``, so every page costs one
+    indexed query regardless of depth and no count is run. Clients may ask
+    for up to ``max_page_size`` results with ``?page_size=``.
+    """
+
+    page_size = 24
+    max_page_size = 100
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get('page_size', self.page_size))
+        except ValueError:
+            size = self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        try:
+            self.page = paginate_by_cursor(
+                queryset,
+                self.get_page_size(request),
+                after=request.query_params.get('after'),
+                before=request.query_params.get('before'),
+            )
+        except InvalidCursor:
+            raise NotFound("Invalid page cursor.")
+        return self.page.object_list
+
+    def get_link(self, param, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, 'before' if param == 'after' else 'after')
+        return replace_query_param(url, param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_link('after', self.page.next_cursor),
+            'previous': self.get_link('before', self.page.previous_cursor),
+            'results': data,
+        })
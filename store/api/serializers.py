@@ -0,0 +1,103 @@
+"""
+Serializers for the store REST API.
+"""
+
+from rest_framework import serializers
+
+from ..models import Product, ProductImage
+
+
+def requested_fields(request):
+    """
+    Get the fields asked for with ``?fields=a,b``, or None for all fields.
+
+    Args:
+        request: The API request
+
+    Returns:
+        set: The requested field names, or None
+    """
+    value = request.query_params.get('fields') if request is not None else None
+    if not value:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+class SparseFieldsMixin:
+    """
+    Let clients choose the fields returned with ``?fields=id,name,price``.
+
+    Unknown names are ignored. Only applies to the top-level serializer,
+    not to nested ones.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = requested_fields(self.context.get('request'))
+        if fields:
+            for name in set(self.fields) - fields:
+                self.fields.pop(name)
+
+
+class ProductImageSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = ProductImage
+        fields = ['id', 'product', 'order', 'image_url', 'image_derivatives']
+
+
+class GalleryImageSerializer(serializers.ModelSerializer):
+    """A product image nested in its product."""
+
+    class Meta:
+        model = ProductImage
+        fields = ['id', 'order', 'image_url', 'image_derivatives']
+
+
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    url = serializers.HyperlinkedIdentityField(view_name='api-v1:product-detail')
+    images = GalleryImageSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Product
+        fields = [
+            'id', 'url', 'sku', 'name', 'description', 'price',
+            'primary_image_url', 'image_derivatives', 'images',
+            'created_at', 'updated_at',
+        ]
+
+
+class CartProductSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Product
+        fields = ['id', 'name', 'price', 'primary_image_url', 'image_derivatives']
+
+
+class CartLineSerializer(serializers.Serializer):
+    """
+    A cart line from a ``CartSummary``.
+
+    ``id`` identifies the line for updates: a cart item id for database
+    carts, or the product id for cookie carts.
+    """
+
+    id = serializers.IntegerField()
+    product = CartProductSerializer()
+    quantity = serializers.IntegerField()
+    line_total = serializers.DecimalField(max_digits=12, decimal_places=2)
+
+
+class CartSerializer(serializers.Serializer):
+    """The visitor's cart, serialized from a ``CartSummary``."""
+
+    item_count = serializers.IntegerField()
+    total_price = serializers.DecimalField(max_digits=12, decimal_places=2)
+    lines = CartLineSerializer(many=True)
+
+
+class CartItemInputSerializer(serializers.Serializer):
+    product = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=1, default=1)
+
+
+class CartQuantitySerializer(serializers.Serializer):
+    quantity = serializers.IntegerField(min_value=0)
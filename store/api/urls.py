@@ -0,0 +1,30 @@
+"""
+URL configuration for version 1 of the store REST API.
+
+URL Patterns (under /api/v1/):
+    - products/: Products, newest first (cursor paginated)
+    - products/<id>/: A single product
+    - product-images/?product=<id>: A product's images
+    - product-images/<id>/: A single product image
+    - cart/: The visitor's cart (GET, DELETE)
+    - cart/items/: Add a product to the cart (POST)
+    - cart/items/<id>/: Change or remove a cart line (PATCH, DELETE)
+"""
+
+from django.urls import include, path
+from rest_framework.routers import DefaultRouter
+
+from . import views
+
+app_name = 'api-v1'
+
+router = DefaultRouter()
+router.register('products', views.ProductViewSet, basename='product')
+router.register('product-images', views.ProductImageViewSet, basename='productimage')
+
+urlpatterns = [
+    path('', include(router.urls)),
+    path('cart/', views.CartView.as_view(), name='cart'),
+    path('cart/items/', views.CartItemsView.as_view(), name='cart-items'),
+    path('cart/items/<int:item_id>/', views.CartItemView.as_view(), name='cart-item'),
+]
@@ -0,0 +1,185 @@
+"""
+Views for the store REST API.
+
+Catalog endpoints are public and cacheable: their ETag is derived from the
+catalog version (see ``store.catalog``) and the request URL, so a
+conditional request is answered with ``304 Not Modified`` after a single
+aggregate query, without loading or serializing any rows, and
+``Cache-Control: public`` lets an edge cache share responses. Catalog
+views skip authentication, so they never read the session and responses
+do not vary on the cookie.
+
+Cart endpoints act on the visitor's own cart (see ``store.cart``) and are
+never cached. Like the HTML views, changes require a CSRF token.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.db.models import Prefetch
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import never_cache
+from django.views.decorators.csrf import csrf_protect
+from django.views.decorators.http import condition
+from rest_framework import status, viewsets
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from ..cart import get_cart_storage, get_cart_summary, refresh_cart_summary
+from ..catalog import get_catalog_version
+from ..models import Product, ProductImage
+from .pagination import KeysetPagination
+from .serializers import (
+    CartItemInputSerializer,
+    CartQuantitySerializer,
+    CartSerializer,
+    ProductImageSerializer,
+    ProductSerializer,
+    requested_fields,
+)
+
+
+def catalog_etag(request, *args, **kwargs):
+    """
+    Build the ETag of a catalog response without loading the catalog.
+
+    Any product or product image change, from any process, moves the
+    catalog version, which changes every catalog ETag.
+    """
+    key = f"{get_catalog_version()}|{request.get_full_path()}|{request.META.get('HTTP_ACCEPT', '')}"
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+catalog_conditional = method_decorator(condition(etag_func=catalog_etag))
+
+
+class CatalogViewSet(viewsets.ReadOnlyModelViewSet):
+    """Read-only, publicly cacheable catalog endpoint."""
+
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    pagination_class = KeysetPagination
+
+    @catalog_conditional
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @catalog_conditional
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if request.method in ('GET', 'HEAD') and response.status_code in (200, 304):
+            patch_cache_control(response, public=True, max_age=getattr(settings, 'API_CACHE_MAX_AGE', 60))
+            patch_vary_headers(response, ['Accept'])
+        return response
+
+
+class ProductViewSet(CatalogViewSet):
+    """
+    Products, newest first.
+
+    ``?fields=`` selects the returned fields; columns and relations that
+    are not needed are not loaded. A page always costs one query, plus one
+    for the gallery images when ``images`` is included.
+    """
+
+    serializer_class = ProductSerializer
+
+    def get_queryset(self):
+        fields = requested_fields(self.request)
+        queryset = Product.objects.defer('search_vector')
+        if fields is not None and 'description' not in fields:
+            queryset = queryset.defer('description')
+        if fields is None or 'images' in fields:
+            queryset = queryset.prefetch_related(Prefetch(
+                'images',
+                queryset=ProductImage.objects.exclude(image_url='').order_by('order'),
+            ))
+        return queryset
+
+
+class ProductImageViewSet(CatalogViewSet):
+    """
+    The images of one product, listed with ``?product=<id>``.
+
+    Images are listed in display order. A product has a handful of images,
+    so the list is not paginated; the whole table cannot be listed at once.
+    """
+
+    serializer_class = ProductImageSerializer
+    pagination_class = None
+
+    def list(self, request, *args, **kwargs):
+        if 'product' not in request.query_params:
+            raise ValidationError({'product': "This query parameter is required."})
+        return super().list(request, *args, **kwargs)
+
+    def get_queryset(self):
+        queryset = ProductImage.objects.exclude(image_url='').order_by('order', 'id')
+        product_id = self.request.query_params.get('product')
+        if product_id is not None:
+            if not product_id.isdigit():
+                raise NotFound("Invalid product id.")
+            queryset = queryset.filter(product_id=product_id)
+        return queryset
+
+
+@method_decorator([never_cache, csrf_protect], name='dispatch')
+class CartAPIView(APIView):
+    """Base for views acting on the visitor's cart."""
+
+    permission_classes = [AllowAny]
+
+    def cart_response(self, summary, status_code=status.HTTP_200_OK):
+        return Response(CartSerializer(summary).data, status=status_code)
+
+
+class CartView(CartAPIView):
+    """
+    GET: the visitor's cart.
+    DELETE: remove every line.
+    """
+
+    def get(self, request):
+        return self.cart_response(get_cart_summary(request._request))
+
+    def delete(self, request):
+        get_cart_storage(request._request).clear()
+        return self.cart_response(refresh_cart_summary(request._request))
+
+
+class CartItemsView(CartAPIView):
+    """POST ``{"product": id, "quantity": n}``: add to the cart."""
+
+    def post(self, request):
+        serializer = CartItemInputSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if not get_cart_storage(request._request).add(
+            serializer.validated_data['product'], serializer.validated_data['quantity']
+        ):
+            raise NotFound("No Product matches the given query.")
+        return self.cart_response(refresh_cart_summary(request._request), status.HTTP_201_CREATED)
+
+
+class CartItemView(CartAPIView):
+    """
+    PATCH ``{"quantity": n}``: set a line's quantity (0 removes it).
+    DELETE: remove the line.
+    """
+
+    def patch(self, request, item_id):
+        serializer = CartQuantitySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if not get_cart_storage(request._request).set_quantity(item_id, serializer.validated_data['quantity']):
+            raise NotFound("No CartItem matches the given query.")
+        return self.cart_response(refresh_cart_summary(request._request))
+
+    def delete(self, request, item_id):
+        if get_cart_storage(request._request).remove(item_id) is None:
+            raise NotFound("No CartItem matches the given query.")
+        return self.cart_response(refresh_cart_summary(request._request))
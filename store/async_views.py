@@ -0,0 +1,268 @@
+"""
+Async views for the e-commerce store application.
+
+These are async counterparts of the catalog, search and cart views in
+``store.views``, with the same URLs, templates and behaviour. They are
+routed instead of the sync views when ``settings.ASYNC_VIEWS`` is enabled,
+which is meant for running under an ASGI server (see ``start.sh``): while a
+view waits on the database, or a slow client trickles in its request, the
+worker's event loop serves other connections instead of a whole worker
+process or thread being held.
+
+Everything a template reads is loaded before rendering, through Django's
+async ORM, so rendering never queries from the event loop. Cart mutations
+that need a transaction run the sync code in a thread (see ``store.cart``).
+"""
+
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.core.paginator import InvalidPage, Paginator
+from django.db.models import Max, QuerySet
+from django.http import Http404, JsonResponse
+from django.shortcuts import aget_object_or_404, redirect, render
+
+from .cart import aget_cart_storage, aget_cart_summary, aload_cart_context, arefresh_cart_summary
+from .catalog import aget_catalog_version
+from .conditional import check_conditional, finish_conditional
+from .models import Product
+from .pagination import InvalidCursor, aestimate_count, apaginate_by_cursor
+from .recommendations import get_recommended_products
+from .search import get_search_backend
+from .views import ProductListView, parse_quantity
+
+
+async def aget_page(object_list, per_page, number, allow_invalid=True):
+    """
+    Fetch one page of results for a Django ``Paginator``.
+
+    Querysets are counted and sliced through the async ORM; other sequences
+    (such as the in-memory search results) are paginated in a thread.
+
+    Args:
+        object_list: A queryset or sliceable sequence
+        per_page (int): Number of objects per page
+        number: The requested page number from the query string, or
+            ``'last'``
+        allow_invalid (bool): Fall back to the first or last page for an
+            invalid number instead of raising ``InvalidPage``
+
+    Returns:
+        Page: The page, with its objects loaded
+    """
+    paginator = Paginator(object_list, per_page)
+    get_page = paginator.get_page if allow_invalid else paginator.page
+    if not isinstance(object_list, QuerySet):
+        return await sync_to_async(get_page)(number)
+    paginator.count = await object_list.acount()
+    if number == 'last':
+        number = paginator.num_pages
+    page = get_page(number)
+    page.object_list = [obj async for obj in page.object_list]
+    return page
+
+
+async def shop(request):
+    """
+    Async version of ``ProductListView``.
+
+    Args:
+        request: The HTTP request object
+
+    Returns:
+        Rendered shop page, or a 304 if it has not changed
+    """
+    await aload_cart_context(request)
+    key = f"shop|{await aget_catalog_version()}|{request.get_full_path()}"
+    etag, timestamp, response = check_conditional(request, key)
+    if response is not None:
+        return finish_conditional(request, response, etag, timestamp)
+
+    queryset = Product.objects.order_by(*ProductListView.ordering)
+    page_size = ProductListView.paginate_by
+    cursor_pagination = getattr(settings, 'SHOP_PAGINATION', 'offset') == 'cursor'
+    if cursor_pagination:
+        try:
+            page = await apaginate_by_cursor(
+                queryset,
+                page_size,
+                after=request.GET.get('after'),
+                before=request.GET.get('before'),
+            )
+        except InvalidCursor:
+            raise Http404("Invalid page cursor.")
+        if getattr(settings, 'SHOP_ESTIMATED_COUNT', False):
+            page.estimated_count = await aestimate_count(Product.objects.all())
+        is_paginated = page.has_other_pages()
+    else:
+        try:
+            page = await aget_page(queryset, page_size, request.GET.get('page') or 1, allow_invalid=False)
+        except InvalidPage:
+            raise Http404("Invalid page.")
+        is_paginated = page.paginator.num_pages > 1
+
+    response = render(request, 'store/shop.html', {
+        'products': page.object_list,
+        'page_obj': page,
+        'paginator': getattr(page, 'paginator', None),
+        'is_paginated': is_paginated,
+        'cursor_pagination': cursor_pagination,
+        'title': 'Shop'
+    })
+    return finish_conditional(request, response, etag, timestamp)
+
+
+async def product_detail(request, pk):
+    """
+    Async version of ``ProductDetailView``.
+
+    Args:
+        request: The HTTP request object
+        pk (int): The product to show
+
+    Returns:
+        Rendered product page, or a 304 if it has not changed
+    """
+    version = await (
+        Product.objects.filter(pk=pk)
+        .annotate(recommended_at=Max('recommendations__computed_at'))
+        .values_list('updated_at', 'stock', 'recommended_at')
+        .afirst()
+    )
+    if version is None:
+        raise Http404("No Product matches the given query.")
+    updated_at, stock, recommended_at = version
+    await aload_cart_context(request)
+    etag, timestamp, response = check_conditional(
+        request, f"product|{pk}|{updated_at.isoformat()}|{stock}|{recommended_at}", updated_at
+    )
+    if response is None:
+        product = await aget_object_or_404(Product, pk=pk)
+        # Images still waiting for their background upload have no URL yet
+        product_images = [image async for image in product.images.exclude(image_url='')]
+        recommendations = [item async for item in get_recommended_products(pk)]
+        response = render(request, 'store/product_detail.html', {
+            'product': product,
+            'object': product,
+            'product_images': product_images,
+            'recommendations': recommendations,
+            'title': product.name
+        })
+    return finish_conditional(request, response, etag, timestamp)
+
+
+async def add_to_cart(request, product_id):
+    """Add a product to the cart."""
+    if request.method == 'POST':
+        product_name = await Product.objects.filter(id=product_id).values_list('name', flat=True).afirst()
+        if product_name is None:
+            raise Http404("No Product matches the given query.")
+        quantity = parse_quantity(request.POST.get('quantity'), default=1)
+        if quantity is None or quantity < 1:
+            quantity = 1
+
+        await (await aget_cart_storage(request)).aadd(product_id, quantity)
+        await arefresh_cart_summary(request)
+
+        messages.success(request, f"{product_name} added to cart!")
+        return redirect('cart')
+
+    return redirect('product_detail', pk=product_id)
+
+
+async def remove_from_cart(request, item_id):
+    """Remove an item from the cart."""
+    product_name = await (await aget_cart_storage(request)).aremove(item_id)
+    if product_name is None:
+        raise Http404("No CartItem matches the given query.")
+    await arefresh_cart_summary(request)
+    messages.success(request, f"{product_name} removed from cart!")
+    return redirect('cart')
+
+
+async def update_cart_item(request, item_id):
+    """Update the quantity of a cart item."""
+    if request.method == 'POST':
+        quantity = parse_quantity(request.POST.get('quantity'), default=1)
+        if quantity is None:
+            return JsonResponse({'success': False, 'error': 'Invalid quantity'}, status=400)
+        if not await (await aget_cart_storage(request)).aset_quantity(item_id, quantity):
+            raise Http404("No CartItem matches the given query.")
+        summary = await arefresh_cart_summary(request)
+
+        return JsonResponse({
+            'success': True,
+            'total_price': summary.total_price,
+            'item_count': summary.item_count
+        })
+
+    return JsonResponse({'success': False}, status=400)
+
+
+async def update_cart_items(request):
+    """Async version of ``store.views.update_cart_items``."""
+    if request.method != 'POST':
+        return JsonResponse({'success': False}, status=400)
+    try:
+        items = json.loads(request.body)['items']
+        quantities = {int(item_id): parse_quantity(quantity) for item_id, quantity in items.items()}
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return JsonResponse({'success': False, 'error': 'Invalid request body'}, status=400)
+    if not quantities or None in quantities.values():
+        return JsonResponse({'success': False, 'error': 'Invalid quantity'}, status=400)
+
+    if not await (await aget_cart_storage(request)).aset_quantities(quantities):
+        return JsonResponse({'success': False, 'error': 'Item not in cart'}, status=404)
+    summary = await arefresh_cart_summary(request)
+
+    return JsonResponse({
+        'success': True,
+        'total_price': summary.total_price,
+        'item_count': summary.item_count
+    })
+
+
+async def clear_cart(request):
+    """Clear all items from the cart."""
+    await (await aget_cart_storage(request)).aclear()
+    await arefresh_cart_summary(request)
+    messages.success(request, "Cart cleared!")
+    return redirect('cart')
+
+
+async def cart_view(request):
+    """Display the cart page."""
+    await aload_cart_context(request)
+    summary = await aget_cart_summary(request)
+    return render(request, 'store/cart.html', {
+        'summary': summary,
+        'title': 'Shopping Cart'
+    })
+
+
+async def search_products(request):
+    """
+    Async version of ``store.views.search_products``.
+
+    The search itself runs in a thread, since the in-memory backend may
+    build its index from the database on first use.
+    """
+    query = request.GET.get('query', '').strip()
+    page_obj = None
+    products = []
+
+    if query:
+        results = await sync_to_async(get_search_backend().search)(query)
+        page_obj = await aget_page(results, 12, request.GET.get('page'))
+        products = page_obj.object_list
+    await aload_cart_context(request)
+
+    return render(request, 'store/search_results.html', {
+        'products': products,
+        'page_obj': page_obj,
+        'is_paginated': page_obj is not None and page_obj.has_other_pages(),
+        'query': query,
+        'title': f'Search Results for "{query}"' if query else 'Search'
+    })
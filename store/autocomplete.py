@@ -0,0 +1,143 @@
+"""
+Product name autocomplete for the store application.
+
+Each worker process keeps a sorted array of normalized product names, with
+one entry per word so that "gey" finds "Solar Geyser". Prefix lookups are
+two binary searches over that array. The array is rebuilt when the catalog
+version (see ``store.catalog``) changes, which it does for changes made by
+any process, including imports that send no signals.
+"""
+
+import bisect
+import heapq
+import re
+import threading
+
+from django.conf import settings
+from django.db.models import Count
+
+from .catalog import get_catalog_version
+from .models import Product
+
+WORD_RE = re.compile(r'\w+')
+
+
+def normalize(text):
+    """
+    Normalize text for prefix matching.
+
+    Args:
+        text (str): The text to normalize
+
+    Returns:
+        str: Lowercase words separated by single spaces
+    """
+    return ' '.join(WORD_RE.findall((text or '').lower()))
+
+
+class ProductNameIndex:
+    """
+    Sorted array of normalized product names for prefix lookups.
+
+    Attributes:
+        version (str): Catalog version the index was built from
+        keys (list): Sorted normalized name suffixes, one per word
+        entries (list): ``(product_id, weight)`` for each key
+        names (dict): Display name for each product id
+    """
+
+    # Lookups spanning more entries than this are memoized, so that short,
+    # popular prefixes are only ranked once per catalog version.
+    memoize_threshold = 512
+    memoize_size = 1024
+
+    def __init__(self, rows, version=None):
+        """
+        Build the index.
+
+        Args:
+            rows: Iterable of ``(product_id, name, weight)`` tuples
+            version (str): Catalog version the rows were read at
+        """
+        self.version = version
+        self.names = {}
+        pairs = []
+        for product_id, name, weight in rows:
+            self.names[product_id] = name
+            words = normalize(name).split(' ')
+            for position in range(len(words)):
+                pairs.append((' '.join(words[position:]), product_id, weight))
+        pairs.sort()
+        self.keys = [key for key, _, _ in pairs]
+        self.entries = [(product_id, weight) for _, product_id, weight in pairs]
+        self._memo = {}
+
+    def lookup(self, prefix, limit=10):
+        """
+        Find products whose name has a word starting with the prefix.
+
+        Args:
+            prefix (str): The text typed so far
+            limit (int): Maximum number of suggestions
+
+        Returns:
+            list: ``(product_id, name)`` tuples, most popular first
+        """
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        start = bisect.bisect_left(self.keys, prefix)
+        end = bisect.bisect_left(self.keys, prefix + '\uffff', lo=start)
+        memoize = end - start > self.memoize_threshold
+        if memoize and (prefix, limit) in self._memo:
+            return self._memo[(prefix, limit)]
+        best = {}
+        for product_id, weight in self.entries[start:end]:
+            best[product_id] = max(weight, best.get(product_id, weight))
+        top = heapq.nsmallest(
+            limit, best, key=lambda pk: (-best[pk], self.names[pk].lower(), pk)
+        )
+        results = [(product_id, self.names[product_id]) for product_id in top]
+        if memoize:
+            if len(self._memo) >= self.memoize_size:
+                self._memo.clear()
+            self._memo[(prefix, limit)] = results
+        return results
+
+
+def load_rows():
+    """
+    Read the catalog rows used to build the index.
+
+    When ``settings.AUTOCOMPLETE_POPULARITY`` is enabled, each product is
+    weighted by the number of carts it appears in.
+
+    Returns:
+        Iterable of ``(product_id, name, weight)`` tuples
+    """
+    products = Product.objects.order_by()
+    if getattr(settings, 'AUTOCOMPLETE_POPULARITY', False):
+        return products.annotate(weight=Count('cartitem')).values_list('id', 'name', 'weight')
+    return ((product_id, name, 0) for product_id, name in products.values_list('id', 'name'))
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_name_index():
+    """
+    Get this process's name index, rebuilding it if the catalog changed.
+
+    Returns:
+        ProductNameIndex: An index matching the current catalog version
+    """
+    global _index
+    version = get_catalog_version()
+    index = _index
+    if index is None or index.version != version:
+        with _index_lock:
+            if _index is None or _index.version != version:
+                _index = ProductNameIndex(load_rows(), version=version)
+            index = _index
+    return index
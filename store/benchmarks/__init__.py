@@ -0,0 +1,19 @@
+"""
+Load benchmarks for the store application.
+
+``store.benchmarks.data`` fills a database with a large, deterministic
+catalog, and ``store.benchmarks.runner`` drives the busiest pages against
+it with concurrent in-process clients, measuring latency, throughput and
+queries per request. Results are compared with stored baselines, so a
+change that slows a page down or adds queries to it fails the run.
+
+Use a dedicated database::
+
+    DATABASE_URL=postgres://.../shop_bench python manage.py migrate
+    DATABASE_URL=postgres://.../shop_bench python manage.py seed_benchmark_data
+    DATABASE_URL=postgres://.../shop_bench python manage.py run_benchmarks
+
+Run ``run_benchmarks --save-baselines`` once on the machine that will run
+the benchmarks to record the baselines later runs are checked against, in
+``store/benchmarks/baselines.json``.
+"""
@@ -0,0 +1,142 @@
+"""
+Deterministic benchmark datasets.
+
+``generate_dataset`` writes products, product images, carts and cart items
+with bulk inserts, drawing every value from a seeded random generator, so
+the same seed and sizes always produce the same catalog. Benchmark products
+are recognised by their ``BENCH-`` SKU.
+
+Carts are created in bulk too, so the database must return ids from bulk
+inserts (PostgreSQL, or SQLite 3.35 and later).
+"""
+
+import random
+from decimal import Decimal
+
+from django.db import transaction
+
+from store.models import Cart, CartItem, Product, ProductImage
+from store.search import get_search_backend
+
+SKU_PREFIX = 'BENCH-'
+
+# Words product names and descriptions are made of; search scenarios query them
+MATERIALS = ['brass', 'copper', 'chrome', 'steel', 'plastic', 'ceramic', 'bronze', 'nickel']
+PRODUCT_TYPES = ['geyser', 'valve', 'tap', 'mixer', 'pipe', 'elbow', 'drain', 'shower', 'basin', 'pump']
+FEATURES = ['compact', 'heavy', 'duty', 'insulated', 'threaded', 'adjustable', 'quiet', 'solar', 'rapid', 'classic']
+
+SEARCH_QUERIES = [
+    *PRODUCT_TYPES,
+    *(f"{material} {product_type}" for material in MATERIALS[:4] for product_type in PRODUCT_TYPES[:4]),
+]
+
+
+class BenchmarkDataset:
+    """
+    The benchmark products in the database.
+
+    Attributes:
+        product_ids (list): Primary keys of the benchmark products
+        search_queries (list): Queries that match benchmark products
+    """
+
+    def __init__(self, product_ids):
+        self.product_ids = product_ids
+        self.search_queries = SEARCH_QUERIES
+
+    @classmethod
+    def load(cls):
+        """
+        Load the benchmark products written by ``generate_dataset``.
+
+        Returns:
+            BenchmarkDataset: The dataset, with no products if none exist
+        """
+        product_ids = list(
+            Product.objects.filter(sku__startswith=SKU_PREFIX).order_by('id').values_list('id', flat=True)
+        )
+        return cls(product_ids)
+
+
+def make_product(rng, number):
+    """Build an unsaved benchmark product."""
+    material = rng.choice(MATERIALS)
+    product_type = rng.choice(PRODUCT_TYPES)
+    features = rng.sample(FEATURES, 3)
+    return Product(
+        sku=f"{SKU_PREFIX}{number:07d}",
+        name=f"{material.title()} {product_type} {number}",
+        description=f"{' '.join(features).capitalize()} {material} {product_type}.",
+        price=Decimal(rng.randint(500, 1_000_000)) / 100,
+        stock=rng.randint(0, 500),
+        primary_image_url=f"https://example.com/bench/{number}.jpg",
+    )
+
+
+def generate_dataset(products, images_per_product, carts, items_per_cart, seed=1, batch_size=2000, progress=None):
+    """
+    Write a benchmark dataset with bulk inserts.
+
+    Args:
+        products (int): Number of products
+        images_per_product (int): Additional images per product
+        carts (int): Number of carts
+        items_per_cart (int): Distinct products in each cart
+        seed: Seed for the random generator
+        batch_size (int): Rows written per transaction
+        progress: Optional callable taking (table, rows written, total rows)
+
+    Returns:
+        dict: Rows written per table
+    """
+    rng = random.Random(seed)
+    items_per_cart = min(items_per_cart, products)
+    product_ids, prices = [], {}
+    counts = {'products': 0, 'images': 0, 'carts': 0, 'cart_items': 0}
+    search_backend = get_search_backend()
+
+    for start in range(0, products, batch_size):
+        batch = [make_product(rng, number) for number in range(start, min(start + batch_size, products))]
+        with transaction.atomic():
+            Product.objects.bulk_create(batch)
+            ProductImage.objects.bulk_create([
+                ProductImage(
+                    product=product,
+                    image_url=f"https://example.com/bench/{product.sku[len(SKU_PREFIX):]}-{order}.jpg",
+                    order=order,
+                )
+                for product in batch
+                for order in range(1, images_per_product + 1)
+            ])
+            search_backend.index_products(batch)
+        product_ids.extend(product.pk for product in batch)
+        prices.update((product.pk, product.price) for product in batch)
+        counts['products'] += len(batch)
+        counts['images'] += len(batch) * images_per_product
+        if progress:
+            progress('products', counts['products'], products)
+
+    for start in range(0, carts, batch_size):
+        contents = [
+            [(product_id, rng.randint(1, 5)) for product_id in rng.sample(product_ids, items_per_cart)]
+            for _ in range(min(batch_size, carts - start))
+        ]
+        with transaction.atomic():
+            batch = Cart.objects.bulk_create([
+                Cart(
+                    item_count=sum(quantity for _, quantity in lines),
+                    subtotal=sum((prices[product_id] * quantity for product_id, quantity in lines), Decimal('0.00')),
+                )
+                for lines in contents
+            ])
+            CartItem.objects.bulk_create([
+                CartItem(cart_id=cart.pk, product_id=product_id, quantity=quantity, unit_price=prices[product_id])
+                for cart, lines in zip(batch, contents)
+                for product_id, quantity in lines
+            ])
+        counts['carts'] += len(batch)
+        counts['cart_items'] += len(batch) * items_per_cart
+        if progress:
+            progress('carts', counts['carts'], carts)
+
+    return counts
@@ -0,0 +1,207 @@
+"""
+Concurrent in-process benchmark runner.
+
+``run_scenario`` starts a number of worker threads, each with its own
+Django test client and database connection, warms them up, then has them
+make their share of requests at the same time. Every request is timed and
+its queries counted with the request instrumentation (``store.instrumentation``),
+which also sees queries the async views run in other threads.
+
+Requests go through the full middleware stack and URL configuration, but
+not through a web server, so the figures show the cost of the application
+and its database; compare server launch modes with
+``manage.py benchmark_server`` instead.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+from django.test import Client, override_settings
+
+from store.instrumentation import finish_metrics, start_metrics
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), 'baselines.json')
+
+# Metrics compared with the baselines, and whether higher values are better
+BASELINE_METRICS = {
+    'p50_ms': False,
+    'p95_ms': False,
+    'p99_ms': False,
+    'rps': True,
+    'queries': False,
+}
+
+
+def percentile(values, fraction):
+    """Get the value below which ``fraction`` of the sorted values fall."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class ScenarioResult:
+    """
+    Measurements from one scenario run.
+
+    Attributes:
+        name (str): The scenario's name
+        latencies (list): Sorted request times, in seconds
+        queries (list): Queries made by each request
+        errors (int): Requests that did not return the expected status
+        elapsed (float): Seconds from the first request to the last
+    """
+
+    def __init__(self, name, latencies, queries, errors, elapsed):
+        self.name = name
+        self.latencies = sorted(latencies)
+        self.queries = queries
+        self.errors = errors
+        self.elapsed = elapsed
+
+    @property
+    def requests(self):
+        return len(self.latencies)
+
+    @property
+    def rps(self):
+        return self.requests / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def queries_per_request(self):
+        return sum(self.queries) / len(self.queries) if self.queries else 0.0
+
+    def as_dict(self):
+        """Get the metrics compared with the baselines."""
+        return {
+            'p50_ms': round(percentile(self.latencies, 0.50) * 1000, 1),
+            'p95_ms': round(percentile(self.latencies, 0.95) * 1000, 1),
+            'p99_ms': round(percentile(self.latencies, 0.99) * 1000, 1),
+            'rps': round(self.rps, 1),
+            'queries': round(self.queries_per_request, 1),
+        }
+
+
+def run_scenario(scenario_class, dataset, requests=200, concurrency=8, warmup=5, seed=1):
+    """
+    Benchmark one scenario with concurrent clients.
+
+    Args:
+        scenario_class: A ``Scenario`` subclass
+        dataset (BenchmarkDataset): The benchmark products
+        requests (int): Timed requests, shared between the workers
+        concurrency (int): Number of worker threads
+        warmup (int): Untimed requests each worker makes first
+        seed: Seed for the workers' random generators
+
+    Returns:
+        ScenarioResult: The measurements
+    """
+    concurrency = max(1, min(concurrency, requests))
+    shares = [requests // concurrency + (index < requests % concurrency) for index in range(concurrency)]
+    ready = threading.Barrier(concurrency)
+    scenario_class.prepare(dataset)
+
+    def work(index):
+        rng = random.Random(f"{seed}:{scenario_class.name}:{index}")
+        scenario = scenario_class(Client(raise_request_exception=False), dataset, rng)
+        latencies, queries, errors = [], [], 0
+        try:
+            for _ in range(warmup):
+                scenario.request()
+            ready.wait()
+            started = time.perf_counter()
+            for _ in range(shares[index]):
+                metrics, token = start_metrics()
+                try:
+                    response = scenario.request()
+                finally:
+                    finish_metrics(metrics, token)
+                latencies.append(metrics.total_time)
+                queries.append(metrics.sql_count)
+                if response.status_code != scenario_class.expected_status:
+                    errors += 1
+            return started, time.perf_counter(), latencies, queries, errors
+        except BaseException:
+            # Do not leave the other workers waiting for this one
+            ready.abort()
+            raise
+        finally:
+            # Each worker thread has its own connections
+            connections.close_all()
+
+    # The runner does its own timing; the middleware's would replace it
+    with override_settings(
+        ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+        REQUEST_TIMING_SAMPLE_RATE=0,
+    ):
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            outcomes = list(pool.map(work, range(concurrency)))
+
+    return ScenarioResult(
+        scenario_class.name,
+        latencies=[latency for outcome in outcomes for latency in outcome[2]],
+        queries=[count for outcome in outcomes for count in outcome[3]],
+        errors=sum(outcome[4] for outcome in outcomes),
+        elapsed=max(outcome[1] for outcome in outcomes) - min(outcome[0] for outcome in outcomes),
+    )
+
+
+def load_baselines(path):
+    """
+    Load stored baselines.
+
+    Returns:
+        dict: Metrics per scenario name, empty if the file does not exist
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def save_baselines(path, results):
+    """Store the results of a run as the new baselines."""
+    baselines = load_baselines(path)
+    baselines.update({result.name: result.as_dict() for result in results})
+    with open(path, 'w') as handle:
+        json.dump(baselines, handle, indent=2, sort_keys=True)
+        handle.write('\n')
+
+
+def find_regressions(result, baseline, tolerance=0.25, query_tolerance=0.5):
+    """
+    Compare a scenario's results with its baseline.
+
+    Timings may be ``tolerance`` worse than the baseline (as a fraction),
+    to allow for noise; query counts barely vary between runs, so they may
+    only exceed the baseline by ``query_tolerance`` queries per request.
+
+    Args:
+        result (dict): The scenario's ``ScenarioResult.as_dict()``
+        baseline (dict): The stored metrics for the scenario
+        tolerance (float): Allowed fractional slowdown
+        query_tolerance (float): Allowed extra queries per request
+
+    Returns:
+        list: A description of each metric that regressed
+    """
+    regressions = []
+    for metric, higher_is_better in BASELINE_METRICS.items():
+        if metric not in baseline:
+            continue
+        expected, actual = baseline[metric], result[metric]
+        if metric == 'queries':
+            regressed = actual > expected + query_tolerance
+        elif higher_is_better:
+            regressed = actual < expected * (1 - tolerance)
+        else:
+            regressed = actual > expected * (1 + tolerance)
+        if regressed:
+            regressions.append(f"{metric} {actual} (baseline {expected})")
+    return regressions
@@ -0,0 +1,147 @@
+"""
+Benchmark scenarios: the pages and actions the runner drives.
+
+Each worker creates its own scenario instance with its own test client, so
+a scenario may keep per-visitor state, such as the cart line it updates.
+``request`` makes one request and returns the response; the runner counts
+any status other than ``expected_status`` as an error.
+"""
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from store.cart import CART_SESSION_KEY
+from store.models import CartItem, Product
+
+BENCHMARK_ADMIN = 'benchmark-admin'
+
+
+class Scenario:
+    """
+    A page or action to benchmark.
+
+    Attributes:
+        name (str): Name used on the command line and in baselines
+        expected_status (int): Status code of a successful request
+    """
+
+    name = None
+    expected_status = 200
+
+    def __init__(self, client, dataset, rng):
+        self.client = client
+        self.dataset = dataset
+        self.rng = rng
+
+    @classmethod
+    def prepare(cls, dataset):
+        """Set up shared state once, before the workers start."""
+
+    def random_product_id(self):
+        return self.rng.choice(self.dataset.product_ids)
+
+    def request(self):
+        raise NotImplementedError
+
+
+class ShopScenario(Scenario):
+    """Browse the first pages of the shop."""
+
+    name = 'shop'
+    pages = 20
+
+    def request(self):
+        return self.client.get(reverse('shop'), {'page': self.rng.randint(1, self.pages)})
+
+
+class ProductDetailScenario(Scenario):
+    """View a random product."""
+
+    name = 'product_detail'
+
+    def request(self):
+        return self.client.get(reverse('product_detail', args=[self.random_product_id()]))
+
+
+class SearchScenario(Scenario):
+    """Search for a common product word or phrase."""
+
+    name = 'search'
+
+    def request(self):
+        return self.client.get(reverse('search_products'), {'query': self.rng.choice(self.dataset.search_queries)})
+
+
+class CartAddScenario(Scenario):
+    """Add a random product to the visitor's cart."""
+
+    name = 'cart_add'
+    expected_status = 302
+
+    def request(self):
+        return self.client.post(reverse('add_to_cart', args=[self.random_product_id()]), {'quantity': 1})
+
+
+class CartUpdateScenario(Scenario):
+    """Change the quantity of a line in the visitor's cart."""
+
+    name = 'cart_update'
+
+    def __init__(self, client, dataset, rng):
+        super().__init__(client, dataset, rng)
+        product_id = self.random_product_id()
+        self.client.post(reverse('add_to_cart', args=[product_id]), {'quantity': 1})
+        cart_id = self.client.session.get(CART_SESSION_KEY)
+        if cart_id is None:
+            # Cookie carts key their lines by product
+            self.item_id = product_id
+        else:
+            self.item_id = CartItem.objects.get(cart_id=cart_id, product_id=product_id).pk
+
+    def request(self):
+        return self.client.post(
+            reverse('update_cart_item', args=[self.item_id]),
+            {'quantity': self.rng.randint(1, 9)},
+        )
+
+
+class AdminSaveScenario(Scenario):
+    """Save a product's details in the admin."""
+
+    name = 'admin_save'
+    expected_status = 302
+    products = 50
+
+    @classmethod
+    def prepare(cls, dataset):
+        user_model = get_user_model()
+        if not user_model.objects.filter(username=BENCHMARK_ADMIN).exists():
+            user_model.objects.create_superuser(BENCHMARK_ADMIN, 'benchmark@example.com', None)
+
+    def __init__(self, client, dataset, rng):
+        super().__init__(client, dataset, rng)
+        self.client.force_login(get_user_model().objects.get(username=BENCHMARK_ADMIN))
+        # Loaded up front, so reading the form values is not timed
+        product_ids = rng.sample(dataset.product_ids, min(self.products, len(dataset.product_ids)))
+        self.forms = list(
+            Product.objects.filter(pk__in=product_ids).order_by('pk').values('pk', 'sku', 'name', 'description', 'price')
+        )
+
+    def request(self):
+        data = dict(self.rng.choice(self.forms))
+        product_id = data.pop('pk')
+        data.update(stock=self.rng.randint(0, 500), _save='Save')
+        return self.client.post(reverse('admin:store_product_change', args=[product_id]), data)
+
+
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in [
+        ShopScenario,
+        ProductDetailScenario,
+        SearchScenario,
+        CartAddScenario,
+        CartUpdateScenario,
+        AdminSaveScenario,
+    ]
+}
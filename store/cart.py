@@ -0,0 +1,878 @@
+"""
+Cart helpers for the store application.
+
+This module owns the link between a visitor's session and their shopping
+cart. Read-only pages go through ``LazyCart`` so that rendering the navbar
+badge never creates a cart or writes the session; only views that actually
+change the cart call ``get_or_create_cart``.
+
+Cart mutations are single statements keyed on the cart id from the session,
+so concurrent requests for the same cart cannot lose each other's updates.
+Each line copies its product's price into ``unit_price``, and every mutation
+adds its change to the cart's ``item_count`` and ``subtotal`` columns in the
+same transaction, as a relative ``UPDATE``. The badge and the totals after a
+change are then read from the cart row alone (see ``CartTotals``);
+``manage.py verify_cart_totals`` finds and repairs any drift.
+
+Views go through a cart storage returned by ``get_cart_storage``. With the
+default ``CART_STORAGE = 'database'`` carts live in ``Cart`` rows found
+through the session. With ``CART_STORAGE = 'cookie'``, anonymous visitors'
+carts are kept in a signed cookie instead, so shopping writes neither the
+session nor the cart tables; the cart is promoted to a ``Cart`` row at
+login, at checkout, or when it outgrows the cookie.
+
+Async views use the ``a``-prefixed counterparts (``aget_cart_storage``,
+``aget_cart_summary``, ``arefresh_cart_summary`` and the storages' ``a*``
+methods), which read through Django's async ORM. Mutations that need a
+transaction or a raw upsert run the sync code in a thread.
+``aload_cart_context`` loads the session, user and badge count up front,
+so the ``cart`` template context never queries from the event loop.
+"""
+
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import (
+    Case, DecimalField, ExpressionWrapper, F, IntegerField, OuterRef, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Cart, CartItem, Product
+from .routers import pin_primary
+
+# Session keys used to track the visitor's cart
+CART_SESSION_KEY = 'cart_id'
+CART_COUNT_SESSION_KEY = 'cart_item_count'
+
+
+def get_cart(request):
+    """
+    Get the current cart from the session without creating one.
+
+    Args:
+        request: The HTTP request object
+
+    Returns:
+        Cart: The visitor's cart, or None if they do not have one yet
+    """
+    cart_id = request.session.get(CART_SESSION_KEY)
+    if not cart_id:
+        return None
+    return Cart.objects.filter(id=cart_id).first()
+
+
+def get_or_create_cart(request):
+    """
+    Get the current cart from the session or create a new one.
+
+    Only views that mutate the cart should call this, since it may insert a
+    ``Cart`` row and write the session.
+
+    Args:
+        request: The HTTP request object
+
+    Returns:
+        Cart: The visitor's cart
+    """
+    cart = get_cart(request)
+    if cart is None:
+        cart = _create_cart(request)
+    return cart
+
+
+def _create_cart(request):
+    """Create an empty cart and remember it in the session."""
+    cart = Cart.objects.create()
+    request.session[CART_SESSION_KEY] = cart.id
+    request.session[CART_COUNT_SESSION_KEY] = 0
+    return cart
+
+
+def _adjust_totals(cart_id, item_count, subtotal):
+    """
+    Add a change to a cart's stored totals and bump its ``updated_at``.
+
+    The ``UPDATE`` is relative, so concurrent changes to the same cart add
+    up instead of overwriting each other. ``prune_carts`` relies on the
+    timestamp, since line changes do not save the cart itself.
+
+    Args:
+        cart_id (int): The cart that changed
+        item_count (int): Change in total quantity
+        subtotal (Decimal): Change in subtotal
+    """
+    Cart.objects.filter(pk=cart_id).update(
+        item_count=F('item_count') + item_count,
+        subtotal=F('subtotal') + subtotal,
+        updated_at=timezone.now(),
+    )
+
+
+def _upsert_item(cart_id, product_id, quantity):
+    """
+    Add to a cart line in one statement, creating the line if needed.
+
+    Inserting from a ``SELECT`` on the product table means nothing is
+    inserted when the product does not exist. A new line copies the
+    product's price. Must be called inside a transaction, since the cart's
+    totals are updated by a second statement.
+
+    Returns:
+        bool: True if a line was inserted or updated
+    """
+    qn = connection.ops.quote_name
+    item_table = qn(CartItem._meta.db_table)
+    cart_column = qn(CartItem._meta.get_field('cart').column)
+    product_column = qn(CartItem._meta.get_field('product').column)
+    sql = (
+        f"INSERT INTO {item_table} ({cart_column}, {product_column}, quantity, unit_price) "
+        f"SELECT %s, id, %s, price FROM {qn(Product._meta.db_table)} WHERE id = %s "
+        f"ON CONFLICT ({cart_column}, {product_column}) "
+        f"DO UPDATE SET quantity = {item_table}.quantity + excluded.quantity "
+        f"RETURNING unit_price"
+    )
+    pin_primary()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [cart_id, quantity, product_id])
+        row = cursor.fetchone()
+    if row is None:
+        return False
+    # SQLite returns decimals as floats or strings
+    unit_price = Decimal(str(row[0])).quantize(Decimal('0.01'))
+    _adjust_totals(cart_id, quantity, unit_price * quantity)
+    return True
+
+
+def add_item(request, product_id, quantity):
+    """
+    Add a quantity of a product to the visitor's cart.
+
+    The cart line is inserted or incremented with a single
+    ``INSERT ... ON CONFLICT DO UPDATE`` statement, and the cart's totals
+    with a second one. A cart is created on first use; if the session
+    refers to a cart that no longer exists, a new one replaces it.
+
+    Args:
+        request: The HTTP request object
+        product_id (int): The product to add
+        quantity (int): How many to add
+
+    Returns:
+        int: The cart id, or None if the product does not exist
+    """
+    cart_id = request.session.get(CART_SESSION_KEY) or _create_cart(request).id
+    try:
+        with transaction.atomic():
+            added = _upsert_item(cart_id, product_id, quantity)
+    except IntegrityError:
+        # The session's cart was deleted, so the cart foreign key failed
+        cart_id = _create_cart(request).id
+        with transaction.atomic():
+            added = _upsert_item(cart_id, product_id, quantity)
+    return cart_id if added else None
+
+
+def set_item_quantity(cart_id, item_id, quantity):
+    """
+    Set a cart line's quantity, deleting it at zero.
+
+    Args:
+        cart_id (int): The visitor's cart id
+        item_id (int): The cart line to change
+        quantity (int): The new quantity
+
+    Returns:
+        bool: True if the line belongs to the cart
+    """
+    return set_item_quantities(cart_id, {item_id: quantity})
+
+
+def set_item_quantities(cart_id, quantities):
+    """
+    Apply many quantity changes to a cart in one transaction.
+
+    The lines are locked and their current quantities read first, so the
+    change to the cart's totals is known. Lines set to zero are then removed
+    with one ``DELETE``, the rest are updated with one ``UPDATE ... CASE``,
+    and the totals with one relative ``UPDATE``. Either every change is
+    applied or, if any line does not belong to the cart, none is.
+
+    Args:
+        cart_id (int): The visitor's cart id
+        quantities (dict): New quantity for each cart line id
+
+    Returns:
+        bool: True if every line belongs to the cart
+    """
+    removed = [item_id for item_id, quantity in quantities.items() if quantity <= 0]
+    changed = {item_id: quantity for item_id, quantity in quantities.items() if quantity > 0}
+    with transaction.atomic():
+        lines = CartItem.objects.filter(cart_id=cart_id)
+        current = {
+            item_id: (quantity, unit_price)
+            for item_id, quantity, unit_price in lines.filter(id__in=quantities)
+            .select_for_update().values_list('id', 'quantity', 'unit_price')
+        }
+        if len(current) != len(quantities):
+            return False
+        if removed:
+            lines.filter(id__in=removed).delete()
+        if changed:
+            lines.filter(id__in=changed).update(quantity=Case(
+                *[When(id=item_id, then=Value(quantity)) for item_id, quantity in changed.items()],
+                output_field=IntegerField(),
+            ))
+        item_count = subtotal = 0
+        for item_id, (quantity, unit_price) in current.items():
+            difference = max(quantities[item_id], 0) - quantity
+            item_count += difference
+            subtotal += unit_price * difference
+        _adjust_totals(cart_id, item_count, subtotal)
+    return True
+
+
+def remove_item(cart_id, item_id):
+    """
+    Remove a line from a cart.
+
+    Args:
+        cart_id (int): The visitor's cart id
+        item_id (int): The cart line to remove
+
+    Returns:
+        str: The removed product's name, or None if the line was not found
+    """
+    lines = CartItem.objects.filter(id=item_id, cart_id=cart_id)
+    with transaction.atomic():
+        # No join, so only the cart line is locked and product writes
+        # (saves, stock reservations, imports) are not blocked
+        line = lines.select_for_update().values_list('quantity', 'unit_price', 'product_id').first()
+        if line is None:
+            return None
+        quantity, unit_price, product_id = line
+        lines.delete()
+        _adjust_totals(cart_id, -quantity, -unit_price * quantity)
+    return Product.objects.filter(pk=product_id).values_list('name', flat=True).first() or ''
+
+
+def clear_items(cart_id):
+    """Remove every line from a cart and zero its totals."""
+    with transaction.atomic():
+        # Zeroing the cart row first locks it, so a concurrent add either
+        # committed before the DELETE below (which then removes its line) or
+        # adds its line and quantity after this transaction.
+        Cart.objects.filter(pk=cart_id).update(item_count=0, subtotal=0, updated_at=timezone.now())
+        CartItem.objects.filter(cart_id=cart_id).delete()
+
+
+def reprice_lines(product_ids):
+    """
+    Copy products' current prices onto the cart lines holding them.
+
+    Each affected cart's subtotal is adjusted by the difference in the same
+    transaction. Called when products are saved or imported, so carts keep
+    showing current prices.
+
+    Args:
+        product_ids (list): The products whose price may have changed
+
+    Returns:
+        int: Number of cart lines repriced
+    """
+    stale = CartItem.objects.filter(product_id__in=product_ids).exclude(unit_price=F('product__price'))
+    differences = (
+        stale.filter(cart_id=OuterRef('pk'))
+        .values('cart_id')
+        .annotate(difference=Sum(
+            (F('product__price') - F('unit_price')) * F('quantity'),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ))
+        .values('difference')
+    )
+    with transaction.atomic():
+        Cart.objects.filter(pk__in=stale.values('cart_id')).update(
+            subtotal=F('subtotal') + Subquery(differences),
+        )
+        return stale.update(
+            unit_price=Subquery(Product.objects.filter(pk=OuterRef('product_id')).values('price')),
+        )
+
+
+def recompute_totals(cart_ids):
+    """
+    Recalculate carts' stored totals from their lines.
+
+    The carts are locked first, so changes committed by concurrent requests
+    are counted once: either they are already in the lines, or their
+    relative update is applied on top of the recomputed totals.
+
+    Args:
+        cart_ids (list): The carts to repair
+    """
+    lines = CartItem.objects.filter(cart_id=OuterRef('pk')).values('cart_id')
+    with transaction.atomic():
+        list(Cart.objects.filter(pk__in=cart_ids).select_for_update().values_list('pk', flat=True))
+        Cart.objects.filter(pk__in=cart_ids).update(
+            item_count=Coalesce(Subquery(lines.annotate(total=Sum('quantity')).values('total')), 0),
+            subtotal=Coalesce(
+                Subquery(lines.annotate(total=Sum(
+                    F('unit_price') * F('quantity'),
+                    output_field=DecimalField(max_digits=12, decimal_places=2),
+                )).values('total')),
+                Value(Decimal('0.00')),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            ),
+        )
+
+
+class CartSummary:
+    """
+    Lines, quantities and totals of a cart, loaded with a single query.
+
+    Each line is a ``CartItem`` with its ``product`` already selected and a
+    ``line_total`` annotation computed by the database from the line's
+    ``unit_price``, so templates and JSON responses can read every figure
+    without further queries.
+
+    Attributes:
+        lines (list): The cart items, in the order they were added
+        item_count (int): Total quantity across all lines
+        total_price (Decimal): Sum of all line totals
+    """
+
+    def __init__(self, lines):
+        self.lines = list(lines)
+        self.item_count = sum(line.quantity for line in self.lines)
+        self.total_price = sum(
+            (line.line_total for line in self.lines), Decimal('0.00')
+        )
+
+    @classmethod
+    def for_cart(cls, cart_id):
+        """
+        Build the summary for a cart.
+
+        Args:
+            cart_id: Primary key of the cart, or None for an empty summary
+
+        Returns:
+            CartSummary: The summary of the cart's contents
+        """
+        if not cart_id:
+            return cls([])
+        return cls(cls.lines_for_cart(cart_id))
+
+    @classmethod
+    async def afor_cart(cls, cart_id):
+        """Async version of ``for_cart``."""
+        if not cart_id:
+            return cls([])
+        return cls([line async for line in cls.lines_for_cart(cart_id)])
+
+    @staticmethod
+    def lines_for_cart(cart_id):
+        """Build the single query loading a cart's lines and line totals."""
+        return (
+            CartItem.objects.filter(cart_id=cart_id)
+            .select_related('product')
+            .annotate(line_total=ExpressionWrapper(
+                F('unit_price') * F('quantity'),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            ))
+            .order_by('id')
+        )
+
+    @classmethod
+    def for_quantities(cls, quantities):
+        """
+        Build the summary of a cart that is not stored in the database.
+
+        Lines are unsaved ``CartItem`` instances whose id is the product id.
+        Products that no longer exist are left out.
+
+        Args:
+            quantities (dict): Quantity of each product id, in cart order
+
+        Returns:
+            CartSummary: The summary of the cart's contents
+        """
+        return cls.from_products(quantities, Product.objects.in_bulk(list(quantities)))
+
+    @classmethod
+    async def afor_quantities(cls, quantities):
+        """Async version of ``for_quantities``."""
+        return cls.from_products(quantities, await Product.objects.ain_bulk(list(quantities)))
+
+    @classmethod
+    def from_products(cls, quantities, products):
+        """Build cookie cart lines from already loaded products."""
+        lines = []
+        for product_id, quantity in quantities.items():
+            product = products.get(product_id)
+            if product is not None:
+                line = CartItem(id=product_id, product=product, quantity=quantity, unit_price=product.price)
+                line.line_total = product.price * quantity
+                lines.append(line)
+        return cls(lines)
+
+
+class CartTotals:
+    """
+    Item count and total of a database cart, read from its ``Cart`` row.
+
+    Enough for the badge and the JSON responses to cart changes, in one
+    single-row query. ``lines`` loads the full ``CartSummary`` on first use.
+
+    Attributes:
+        item_count (int): Total quantity across all lines
+        total_price (Decimal): Sum of all line totals
+    """
+
+    def __init__(self, cart_id, item_count=0, total_price=Decimal('0.00')):
+        self.cart_id = cart_id
+        self.item_count = item_count
+        self.total_price = total_price
+        self._summary = None
+
+    @classmethod
+    def for_cart(cls, cart_id):
+        """
+        Read a cart's stored totals.
+
+        Args:
+            cart_id: Primary key of the cart, or None for an empty cart
+
+        Returns:
+            CartTotals: The cart's totals, empty if the cart does not exist
+        """
+        row = Cart.objects.filter(pk=cart_id).values_list('item_count', 'subtotal').first() if cart_id else None
+        return cls(cart_id, *row) if row else cls(cart_id)
+
+    @classmethod
+    async def afor_cart(cls, cart_id):
+        """Async version of ``for_cart``."""
+        if not cart_id:
+            return cls(cart_id)
+        row = await Cart.objects.filter(pk=cart_id).values_list('item_count', 'subtotal').afirst()
+        return cls(cart_id, *row) if row else cls(cart_id)
+
+    @property
+    def lines(self):
+        if self._summary is None:
+            self._summary = CartSummary.for_cart(self.cart_id)
+        return self._summary.lines
+
+
+class DatabaseCartStorage:
+    """
+    Cart stored in ``Cart`` and ``CartItem`` rows, found through the session.
+
+    Line ids are ``CartItem`` ids.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        # Count read from the cart row for sessions that do not store one
+        self._stored_count = None
+
+    @property
+    def cart_id(self):
+        return self.request.session.get(CART_SESSION_KEY)
+
+    def item_count(self):
+        """Get the cart's total quantity, preferably from the session."""
+        item_count = self.request.session.get(CART_COUNT_SESSION_KEY)
+        if item_count is None:
+            # Sessions created before the count was tracked fall back to the
+            # cart row, once per request, but are not written to from a
+            # read-only page.
+            if self._stored_count is None:
+                self._stored_count = CartTotals.for_cart(self.cart_id).item_count
+            item_count = self._stored_count
+        return item_count
+
+    def summary(self):
+        return CartSummary.for_cart(self.cart_id)
+
+    def refresh(self):
+        """
+        Read the cart's totals after a mutation and store its count.
+
+        The mutation already updated the totals and ``updated_at`` on the
+        cart row, so this is a single-row query.
+        """
+        totals = CartTotals.for_cart(self.cart_id)
+        if self.cart_id and self.request.session.get(CART_COUNT_SESSION_KEY) != totals.item_count:
+            self.request.session[CART_COUNT_SESSION_KEY] = totals.item_count
+        return totals
+
+    def add(self, product_id, quantity):
+        return add_item(self.request, product_id, quantity) is not None
+
+    def set_quantity(self, item_id, quantity):
+        return bool(self.cart_id) and set_item_quantity(self.cart_id, item_id, quantity)
+
+    def set_quantities(self, quantities):
+        return bool(self.cart_id) and set_item_quantities(self.cart_id, quantities)
+
+    def remove(self, item_id):
+        return remove_item(self.cart_id, item_id) if self.cart_id else None
+
+    def clear(self):
+        if self.cart_id:
+            clear_items(self.cart_id)
+
+    def promote(self):
+        """Make sure the cart exists in the database."""
+        get_or_create_cart(self.request)
+        return self
+
+    def update_response(self, response):
+        pass
+
+    async def aitem_count(self):
+        item_count = self.request.session.get(CART_COUNT_SESSION_KEY)
+        if item_count is None:
+            if self._stored_count is None:
+                self._stored_count = (await CartTotals.afor_cart(self.cart_id)).item_count
+            item_count = self._stored_count
+        return item_count
+
+    async def asummary(self):
+        return await CartSummary.afor_cart(self.cart_id)
+
+    async def arefresh(self):
+        totals = await CartTotals.afor_cart(self.cart_id)
+        if self.cart_id and self.request.session.get(CART_COUNT_SESSION_KEY) != totals.item_count:
+            self.request.session[CART_COUNT_SESSION_KEY] = totals.item_count
+        return totals
+
+    # Mutations update the lines and the cart's totals in one transaction,
+    # which the async ORM cannot open, so they run in a thread.
+
+    async def aadd(self, product_id, quantity):
+        return await sync_to_async(self.add)(product_id, quantity)
+
+    async def aset_quantity(self, item_id, quantity):
+        return await sync_to_async(self.set_quantity)(item_id, quantity)
+
+    async def aset_quantities(self, quantities):
+        return await sync_to_async(self.set_quantities)(quantities)
+
+    async def aremove(self, item_id):
+        return await sync_to_async(self.remove)(item_id)
+
+    async def aclear(self):
+        await sync_to_async(self.clear)()
+
+
+class CookieCartStorage:
+    """
+    Anonymous visitor's cart kept in a signed cookie.
+
+    The cookie holds ``product_id:quantity`` pairs, so reading the cart
+    costs one product query and changing it touches neither the database
+    nor the session. Line ids are product ids. ``CartCookieMiddleware``
+    writes the cookie back when the cart changes.
+    """
+
+    salt = 'store.cart'
+
+    def __init__(self, request):
+        self.request = request
+        self.cookie_name = getattr(settings, 'CART_COOKIE_NAME', 'cart')
+        self.quantities = self.decode(request.get_signed_cookie(self.cookie_name, default='', salt=self.salt))
+        self.modified = False
+
+    @staticmethod
+    def decode(value):
+        """Parse ``"12:1,15:3"`` into ``{12: 1, 15: 3}``, skipping bad pairs."""
+        quantities = {}
+        for pair in value.split(','):
+            product_id, _, quantity = pair.partition(':')
+            if product_id.isdigit() and quantity.isdigit() and int(quantity) > 0:
+                quantities[int(product_id)] = int(quantity)
+        return quantities
+
+    @staticmethod
+    def encode(quantities):
+        return ','.join(f"{product_id}:{quantity}" for product_id, quantity in quantities.items())
+
+    @property
+    def cart_id(self):
+        return None
+
+    def item_count(self):
+        return sum(self.quantities.values())
+
+    def summary(self):
+        return CartSummary.for_quantities(self.quantities)
+
+    def refresh(self):
+        return self.summary()
+
+    def add(self, product_id, quantity):
+        if product_id not in self.quantities:
+            if len(self.quantities) >= getattr(settings, 'CART_COOKIE_MAX_LINES', 100):
+                # Too many lines for a cookie; carry on in the database
+                return self.promote().add(product_id, quantity)
+            if not Product.objects.filter(pk=product_id).exists():
+                return False
+        return self._add_line(product_id, quantity)
+
+    def _add_line(self, product_id, quantity):
+        self.quantities[product_id] = self.quantities.get(product_id, 0) + quantity
+        self.modified = True
+        return True
+
+    def set_quantity(self, item_id, quantity):
+        return self.set_quantities({item_id: quantity})
+
+    def set_quantities(self, quantities):
+        if any(item_id not in self.quantities for item_id in quantities):
+            return False
+        for item_id, quantity in quantities.items():
+            if quantity > 0:
+                self.quantities[item_id] = quantity
+            else:
+                del self.quantities[item_id]
+        self.modified = True
+        return True
+
+    def remove(self, item_id):
+        if item_id not in self.quantities:
+            return None
+        del self.quantities[item_id]
+        self.modified = True
+        return Product.objects.filter(pk=item_id).values_list('name', flat=True).first() or ''
+
+    def clear(self):
+        self.quantities = {}
+        self.modified = True
+
+    def promote(self):
+        """
+        Move the cart into the database and drop the cookie.
+
+        Lines are merged into the session's existing cart, if there is one.
+        Products that no longer exist are skipped.
+
+        Returns:
+            DatabaseCartStorage: The storage to use from now on
+        """
+        storage = DatabaseCartStorage(self.request)
+        cart_id = get_or_create_cart(self.request).id
+        with transaction.atomic():
+            for product_id, quantity in self.quantities.items():
+                _upsert_item(cart_id, product_id, quantity)
+        self.clear()
+        self.request._cart_storage = storage
+        self.request._cart_summary = storage.refresh()
+        return storage
+
+    def update_response(self, response):
+        """Write the cart cookie if the cart changed during the request."""
+        if not self.modified:
+            return
+        if self.quantities:
+            response.set_signed_cookie(
+                self.cookie_name,
+                self.encode(self.quantities),
+                salt=self.salt,
+                max_age=getattr(settings, 'CART_COOKIE_AGE', 60 * 60 * 24 * 30),
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite='Lax',
+            )
+        elif self.cookie_name in self.request.COOKIES:
+            response.delete_cookie(self.cookie_name, samesite='Lax')
+
+    async def aitem_count(self):
+        return self.item_count()
+
+    async def asummary(self):
+        return await CartSummary.afor_quantities(self.quantities)
+
+    async def arefresh(self):
+        return await self.asummary()
+
+    async def aadd(self, product_id, quantity):
+        if product_id not in self.quantities:
+            if len(self.quantities) >= getattr(settings, 'CART_COOKIE_MAX_LINES', 100):
+                storage = await sync_to_async(self.promote)()
+                return await storage.aadd(product_id, quantity)
+            if not await Product.objects.filter(pk=product_id).aexists():
+                return False
+        return self._add_line(product_id, quantity)
+
+    async def aset_quantity(self, item_id, quantity):
+        return self.set_quantity(item_id, quantity)
+
+    async def aset_quantities(self, quantities):
+        return self.set_quantities(quantities)
+
+    async def aremove(self, item_id):
+        if item_id not in self.quantities:
+            return None
+        del self.quantities[item_id]
+        self.modified = True
+        return await Product.objects.filter(pk=item_id).values_list('name', flat=True).afirst() or ''
+
+    async def aclear(self):
+        self.clear()
+
+
+def get_cart_storage(request):
+    """
+    Get the storage holding the visitor's cart, memoized for the request.
+
+    Anonymous visitors get a ``CookieCartStorage`` when ``CART_STORAGE`` is
+    ``'cookie'`` and their cart has not been promoted to the database yet;
+    everyone else gets a ``DatabaseCartStorage``.
+
+    Args:
+        request: The HTTP request object
+
+    Returns:
+        The ``DatabaseCartStorage`` or ``CookieCartStorage`` for the request
+    """
+    if not hasattr(request, '_cart_storage'):
+        user = getattr(request, 'user', None)
+        if (
+            getattr(settings, 'CART_STORAGE', 'database') == 'cookie'
+            and not (user and user.is_authenticated)
+            and CART_SESSION_KEY not in request.session
+        ):
+            request._cart_storage = request._cart_cookie = CookieCartStorage(request)
+        else:
+            request._cart_storage = DatabaseCartStorage(request)
+    return request._cart_storage
+
+
+async def aload_cart_context(request):
+    """
+    Load what the cart helpers read from the request, without blocking.
+
+    The session and the user are loaded through their async APIs and cached
+    where the sync accessors look for them, and the badge count is
+    resolved and kept on the storage. Afterwards ``get_cart_storage`` and
+    the ``cart`` template context can be used from an async view without
+    touching the database.
+
+    Args:
+        request: The HTTP request object
+    """
+    await (await aget_cart_storage(request)).aitem_count()
+
+
+async def aget_cart_storage(request):
+    """
+    Async version of ``get_cart_storage``.
+
+    Args:
+        request: The HTTP request object
+
+    Returns:
+        The ``DatabaseCartStorage`` or ``CookieCartStorage`` for the request
+    """
+    if not hasattr(request, '_cart_storage'):
+        await request.session.aget(CART_SESSION_KEY)
+        if hasattr(request, 'auser'):
+            request._cached_user = await request.auser()
+    return get_cart_storage(request)
+
+
+def promote_cart(request):
+    """
+    Make sure the visitor's cart is stored in the database.
+
+    Called at login and before checkout. A cookie cart is moved into a
+    ``Cart`` row; a database cart is created if needed.
+
+    Args:
+        request: The HTTP request object
+
+    Returns:
+        int: The id of the visitor's ``Cart``
+    """
+    cookie_cart = getattr(request, '_cart_cookie', None)
+    if cookie_cart is None and getattr(settings, 'CART_STORAGE', 'database') == 'cookie':
+        # The visitor may have just logged in with a cart in the cookie
+        cookie_cart = request._cart_cookie = CookieCartStorage(request)
+    if cookie_cart is not None and cookie_cart.quantities:
+        storage = cookie_cart.promote()
+    else:
+        storage = DatabaseCartStorage(request).promote()
+        request._cart_storage = storage
+    return storage.cart_id
+
+
+def get_cart_summary(request):
+    """
+    Get the summary of the visitor's cart, memoized for the request.
+
+    Args:
+        request: The HTTP request object
+
+    Returns:
+        CartSummary: The summary of the visitor's cart
+    """
+    if not hasattr(request, '_cart_summary'):
+        request._cart_summary = get_cart_storage(request).summary()
+    return request._cart_summary
+
+
+def refresh_cart_summary(request):
+    """
+    Rebuild the cart summary after a mutation.
+
+    The fresh summary replaces the request's memoized one. For database
+    carts it is a ``CartTotals`` read from the cart row, whose lines are
+    only loaded if used, and its item count is stored in the session so
+    read-only pages can render the navbar badge without querying the cart
+    tables. Call this after every cart mutation.
+
+    Args:
+        request: The HTTP request object
+
+    Returns:
+        CartSummary or CartTotals: The updated summary of the cart
+    """
+    summary = get_cart_storage(request).refresh()
+    request._cart_summary = summary
+    return summary
+
+
+async def aget_cart_summary(request):
+    """Async version of ``get_cart_summary``."""
+    if not hasattr(request, '_cart_summary'):
+        request._cart_summary = await (await aget_cart_storage(request)).asummary()
+    return request._cart_summary
+
+
+async def arefresh_cart_summary(request):
+    """Async version of ``refresh_cart_summary``."""
+    summary = await (await aget_cart_storage(request)).arefresh()
+    request._cart_summary = summary
+    return summary
+
+
+class LazyCart:
+    """
+    Template-facing stand-in for the visitor's cart.
+
+    Templates only read ``item_count``, which is answered from the session
+    or the cart cookie, so rendering a page neither creates a cart nor
+    writes the session.
+    """
+
+    def __init__(self, request):
+        self._request = request
+
+    @property
+    def item_count(self):
+        """Get the total number of items in the cart for the badge."""
+        return get_cart_storage(self._request).item_count()
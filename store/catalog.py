@@ -0,0 +1,73 @@
+"""
+Catalog versioning for the store application.
+
+The catalog version is read from the database: the newest
+``Product.updated_at`` together with the number of products deleted so
+far. Saving a product or one of its images moves ``updated_at`` forward
+(see ``store.signals``), imports and the image upload worker set it as
+well, and deleting a product bumps the deletion counter in
+``CatalogState``. Both are read with index lookups, so the version costs
+the same however large the catalog is. Every process, whether a web
+worker, the upload worker or a management command, sees the same version
+without relying on a shared cache. Page validators and per-process
+structures built from the catalog compare their version with it to know
+when to rebuild.
+
+Products deleted with raw SQL, bypassing ``post_delete``, do not change
+the version.
+"""
+
+from django.db.models import F, Max
+
+from .models import CatalogState, Product
+
+STATE_ID = 1
+
+
+def _format_version(latest, deletions):
+    stamp = int(latest.timestamp() * 1_000_000) if latest else 0
+    return f"{stamp}.{deletions or 0}"
+
+
+def _deletions():
+    return CatalogState.objects.filter(pk=STATE_ID).values_list('product_deletions', flat=True)
+
+
+def get_catalog_state():
+    """
+    Get the parts the catalog version is made of.
+
+    Two index lookups: the ``updated_at`` index answers the maximum, and the
+    deletion counter is read by primary key.
+
+    Returns:
+        tuple: The newest ``Product.updated_at`` (None for an empty
+        catalog) and the number of products deleted so far
+    """
+    latest = Product.objects.aggregate(latest=Max('updated_at'))['latest']
+    return latest, _deletions().first() or 0
+
+
+def get_catalog_version():
+    """
+    Get the current catalog version.
+
+    Returns:
+        str: A value that changes whenever a product is added, changed or
+        deleted
+    """
+    return _format_version(*get_catalog_state())
+
+
+async def aget_catalog_version():
+    """Async version of ``get_catalog_version``."""
+    latest = (await Product.objects.aaggregate(latest=Max('updated_at')))['latest']
+    return _format_version(latest, await _deletions().afirst())
+
+
+def record_product_deletion():
+    """Move the catalog version on after a product is deleted."""
+    counter = CatalogState.objects.filter(pk=STATE_ID)
+    if not counter.update(product_deletions=F('product_deletions') + 1):
+        CatalogState.objects.bulk_create([CatalogState(pk=STATE_ID)], ignore_conflicts=True)
+        counter.update(product_deletions=F('product_deletions') + 1)
@@ -0,0 +1,150 @@
+"""
+Conditional GET support for the catalog pages.
+
+``ConditionalGetMixin`` gives class-based views an ETag (and optionally a
+Last-Modified date) computed from cheap version data *before* the page is
+built, so a browser or proxy revalidating an unchanged page gets a
+``304 Not Modified`` without the view querying products or rendering a
+template.
+
+The ETag also covers what differs between visitors on these pages: the
+navbar cart count and the CSRF cookie embedded in forms. Pages for
+visitors without any session, cart or CSRF cookie are identical, so they
+are marked ``public`` for a short time and a shared cache can serve them to
+every such visitor; everyone else gets ``private, no-cache`` and
+revalidates against the ETag.
+
+Function views (including the async ones in ``store.async_views``) use
+``check_conditional`` and ``finish_conditional`` directly.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .cart import get_cart_storage
+
+
+def has_visitor_state(request):
+    """
+    Check whether a request carries anything that personalizes the page.
+
+    Args:
+        request: The HTTP request object
+
+    Returns:
+        bool: True if the visitor has a session, cart or CSRF cookie
+    """
+    cookies = request.COOKIES
+    return any(name in cookies for name in (
+        settings.SESSION_COOKIE_NAME,
+        settings.CSRF_COOKIE_NAME,
+        getattr(settings, 'CART_COOKIE_NAME', 'cart'),
+    ))
+
+
+def get_visitor_key(request):
+    """
+    Describe the parts of a catalog page that differ between visitors.
+
+    Args:
+        request: The HTTP request object
+
+    Returns:
+        str: The visitor's cart count and CSRF cookie, or an empty string
+        for visitors without any state
+    """
+    if not has_visitor_state(request):
+        return ''
+    return '|'.join([
+        str(get_cart_storage(request).item_count()),
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+    ])
+
+
+def check_conditional(request, key, last_modified=None):
+    """
+    Build the validators for a page and check the request's preconditions.
+
+    Args:
+        request: The HTTP request object
+        key (str): A string that changes whenever the page's shared
+            content changes
+        last_modified (datetime): When the content last changed, if known
+
+    Returns:
+        tuple: (etag, timestamp, response), where ``response`` is a 304 (or
+        412) response to return as is, or None if the page must be built
+    """
+    digest = hashlib.md5(f"{key}|{get_visitor_key(request)}".encode()).hexdigest()
+    etag = quote_etag(digest)
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    return etag, timestamp, get_conditional_response(request, etag=etag, last_modified=timestamp)
+
+
+def finish_conditional(request, response, etag, timestamp):
+    """
+    Add the validators and cache headers to a catalog page response.
+
+    Args:
+        request: The HTTP request object
+        response: The built page, or the response from ``check_conditional``
+        etag (str): The page's ETag
+        timestamp (int): The page's Last-Modified timestamp, or None
+
+    Returns:
+        The response
+    """
+    response.headers['ETag'] = etag
+    if timestamp is not None:
+        response.headers['Last-Modified'] = http_date(timestamp)
+    patch_cache_headers(request, response)
+    return response
+
+
+def patch_cache_headers(request, response):
+    """Mark the page public for stateless visitors, private otherwise."""
+
+    def apply(response):
+        # Rendering a form issues a CSRF cookie, which makes the page
+        # specific to this visitor.
+        if has_visitor_state(request) or request.META.get('CSRF_COOKIE_NEEDS_UPDATE'):
+            patch_cache_control(response, private=True, no_cache=True)
+        else:
+            patch_cache_control(response, public=True, max_age=getattr(settings, 'CATALOG_PAGE_MAX_AGE', 60))
+        patch_vary_headers(response, ['Cookie'])
+
+    if hasattr(response, 'add_post_render_callback') and not response.is_rendered:
+        response.add_post_render_callback(apply)
+    else:
+        apply(response)
+
+
+class ConditionalGetMixin:
+    """
+    Answer unchanged GET requests with 304 before doing any view work.
+
+    Views implement ``get_etag_key``, returning a string that changes
+    whenever the page's shared content changes (or None to skip the
+    conditional handling), and may implement ``get_last_modified``.
+    """
+
+    def get_etag_key(self):
+        raise NotImplementedError
+
+    def get_last_modified(self):
+        return None
+
+    def get(self, request, *args, **kwargs):
+        key = self.get_etag_key()
+        if key is None:
+            return super().get(request, *args, **kwargs)
+
+        etag, timestamp, response = check_conditional(request, key, self.get_last_modified())
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        return finish_conditional(request, response, etag, timestamp)
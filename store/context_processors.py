@@ -5,12 +5,15 @@ This module provides context processors that make certain data available
 to all templates in the application.
 """
 
-from .views import get_or_create_cart
+from .cart import LazyCart
 
 def cart(request):
     """
     Make the current cart available to all templates.
     
+    The cart is wrapped in a ``LazyCart`` so that rendering a page does no
+    database or session writes; the badge count is read from the session.
+    
     Args:
         request: The HTTP request object
         
@@ -18,5 +21,5 @@ def cart(request):
         dict: Context data containing the cart
     """
     return {
-        'cart': get_or_create_cart(request)
-    } 
\ No newline at end of file
+        'cart': LazyCart(request)
+    } 
@@ -6,74 +6,48 @@ including validation and processing of uploaded files.
 """
 
 from django import forms
-from .models import Product, ProductImage
-from ecommerce.utils.imagekit_uploader import upload_image_to_imagekit
+from .models import Order, Product, ProductImage
+from ecommerce.utils.image_pipeline import validate_image
+from .uploads import apply_derivatives, enqueue_image_upload, upload_derivatives, uploads_are_async
 import os
-from PIL import Image
-import io
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-class ProductAdminForm(forms.ModelForm):
+class QueuedImageUploadMixin:
     """
-    Form for managing products in the admin interface.
-    
-    This form handles product creation and updates, including
-    primary image upload and processing.
+    Upload a form's image in the background once the instance is saved.
+
+    Forms set ``image_field`` and ``upload_folder``. When background uploads
+    are enabled, ``save`` stores the original image in the upload queue and
+    returns immediately; the worker renders the derivatives (see
+    ``ecommerce.utils.image_pipeline``) and fills in the URLs. Otherwise
+    the same pipeline runs during the request.
     """
-    
-    primary_image_upload = forms.ImageField(
-        required=False,
-        label="Primary Image Upload",
-        widget=forms.FileInput(attrs={'accept': 'image/*'})
-    )
-    
-    class Meta:
-        model = Product
-        fields = ['name', 'description', 'price', 'primary_image_upload']
 
-    def clean_primary_image_upload(self):
+    image_field = None
+    upload_folder = None
+
+    def clean_image(self):
         """
-        Validate and process the uploaded primary image.
+        Validate the uploaded image without decoding it.
         
-        Performs the following validations:
-        - File size (max 5MB)
-        - File type (must be an image)
-        - Image format conversion if necessary
+        Decoding and re-encoding happen later in the image pipeline, off
+        the request thread.
         
         Returns:
-            The processed image file
+            The uploaded image file
             
         Raises:
             forms.ValidationError: If validation fails
         """
-        image = self.cleaned_data.get('primary_image_upload')
+        image = self.cleaned_data.get(self.image_field)
         if image:
-            # Validate file size (e.g., max 5MB)
-            if image.size > 5 * 1024 * 1024:
-                raise forms.ValidationError("Image file too large ( > 5MB )")
-            # Validate file type
-            if not image.content_type.startswith('image/'):
-                raise forms.ValidationError("File type not supported")
-            
-            # Process image to ensure it's in a good format
             try:
-                img = Image.open(image)
-                # Convert to RGB if necessary
-                if img.mode in ('RGBA', 'P'):
-                    img = img.convert('RGB')
-                # Save to bytes
-                output = io.BytesIO()
-                img.save(output, format='JPEG', quality=95)
-                output.seek(0)
-                # Create a new file-like object
-                image.file = output
-            except Exception as e:
-                logger.error(f"Error processing image: {str(e)}")
-                raise forms.ValidationError(f"Error processing image: {str(e)}")
-                
+                validate_image(image)
+            except ValueError as e:
+                raise forms.ValidationError(str(e))
         return image
 
     def save(self, commit=True):
@@ -90,24 +64,70 @@ class ProductAdminForm(forms.ModelForm):
             forms.ValidationError: If image upload fails
         """
         instance = super().save(commit=False)
-        image_file = self.cleaned_data.get('primary_image_upload')
-        if image_file:
+        image_file = self.cleaned_data.get(self.image_field)
+        if not image_file:
+            if commit:
+                instance.save()
+            return instance
+
+        file_name = os.path.basename(image_file.name)
+        if not uploads_are_async():
             try:
-                # Ensure proper file extension
-                file_name = os.path.splitext(image_file.name)[0] + '.jpg'
-                url = upload_image_to_imagekit(image_file, file_name, folder='/products/primary/')
-                if not url:
-                    raise forms.ValidationError("Failed to get image URL from ImageKit")
-                instance.primary_image_url = url
+                image_file.seek(0)
+                urls = upload_derivatives(image_file.read(), file_name, self.upload_folder)
+                apply_derivatives(instance, urls)
             except Exception as e:
                 logger.error(f"Error uploading image: {str(e)}")
                 raise forms.ValidationError(f"Error uploading image: {str(e)}")
+            if commit:
+                instance.save()
+            return instance
+
+        # The job needs the instance's primary key, so it is queued once the
+        # instance has been saved (by the admin via save_m2m when commit=False).
+        def queue_upload():
+            enqueue_image_upload(instance, image_file, file_name, self.upload_folder)
+
         if commit:
             instance.save()
+            queue_upload()
+        else:
+            save_m2m = self.save_m2m
+
+            def save_m2m_and_queue_upload():
+                save_m2m()
+                queue_upload()
+
+            self.save_m2m = save_m2m_and_queue_upload
         return instance
 
 
-class ProductImageAdminForm(forms.ModelForm):
+class ProductAdminForm(QueuedImageUploadMixin, forms.ModelForm):
+    """
+    Form for managing products in the admin interface.
+    
+    This form handles product creation and updates, including
+    primary image upload and processing.
+    """
+    
+    image_field = 'primary_image_upload'
+    upload_folder = '/products/primary/'
+
+    primary_image_upload = forms.ImageField(
+        required=False,
+        label="Primary Image Upload",
+        widget=forms.FileInput(attrs={'accept': 'image/*'})
+    )
+    
+    class Meta:
+        model = Product
+        fields = ['sku', 'name', 'description', 'price', 'stock', 'primary_image_upload']
+
+    def clean_primary_image_upload(self):
+        return self.clean_image()
+
+
+class ProductImageAdminForm(QueuedImageUploadMixin, forms.ModelForm):
     """
     Form for managing additional product images in the admin interface.
     
@@ -115,6 +135,9 @@ class ProductImageAdminForm(forms.ModelForm):
     including validation and proper ordering.
     """
     
+    image_field = 'image_upload'
+    upload_folder = '/products/additional/'
+
     image_upload = forms.ImageField(
         required=True,
         label="Upload Image",
@@ -126,73 +149,29 @@ class ProductImageAdminForm(forms.ModelForm):
         fields = ['product', 'order', 'image_upload']
 
     def clean_image_upload(self):
-        """
-        Validate and process the uploaded product image.
-        
-        Performs the following validations:
-        - File size (max 5MB)
-        - File type (must be an image)
-        - Image format conversion if necessary
-        
-        Returns:
-            The processed image file
-            
-        Raises:
-            forms.ValidationError: If validation fails
-        """
-        image = self.cleaned_data.get('image_upload')
-        if image:
-            # Validate file size (e.g., max 5MB)
-            if image.size > 5 * 1024 * 1024:
-                raise forms.ValidationError("Image file too large ( > 5MB )")
-            # Validate file type
-            if not image.content_type.startswith('image/'):
-                raise forms.ValidationError("File type not supported")
-            
-            # Process image to ensure it's in a good format
-            try:
-                img = Image.open(image)
-                # Convert to RGB if necessary
-                if img.mode in ('RGBA', 'P'):
-                    img = img.convert('RGB')
-                # Save to bytes
-                output = io.BytesIO()
-                img.save(output, format='JPEG', quality=95)
-                output.seek(0)
-                # Create a new file-like object
-                image.file = output
-            except Exception as e:
-                logger.error(f"Error processing image: {str(e)}")
-                raise forms.ValidationError(f"Error processing image: {str(e)}")
-                
-        return image
+        return self.clean_image()
 
-    def save(self, commit=True):
-        """
-        Save the form data and handle image upload.
-        
-        Args:
-            commit (bool): Whether to save the model instance
-            
-        Returns:
-            The saved model instance
-            
-        Raises:
-            forms.ValidationError: If image upload fails
-        """
-        instance = super().save(commit=False)
-        image_file = self.cleaned_data.get('image_upload')
-        if image_file:
-            try:
-                # Ensure proper file extension
-                file_name = os.path.splitext(image_file.name)[0] + '.jpg'
-                url = upload_image_to_imagekit(image_file, file_name, folder='/products/additional/')
-                if not url:
-                    raise forms.ValidationError("Failed to get image URL from ImageKit")
-                instance.image_url = url
-            except Exception as e:
-                logger.error(f"Error uploading image: {str(e)}")
-                raise forms.ValidationError(f"Error uploading image: {str(e)}")
-        if commit:
-            instance.save()
-        return instance
+
+class CheckoutForm(forms.ModelForm):
+    """
+    Form for the customer details collected at checkout.
+
+    The order total shown on the page is posted back in a hidden field, so
+    the order is not placed at a price the customer did not see.
+    """
+
+    expected_total = forms.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        required=False,
+        widget=forms.HiddenInput
+    )
+
+    class Meta:
+        model = Order
+        fields = ['full_name', 'email', 'shipping_address']
+        widgets = {
+            'full_name': forms.TextInput(attrs={'class': 'form-control', 'autocomplete': 'name'}),
+            'email': forms.EmailInput(attrs={'class': 'form-control', 'autocomplete': 'email'}),
+            'shipping_address': forms.Textarea(attrs={'class': 'form-control', 'rows': 3, 'autocomplete': 'street-address'}),
+        }
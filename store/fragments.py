@@ -0,0 +1,115 @@
+"""
+Fragment caching for catalog pages.
+
+Rendered product cards are cached under a key built from the product id and
+its ``updated_at`` timestamp, so editing a product (or one of its images,
+see ``store.signals``) produces a new key and the stale card simply ages
+out. Cards for a whole page are fetched with one ``get_many`` and stored
+with one ``set_many``, which works with any Django cache backend.
+
+Hit and miss totals are kept in the same cache, and ``manage.py
+card_cache_stats`` reports them. They cover every worker only when that
+cache is shared (Redis, or a file-based cache with ``CACHE_DIR``); with the
+default per-process memory cache each process, including the one running
+the command, counts on its own and the command reports nothing useful.
+"""
+
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+CARD_TEMPLATE = 'store/includes/product_card.html'
+
+# Bump when the card template changes to invalidate every cached card
+CARD_TEMPLATE_VERSION = 3
+
+CARD_HITS_KEY = 'store:card_cache:hits'
+CARD_MISSES_KEY = 'store:card_cache:misses'
+
+
+def get_card_cache():
+    """Get the cache configured for product card fragments."""
+    return caches[getattr(settings, 'PRODUCT_CARD_CACHE', 'default')]
+
+
+def card_cache_key(product):
+    """
+    Build the cache key for a product's card.
+
+    Args:
+        product (Product): The product shown on the card
+
+    Returns:
+        str: A key that changes whenever the product is updated
+    """
+    version = int(product.updated_at.timestamp() * 1_000_000)
+    return f"store:card:v{CARD_TEMPLATE_VERSION}:{product.pk}:{version}"
+
+
+def _count(cache, key, amount):
+    """Add to a shared counter, creating it if needed."""
+    if not amount:
+        return
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        if not cache.add(key, amount, timeout=None):
+            cache.incr(key, amount)
+
+
+def render_product_cards(products):
+    """
+    Render the cards for a list of products, using cached fragments.
+
+    Args:
+        products: Iterable of Product instances
+
+    Returns:
+        str: The concatenated card HTML, marked safe
+    """
+    cache = get_card_cache()
+    products = list(products)
+    keys = [card_cache_key(product) for product in products]
+    cached = cache.get_many(keys)
+
+    fragments = []
+    missed = {}
+    for product, key in zip(products, keys):
+        html = cached.get(key)
+        if html is None:
+            html = render_to_string(CARD_TEMPLATE, {'product': product})
+            missed[key] = html
+        fragments.append(html)
+
+    if missed:
+        cache.set_many(missed, timeout=getattr(settings, 'PRODUCT_CARD_CACHE_TIMEOUT', 60 * 60 * 24))
+    _count(cache, CARD_HITS_KEY, len(cached))
+    _count(cache, CARD_MISSES_KEY, len(missed))
+    return mark_safe(''.join(fragments))
+
+
+def get_card_cache_stats():
+    """
+    Get the hit and miss counters for product cards.
+
+    The counters are only shared between processes when the card cache is.
+
+    Returns:
+        dict: ``hits``, ``misses`` and ``hit_rate`` (0.0 to 1.0)
+    """
+    cache = get_card_cache()
+    counts = cache.get_many([CARD_HITS_KEY, CARD_MISSES_KEY])
+    hits = counts.get(CARD_HITS_KEY, 0)
+    misses = counts.get(CARD_MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / total if total else 0.0,
+    }
+
+
+def reset_card_cache_stats():
+    """Reset the shared hit and miss counters."""
+    get_card_cache().delete_many([CARD_HITS_KEY, CARD_MISSES_KEY])
@@ -0,0 +1,215 @@
+"""
+Per-request performance instrumentation for the store application.
+
+For a sampled share of requests (``REQUEST_TIMING_SAMPLE_RATE``),
+``store.middleware.RequestTimingMiddleware`` collects a ``RequestMetrics``:
+
+- every SQL query on every database connection, through an execute
+  wrapper installed on each connection as it is created (see
+  ``store.signals``), so queries run by the async ORM in worker threads
+  are counted too;
+- time spent rendering templates, through ``InstrumentedDjangoTemplates``,
+  including the queries templates trigger lazily (context processors,
+  related objects);
+- everything else, i.e. the view and middleware code, as ``view`` time.
+
+The figures are sent back in a ``Server-Timing`` header, which browser
+developer tools display, and logged as one JSON line per request. Queries
+of the same shape repeated ``N_PLUS_ONE_THRESHOLD`` times or more in one
+request are logged as a likely N+1 problem, with the view's name.
+
+Requests that are not sampled only pay for a context variable lookup per
+query.
+"""
+
+import json
+import random
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+_metrics = ContextVar('store_request_metrics', default=None)
+
+NUMBER_RE = re.compile(r"\b\d+\b")
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+PLACEHOLDER_LIST_RE = re.compile(r"\(\s*%s(?:\s*,\s*%s)*\s*\)")
+
+
+def query_shape(sql):
+    """
+    Reduce a SQL statement to its shape, ignoring literal values.
+
+    ``IN`` lists of any length, numbers and quoted strings are replaced, so
+    the same ORM query run for different objects has the same shape.
+
+    Args:
+        sql (str): The SQL statement, with ``%s`` placeholders
+
+    Returns:
+        str: The normalized statement
+    """
+    sql = STRING_RE.sub('?', sql)
+    sql = NUMBER_RE.sub('?', sql)
+    return PLACEHOLDER_LIST_RE.sub('(%s, ...)', sql)
+
+
+class RequestMetrics:
+    """
+    Timings and query counts collected for one request.
+
+    Times are in seconds.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total_time = 0.0
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_sql_count = 0
+        self.template_sql_time = 0.0
+        self.render_depth = 0
+        self.shapes = Counter()
+
+    def record_query(self, sql, duration):
+        self.sql_count += 1
+        self.sql_time += duration
+        if self.render_depth:
+            self.template_sql_count += 1
+            self.template_sql_time += duration
+        self.shapes[query_shape(sql)] += 1
+
+    @contextmanager
+    def rendering(self):
+        """Time a template render; nested renders count once."""
+        self.render_depth += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.render_depth -= 1
+            if not self.render_depth:
+                self.template_time += time.perf_counter() - started
+
+    def finish(self):
+        self.total_time = time.perf_counter() - self.started
+
+    @property
+    def view_time(self):
+        """Time outside SQL and templates: the view and middleware code."""
+        outside_sql = self.sql_time - self.template_sql_time
+        return max(self.total_time - self.template_time - outside_sql, 0.0)
+
+    def repeated_queries(self):
+        """
+        Get the query shapes run often enough to suggest an N+1 problem.
+
+        Returns:
+            list: (shape, count) pairs, most repeated first
+        """
+        threshold = getattr(settings, 'N_PLUS_ONE_THRESHOLD', 5)
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+    def server_timing(self):
+        """Format the metrics as a ``Server-Timing`` header value."""
+        return ', '.join([
+            f'sql;dur={self.sql_time * 1000:.1f};desc="{self.sql_count} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f};desc="templates ({self.template_sql_count} queries)"',
+            f'view;dur={self.view_time * 1000:.1f}',
+            f'total;dur={self.total_time * 1000:.1f}',
+        ])
+
+    def as_log_line(self, request, response):
+        """Format the metrics as a JSON log line."""
+        return json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': get_view_name(request),
+            'status': response.status_code,
+            'total_ms': round(self.total_time * 1000, 1),
+            'view_ms': round(self.view_time * 1000, 1),
+            'sql_ms': round(self.sql_time * 1000, 1),
+            'sql_count': self.sql_count,
+            'template_ms': round(self.template_time * 1000, 1),
+            'template_sql_count': self.template_sql_count,
+            'repeated_queries': len(self.repeated_queries()),
+        })
+
+
+def get_view_name(request):
+    """Get the URL name of the view that handled a request, or its path."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return request.path
+    return match.view_name or match._func_path
+
+
+def should_sample():
+    """Decide whether to instrument the current request."""
+    rate = getattr(settings, 'REQUEST_TIMING_SAMPLE_RATE', 0)
+    return rate >= 1 or (rate > 0 and random.random() < rate)
+
+
+def start_metrics():
+    """
+    Start collecting metrics for the current request.
+
+    Returns:
+        tuple: (RequestMetrics, token for ``finish_metrics``)
+    """
+    metrics = RequestMetrics()
+    return metrics, _metrics.set(metrics)
+
+
+def finish_metrics(metrics, token):
+    """Stop collecting metrics for the current request."""
+    metrics.finish()
+    _metrics.reset(token)
+
+
+def record_queries(execute, sql, params, many, context):
+    """
+    Database execute wrapper adding each query to the request's metrics.
+
+    Installed on every connection; does nothing outside sampled requests.
+    """
+    metrics = _metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.record_query(sql, time.perf_counter() - started)
+
+
+class InstrumentedTemplate(Template):
+    """A Django template whose renders are timed for sampled requests."""
+
+    def render(self, context=None, request=None):
+        metrics = _metrics.get()
+        if metrics is None:
+            return super().render(context, request)
+        with metrics.rendering():
+            return super().render(context, request)
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """
+    The Django template backend, with render times recorded per request.
+    """
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return InstrumentedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
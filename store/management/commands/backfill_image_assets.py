@@ -0,0 +1,120 @@
+"""
+Record content hashes for images uploaded before ``ImageAsset`` existed.
+
+Every distinct ``Product.primary_image_url`` and ``ProductImage.image_url``
+without an asset is downloaded, hashed and saved as an ``ImageAsset``, so
+later uploads of the same bytes reuse the existing URL. ImageKit images are
+downloaded untransformed (see ``imagekit_original_url``), so the hash is
+of the uploaded bytes rather than of a re-encoded delivery. Downloads run
+on a bounded thread pool and are hashed as they stream in. URLs whose
+content matches an asset that already exists are reported as duplicates.
+"""
+
+import hashlib
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand
+from requests.adapters import HTTPAdapter
+
+from ecommerce.utils.imagekit_urls import imagekit_original_url
+from store.models import ImageAsset, Product, ProductImage
+
+
+def iter_image_urls():
+    """
+    Yield each stored image URL with the derivatives recorded for it.
+
+    Yields:
+        tuple: (url, derivatives dict)
+    """
+    sources = [
+        Product.objects.exclude(primary_image_url__isnull=True).exclude(primary_image_url='')
+        .values_list('primary_image_url', 'image_derivatives'),
+        ProductImage.objects.exclude(image_url='').values_list('image_url', 'image_derivatives'),
+    ]
+    for queryset in sources:
+        yield from queryset.iterator(chunk_size=2000)
+
+
+class Command(BaseCommand):
+    help = "Backfill content hashes (ImageAsset rows) for already uploaded images."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help="Concurrent downloads (default: 8).",
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help="Images hashed per batch (default: 200).",
+        )
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=30,
+            help="Download timeout in seconds (default: 30).",
+        )
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        self.timeout = options['timeout']
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        known = set(ImageAsset.objects.values_list('url', flat=True))
+        pending = {}
+        for url, derivatives in iter_image_urls():
+            if url not in known:
+                # Keep the derivatives from whichever row has them
+                pending[url] = pending.get(url) or derivatives or {}
+
+        created = duplicates = failed = 0
+        urls = iter(pending)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while True:
+                batch = list(itertools.islice(urls, options['batch_size']))
+                if not batch:
+                    break
+                assets = {}
+                for url, digest in zip(batch, pool.map(self.hash_url, batch)):
+                    if digest is None:
+                        failed += 1
+                    elif digest in assets:
+                        duplicates += 1
+                    else:
+                        assets[digest] = ImageAsset(content_hash=digest, url=url, derivatives=pending[url])
+                existing = set(
+                    ImageAsset.objects.filter(content_hash__in=assets).values_list('content_hash', flat=True)
+                )
+                duplicates += len(existing)
+                ImageAsset.objects.bulk_create(
+                    [asset for digest, asset in assets.items() if digest not in existing],
+                    ignore_conflicts=True,
+                )
+                created += len(assets) - len(existing)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Hashed {len(pending) - failed} images: {created} assets created, "
+            f"{duplicates} duplicates of existing content, {failed} failed"
+        ))
+
+    def hash_url(self, url):
+        """Download an original image and return its SHA-256 hex digest, or None on error."""
+        digest = hashlib.sha256()
+        try:
+            with self.session.get(imagekit_original_url(url), stream=True, timeout=self.timeout) as response:
+                response.raise_for_status()
+                for chunk in response.iter_content(64 * 1024):
+                    digest.update(chunk)
+        except requests.RequestException as e:
+            self.stderr.write(f"Could not download {url}: {e}")
+            return None
+        return digest.hexdigest()
@@ -0,0 +1,145 @@
+"""
+Compare how running servers hold up under many concurrent connections.
+
+Start the site in each launch mode (see ``start.sh``), for example::
+
+    gunicorn ecommerce.wsgi:application -b :8000
+    SERVER_MODE=asgi ASYNC_VIEWS=True \\
+        gunicorn ecommerce.asgi:application -k uvicorn_worker.UvicornWorker -b :8001
+
+and point the command at both::
+
+    python manage.py benchmark_server http://127.0.0.1:8000 http://127.0.0.1:8001 \\
+        --path /shop/ --clients 50 --slow-clients 200
+
+For each server, ``--slow-clients`` connections trickle their request
+headers in one line at a time, like clients on a poor mobile network, while
+``--clients`` connections fetch ``--path`` as fast as they can. A sync
+worker is tied up by every slow client it reads from; an ASGI worker keeps
+serving the fast clients. Point ``--path`` at a database-heavy page (such
+as a search) to compare waiting on a slow upstream instead.
+
+Only the standard library is used, so the command runs anywhere the site
+does. To benchmark the application itself, without a server, see
+``manage.py run_benchmarks``.
+"""
+
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.benchmarks.runner import percentile
+
+
+class Command(BaseCommand):
+    help = "Load running servers with fast and slow concurrent clients and compare latency."
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+', help="Base URLs of the servers to compare.")
+        parser.add_argument('--path', default='/shop/', help="Page the fast clients fetch (default: /shop/).")
+        parser.add_argument(
+            '--clients',
+            type=int,
+            default=50,
+            help="Concurrent clients fetching the page back to back (default: 50).",
+        )
+        parser.add_argument(
+            '--slow-clients',
+            type=int,
+            default=100,
+            help="Concurrent clients sending their request slowly (default: 100).",
+        )
+        parser.add_argument(
+            '--slow-interval',
+            type=float,
+            default=1.0,
+            help="Seconds between header lines sent by slow clients (default: 1).",
+        )
+        parser.add_argument('--duration', type=float, default=15, help="Seconds to run per server (default: 15).")
+        parser.add_argument('--timeout', type=float, default=10, help="Per-request timeout in seconds (default: 10).")
+
+    def handle(self, *args, **options):
+        results = []
+        for url in options['urls']:
+            parts = urlsplit(url)
+            if parts.scheme != 'http' or not parts.hostname:
+                raise CommandError(f"Only plain http:// URLs are supported: {url}")
+            self.stdout.write(f"Benchmarking {url}{options['path']} for {options['duration']:.0f}s...")
+            results.append((url, asyncio.run(self.run(parts.hostname, parts.port or 80, options))))
+
+        self.stdout.write(
+            f"\n{'server':<32} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'slow ok':>8}"
+        )
+        for url, stats in results:
+            self.stdout.write(
+                f"{url:<32} {stats['rps']:>8.1f} {stats['p50']:>8.0f} {stats['p95']:>8.0f} "
+                f"{stats['p99']:>8.0f} {stats['errors']:>7} {stats['slow_ok']:>8}"
+            )
+
+    async def run(self, host, port, options):
+        """Run the fast and slow clients against one server."""
+        deadline = time.monotonic() + options['duration']
+        latencies = []
+        errors = []
+        slow_ok = []
+
+        request = (
+            f"GET {options['path']} HTTP/1.1\r\nHost: {host}:{port}\r\n"
+            f"User-Agent: benchmark_server\r\nConnection: close\r\n\r\n"
+        ).encode()
+
+        async def fetch(lines, interval):
+            reader, writer = await asyncio.open_connection(host, port)
+            try:
+                for line in lines:
+                    writer.write(line)
+                    await writer.drain()
+                    if interval:
+                        await asyncio.sleep(interval)
+                status_line = await reader.readline()
+                await reader.read()
+            finally:
+                writer.close()
+            status = int(status_line.split()[1]) if status_line.count(b' ') >= 2 else 0
+            if not 200 <= status < 400:
+                raise ConnectionError(f"HTTP {status}")
+
+        async def fast_client():
+            while time.monotonic() < deadline:
+                started = time.monotonic()
+                try:
+                    await asyncio.wait_for(fetch([request], 0), options['timeout'])
+                    latencies.append(time.monotonic() - started)
+                except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+                    errors.append(1)
+
+        async def slow_client():
+            lines = [line + b'\r\n' for line in request.split(b'\r\n')[:-2]] + [b'\r\n']
+            while time.monotonic() < deadline:
+                try:
+                    await asyncio.wait_for(
+                        fetch(lines, options['slow_interval']),
+                        options['timeout'] + len(lines) * options['slow_interval'],
+                    )
+                    slow_ok.append(1)
+                except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+                    errors.append(1)
+
+        started = time.monotonic()
+        await asyncio.gather(
+            *[slow_client() for _ in range(options['slow_clients'])],
+            *[fast_client() for _ in range(options['clients'])],
+        )
+        elapsed = time.monotonic() - started
+
+        latencies.sort()
+        return {
+            'rps': len(latencies) / elapsed,
+            'p50': percentile(latencies, 0.50) * 1000,
+            'p95': percentile(latencies, 0.95) * 1000,
+            'p99': percentile(latencies, 0.99) * 1000,
+            'errors': len(errors),
+            'slow_ok': len(slow_ok),
+        }
@@ -0,0 +1,75 @@
+"""
+Build "frequently bought together" recommendations from cart contents.
+
+Products are processed in batches of ``--batch-size``, each recomputed and
+stored in its own short transaction (see ``store.recommendations``). By
+default only the products in carts changed since the last build are
+recomputed; ``--full`` recomputes every product in a cart and removes the
+recommendations of products no longer in any. Run an incremental build
+often (e.g. hourly) and a full build daily, after ``prune_carts``.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from store.models import ProductRecommendation
+from store.recommendations import build_recommendations, last_build_started, products_in_carts
+
+
+class Command(BaseCommand):
+    help = "Precompute product recommendations from products that share carts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help="Recompute every product instead of those in recently changed carts.",
+        )
+        parser.add_argument('--top', type=int, default=10, help="Recommendations kept per product (default: 10).")
+        parser.add_argument(
+            '--min-count',
+            type=int,
+            default=2,
+            help="Fewest carts two products must share to be recommended together (default: 2).",
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help="Products recomputed per transaction (default: 500).",
+        )
+
+    def handle(self, *args, **options):
+        started_at = timezone.now()
+        since = None if options['full'] else last_build_started()
+        if since is None:
+            self.stdout.write("Building recommendations for every product in a cart")
+        else:
+            self.stdout.write(f"Building recommendations for products in carts changed since {since:%Y-%m-%d %H:%M:%S}")
+
+        batch_size = max(1, options['batch_size'])
+        products = stored = 0
+        started = time.monotonic()
+        last_id = 0
+        while True:
+            batch = list(products_in_carts(since).filter(product_id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1]
+            stored += build_recommendations(batch, started_at, top=options['top'], min_count=options['min_count'])
+            products += len(batch)
+            if options['verbosity'] >= 2:
+                self.stdout.write(f"  {products} products, {stored} recommendations")
+
+        removed = 0
+        if since is None:
+            # Products no longer in any cart were not recomputed
+            removed = ProductRecommendation.objects.filter(computed_at__lt=started_at).delete()[0]
+
+        elapsed = max(time.monotonic() - started, 1e-9)
+        self.stdout.write(self.style.SUCCESS(
+            f"Recomputed {products} products ({products / elapsed:.0f} products/s): "
+            f"{stored} recommendations stored, {removed} stale removed in {elapsed:.1f}s"
+        ))
@@ -0,0 +1,37 @@
+"""
+Report how effective the product card fragment cache is.
+
+The counters live in the card cache, so this needs a cache shared with the
+web workers (``REDIS_URL`` or ``CACHE_DIR``); with the default per-process
+memory cache there is nothing to report.
+"""
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from store.fragments import get_card_cache, get_card_cache_stats, reset_card_cache_stats
+
+
+class Command(BaseCommand):
+    help = "Show hit/miss counters for the product card fragment cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help="Reset the counters after reporting them.",
+        )
+
+    def handle(self, *args, **options):
+        if isinstance(get_card_cache(), LocMemCache):
+            self.stderr.write(self.style.WARNING(
+                "The card cache is local to each process; these counters only cover this command."
+            ))
+        stats = get_card_cache_stats()
+        self.stdout.write(
+            f"Product card cache: {stats['hits']} hits, {stats['misses']} misses "
+            f"({stats['hit_rate']:.1%} hit rate)"
+        )
+        if options['reset']:
+            reset_card_cache_stats()
+            self.stdout.write("Counters reset.")
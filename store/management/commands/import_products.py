@@ -0,0 +1,325 @@
+"""
+Bulk import of products and product images from CSV or JSON Lines.
+
+Each row describes one product::
+
+    sku,name,description,price,stock,image,images
+    GY-150,Geyser 150L,Electric geyser,4999.00,12,img/gy150.jpg,img/a.jpg|img/b.jpg
+
+``sku`` identifies the product: existing products are updated, new ones are
+created, so replaying rows is harmless. ``stock`` is optional: when it is
+empty or missing, an existing product keeps its stock and a new one does
+not track stock. ``image`` is the primary image and ``images`` the
+additional images (``|``-separated in CSV, a list or a ``|``-separated
+string in JSONL). Rows that do not fit the product table, such as a
+negative price or an overlong name, are skipped and reported.
+
+Local paths are uploaded to ImageKit on a bounded thread pool, skipping
+files whose content was uploaded before; http(s) URLs are stored as given.
+
+The file is streamed and written in batches, so memory use does not grow
+with its size. After every committed batch the row number is saved to a
+checkpoint file, and ``--resume`` continues from there.
+"""
+
+import csv
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from store.cart import reprice_lines
+from store.models import Product, ProductImage
+from store.search import get_search_backend
+from store.uploads import upload_original
+
+PRICE_FIELD = Product._meta.get_field('price')
+# Smallest price that no longer fits the price column
+PRICE_LIMIT = Decimal(10) ** (PRICE_FIELD.max_digits - PRICE_FIELD.decimal_places)
+
+PRODUCT_FIELDS = ['name', 'description', 'price', 'stock', 'primary_image_url', 'image_derivatives', 'updated_at']
+
+
+class InvalidRow(ValueError):
+    """Raised when an input row cannot be imported."""
+
+
+def read_rows(path, file_format):
+    """
+    Stream rows from a CSV or JSON Lines file.
+
+    Args:
+        path (str): Path of the input file
+        file_format (str): 'csv' or 'jsonl'
+
+    Yields:
+        tuple: (row number, row dict), or (row number, InvalidRow) for a
+        line that is not valid JSON
+    """
+    with open(path, newline='', encoding='utf-8') as handle:
+        if file_format == 'csv':
+            for number, row in enumerate(csv.DictReader(handle), start=1):
+                images = row.get('images') or ''
+                row['images'] = [image for image in images.split('|') if image]
+                yield number, row
+        else:
+            for number, line in enumerate(handle, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield number, json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield number, InvalidRow(f"invalid JSON: {e.msg}")
+
+
+def parse_row(row):
+    """
+    Validate and normalize an input row.
+
+    Args:
+        row: The raw row, or the InvalidRow ``read_rows`` yields for it
+
+    Returns:
+        dict: The normalized row
+
+    Raises:
+        InvalidRow: If a required value is missing or malformed
+    """
+    if isinstance(row, InvalidRow):
+        raise row
+    if not isinstance(row, dict):
+        raise InvalidRow("expected an object")
+    sku = str(row.get('sku') or '').strip()
+    name = str(row.get('name') or '').strip()
+    if not sku or not name:
+        raise InvalidRow("sku and name are required")
+    for field, value in (('sku', sku), ('name', name)):
+        if len(value) > Product._meta.get_field(field).max_length:
+            raise InvalidRow(f"{field} is too long")
+    try:
+        price = Decimal(str(row.get('price'))).quantize(Decimal('0.01'))
+    except (InvalidOperation, TypeError):
+        raise InvalidRow(f"invalid price {row.get('price')!r}")
+    if not price.is_finite() or not 0 <= price < PRICE_LIMIT:
+        raise InvalidRow(f"price {row.get('price')!r} out of range")
+    stock = row.get('stock')
+    if stock in (None, ''):
+        stock = None
+    else:
+        try:
+            stock = int(str(stock).strip())
+        except ValueError:
+            raise InvalidRow(f"invalid stock {row.get('stock')!r}")
+        if stock < 0:
+            raise InvalidRow(f"invalid stock {row.get('stock')!r}")
+    images = row.get('images') or []
+    if isinstance(images, str):
+        images = images.split('|')
+    if not isinstance(images, list) or not all(isinstance(image, str) for image in images):
+        raise InvalidRow("images must be a list of paths or URLs")
+    return {
+        'sku': sku,
+        'name': name,
+        'description': str(row.get('description') or ''),
+        'price': price,
+        'stock': stock,
+        'image': str(row.get('image') or '').strip(),
+        'images': [image.strip() for image in images if image.strip()],
+    }
+
+
+def is_remote(reference):
+    return reference.startswith(('http://', 'https://'))
+
+
+class Command(BaseCommand):
+    help = "Import products and product images from a CSV or JSON Lines file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV (.csv) or JSON Lines (.jsonl) file to import.")
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'jsonl'],
+            help="Input format (default: from the file extension).",
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help="Rows written per transaction (default: 500).",
+        )
+        parser.add_argument(
+            '--upload-workers',
+            type=int,
+            default=8,
+            help="Concurrent image uploads (default: 8).",
+        )
+        parser.add_argument(
+            '--images-dir',
+            default='.',
+            help="Directory that local image paths are relative to.",
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help="Checkpoint file (default: <path>.checkpoint).",
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help="Skip rows already imported according to the checkpoint.",
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f"File not found: {path}")
+        file_format = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        self.images_dir = options['images_dir']
+        self.verbosity = options['verbosity']
+        checkpoint_path = options['checkpoint'] or f"{path}.checkpoint"
+
+        start_after = 0
+        if options['resume'] and os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as handle:
+                start_after = json.load(handle)['row']
+            self.stdout.write(f"Resuming after row {start_after}")
+
+        self.rows_done = self.uploads_done = self.rows_skipped = 0
+        started = time.monotonic()
+        rows = (
+            (number, row) for number, row in read_rows(path, file_format)
+            if number > start_after
+        )
+        with ThreadPoolExecutor(max_workers=max(1, options['upload_workers'])) as pool:
+            while True:
+                batch = list(itertools.islice(rows, options['batch_size']))
+                if not batch:
+                    break
+                try:
+                    self.import_batch(batch, pool)
+                except RuntimeError as e:
+                    raise CommandError(
+                        f"Batch starting at row {batch[0][0]} failed: {e}. "
+                        f"Fix the problem and re-run with --resume."
+                    )
+                with open(checkpoint_path, 'w') as handle:
+                    json.dump({'row': batch[-1][0]}, handle)
+                self.report(started, final=False)
+
+        self.report(started, final=True)
+
+    def import_batch(self, batch, pool):
+        """Upload a batch's images, then write its products and images."""
+        parsed = []
+        for number, row in batch:
+            try:
+                parsed.append(parse_row(row))
+            except InvalidRow as e:
+                self.rows_skipped += 1
+                self.stderr.write(f"Row {number} skipped: {e}")
+
+        urls = self.upload_images(parsed, pool)
+        now = timezone.now()
+
+        with transaction.atomic():
+            existing = Product.objects.in_bulk([row['sku'] for row in parsed], field_name='sku')
+            to_create, to_update, products = [], [], {}
+            for row in parsed:
+                product = existing.get(row['sku']) or products.get(row['sku'])
+                if product is None:
+                    product = Product(sku=row['sku'])
+                    to_create.append(product)
+                elif product.pk:
+                    to_update.append(product)
+                product.name = row['name']
+                product.description = row['description']
+                product.price = row['price']
+                if row['stock'] is not None:
+                    product.stock = row['stock']
+                product.updated_at = now
+                if row['image'] and product.primary_image_url != urls[row['image']]:
+                    product.primary_image_url = urls[row['image']]
+                    # Resized copies of the old image; pages fall back to
+                    # the new original
+                    product.image_derivatives = {}
+                products[row['sku']] = product
+
+            Product.objects.bulk_create(to_create)
+            # Rows repeated within a batch refer to the same object
+            Product.objects.bulk_update({id(p): p for p in to_update}.values(), PRODUCT_FIELDS)
+            if any(not product.pk for product in to_create):
+                # Databases that cannot return ids from bulk inserts
+                created = Product.objects.in_bulk([p.sku for p in to_create], field_name='sku')
+                for product in to_create:
+                    product.pk = created[product.sku].pk
+
+            with_images = {row['sku']: row['images'] for row in parsed if row['images']}
+            ProductImage.objects.filter(product__sku__in=with_images).delete()
+            ProductImage.objects.bulk_create([
+                ProductImage(product=products[sku], image_url=urls[image], order=order)
+                for sku, images in with_images.items()
+                for order, image in enumerate(images, start=1)
+            ])
+
+            get_search_backend().index_products(list(products.values()))
+            # Bulk updates send no signals; carts holding these products keep
+            # their prices in step here instead
+            reprice_lines([product.pk for product in to_update])
+        self.rows_done += len(parsed)
+
+    def upload_images(self, rows, pool):
+        """
+        Upload every local image referenced by a batch, concurrently.
+
+        Returns:
+            dict: Stored URL for each image reference in the batch
+        """
+        references = {
+            reference
+            for row in rows
+            for reference in [row['image'], *row['images']]
+            if reference
+        }
+        urls = {reference: reference for reference in references if is_remote(reference)}
+        local = sorted(references - set(urls))
+        for reference, url in zip(local, pool.map(self.upload_image, local)):
+            urls[reference] = url
+        self.uploads_done += len(local)
+        return urls
+
+    def upload_image(self, reference):
+        """
+        Upload a single local image file and return its URL.
+
+        Raises:
+            RuntimeError: If the file cannot be read or uploaded
+        """
+        path = os.path.join(self.images_dir, reference)
+        folder = '/products/imports/'
+        try:
+            with open(path, 'rb') as handle:
+                return upload_original(handle, os.path.basename(path), folder=folder)
+        except OSError as e:
+            raise RuntimeError(f"cannot read image {reference!r}: {e.strerror or e}")
+        finally:
+            # Worker threads get their own connection for the asset lookup
+            connection.close()
+
+    def report(self, started, final):
+        """Print progress and throughput."""
+        elapsed = max(time.monotonic() - started, 1e-9)
+        message = (
+            f"{self.rows_done} rows ({self.rows_done / elapsed:.1f} rows/s), "
+            f"{self.uploads_done} uploads ({self.uploads_done / elapsed:.1f} uploads/s), "
+            f"{self.rows_skipped} skipped in {elapsed:.1f}s"
+        )
+        if final:
+            self.stdout.write(self.style.SUCCESS(f"Imported {message}"))
+        elif self.verbosity >= 2:
+            self.stdout.write(message)
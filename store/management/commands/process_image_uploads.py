@@ -0,0 +1,70 @@
+"""
+Worker that uploads queued product images to ImageKit.
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from store.uploads import claim_jobs, process_job
+
+logger = logging.getLogger(__name__)
+
+
+def run_job(job):
+    """Process one job on a pool thread, with its own database connection."""
+    try:
+        return process_job(job)
+    except Exception:
+        # Keep the worker running; the job stays claimed and is retried
+        # once IMAGE_UPLOAD_STALE_AFTER has passed
+        logger.exception(f"Processing upload job {job.pk} failed")
+        return False
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = "Upload queued product images to ImageKit, retrying failures with backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help="Number of concurrent uploads (default: 4).",
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help="Seconds to wait when the queue is empty (default: 2).",
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help="Process the jobs that are currently due, then exit.",
+        )
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        uploaded = failed = 0
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while True:
+                close_old_connections()
+                jobs = claim_jobs(workers * 2)
+                if jobs:
+                    for succeeded in pool.map(run_job, jobs):
+                        if succeeded:
+                            uploaded += 1
+                        else:
+                            failed += 1
+                    self.stdout.write(f"Uploaded {uploaded} image(s), {failed} failed attempt(s) so far")
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+        self.stdout.write(self.style.SUCCESS(f"Done: {uploaded} uploaded, {failed} failed attempt(s)"))
@@ -0,0 +1,136 @@
+"""
+Delete abandoned carts and expired sessions in small batches.
+
+Carts whose ``updated_at`` is older than ``--days`` (default:
+``CART_PRUNE_AFTER_DAYS``) are deleted together with their items. Carts are
+walked in ``(updated_at, id)`` order using the ``cart_updated_id_idx``
+index, resuming after the last row seen instead of rescanning from the
+start, and each batch is deleted in its own short transaction. Carts that
+are in use at that moment are locked by the request changing them and are
+skipped. Expired ``django_session`` rows are then deleted in batches as
+well, since Django's ``clearsessions`` removes them all in one statement.
+"""
+
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from store.models import Cart, CartItem
+
+
+class Command(BaseCommand):
+    help = "Delete carts idle for longer than a given age, and expired sessions, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=getattr(settings, 'CART_PRUNE_AFTER_DAYS', 30),
+            help="Delete carts not changed for this many days (default: CART_PRUNE_AFTER_DAYS).",
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help="Rows deleted per transaction (default: 1000).",
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0,
+            help="Seconds to pause between batches, to limit load (default: 0).",
+        )
+        parser.add_argument(
+            '--skip-sessions',
+            action='store_true',
+            help="Only prune carts, not expired sessions.",
+        )
+
+    def handle(self, *args, **options):
+        self.batch_size = max(1, options['batch_size'])
+        self.pause = options['sleep']
+        self.verbosity = options['verbosity']
+        cutoff = timezone.now() - timedelta(days=options['days'])
+
+        started = time.monotonic()
+        carts, items = self.prune_carts(cutoff)
+        elapsed = max(time.monotonic() - started, 1e-9)
+        self.stdout.write(
+            f"Deleted {carts} carts and {items} cart items in {elapsed:.1f}s "
+            f"({(carts + items) / elapsed:.0f} rows/s)"
+        )
+
+        if not options['skip_sessions']:
+            started = time.monotonic()
+            sessions = self.prune_sessions()
+            elapsed = max(time.monotonic() - started, 1e-9)
+            self.stdout.write(
+                f"Deleted {sessions} expired sessions in {elapsed:.1f}s ({sessions / elapsed:.0f} rows/s)"
+            )
+        self.stdout.write(self.style.SUCCESS("Pruning complete."))
+
+    def prune_carts(self, cutoff):
+        """
+        Delete carts last changed before ``cutoff``, one batch at a time.
+
+        Returns:
+            tuple: (carts deleted, cart items deleted)
+        """
+        carts_deleted = items_deleted = 0
+        position = Q()
+        while True:
+            batch = list(
+                Cart.objects.filter(position, updated_at__lt=cutoff)
+                .order_by('updated_at', 'id')
+                .values_list('updated_at', 'id')[:self.batch_size]
+            )
+            if not batch:
+                break
+            last_updated, last_id = batch[-1]
+            position = Q(updated_at__gt=last_updated) | Q(updated_at=last_updated, id__gt=last_id)
+
+            with transaction.atomic():
+                # Re-check the age under lock: a cart changed since it was
+                # read, or locked by a request changing it now, is kept.
+                idle = Cart.objects.filter(id__in=[cart_id for _, cart_id in batch], updated_at__lt=cutoff)
+                if connection.features.has_select_for_update_skip_locked:
+                    idle = idle.select_for_update(skip_locked=True)
+                cart_ids = list(idle.values_list('id', flat=True))
+                if cart_ids:
+                    items_deleted += CartItem.objects.filter(cart_id__in=cart_ids).delete()[0]
+                    carts_deleted += Cart.objects.filter(id__in=cart_ids).delete()[0]
+            self.progress(carts_deleted, 'carts')
+        return carts_deleted, items_deleted
+
+    def prune_sessions(self):
+        """
+        Delete expired sessions, one batch at a time.
+
+        Returns:
+            int: Number of sessions deleted
+        """
+        deleted = 0
+        now = timezone.now()
+        while True:
+            keys = list(
+                Session.objects.filter(expire_date__lt=now)
+                .values_list('session_key', flat=True)[:self.batch_size]
+            )
+            if not keys:
+                break
+            deleted += Session.objects.filter(session_key__in=keys, expire_date__lt=now).delete()[0]
+            self.progress(deleted, 'sessions')
+        return deleted
+
+    def progress(self, deleted, label):
+        """Report progress at higher verbosity and pause between batches."""
+        if self.verbosity >= 2:
+            self.stdout.write(f"  {deleted} {label} deleted")
+        if self.pause:
+            time.sleep(self.pause)
@@ -0,0 +1,112 @@
+"""
+Benchmark the store's busiest pages and compare them with baselines.
+
+Each scenario (shop, product_detail, search, cart_add, cart_update,
+admin_save) is driven by ``--concurrency`` in-process clients against the
+data written by ``manage.py seed_benchmark_data``. The command prints the
+p50/p95/p99 latency, requests per second and queries per request of every
+scenario, and fails if any of them is worse than the stored baseline by
+more than ``--tolerance`` (or, for queries, ``--query-tolerance``).
+
+Record baselines on the machine that runs the benchmarks with
+``--save-baselines``; scenarios without a baseline are reported but not
+checked. See ``store.benchmarks``.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.benchmarks.data import BenchmarkDataset
+from store.benchmarks.runner import BASELINES_PATH, find_regressions, load_baselines, run_scenario, save_baselines
+from store.benchmarks.scenarios import SCENARIOS
+
+
+class Command(BaseCommand):
+    help = "Run the load benchmarks and fail on regressions against stored baselines."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'scenarios',
+            nargs='*',
+            help=f"Scenarios to run: {', '.join(SCENARIOS)} (default: all).",
+        )
+        parser.add_argument('--requests', type=int, default=200, help="Timed requests per scenario (default: 200).")
+        parser.add_argument('--concurrency', type=int, default=8, help="Concurrent clients (default: 8).")
+        parser.add_argument('--warmup', type=int, default=5, help="Untimed requests per client (default: 5).")
+        parser.add_argument('--seed', type=int, default=1, help="Random seed (default: 1).")
+        parser.add_argument(
+            '--baselines',
+            default=BASELINES_PATH,
+            help="Baselines file (default: store/benchmarks/baselines.json).",
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.25,
+            help="Allowed slowdown against the baselines, as a fraction (default: 0.25).",
+        )
+        parser.add_argument(
+            '--query-tolerance',
+            type=float,
+            default=0.5,
+            help="Allowed extra queries per request (default: 0.5).",
+        )
+        parser.add_argument(
+            '--save-baselines',
+            action='store_true',
+            help="Store this run's results as the baselines instead of checking them.",
+        )
+
+    def handle(self, *args, **options):
+        unknown = [name for name in options['scenarios'] if name not in SCENARIOS]
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(unknown)}. Choose from {', '.join(SCENARIOS)}.")
+        dataset = BenchmarkDataset.load()
+        if not dataset.product_ids:
+            raise CommandError("No benchmark data found; run manage.py seed_benchmark_data first.")
+        if options['requests'] < 1:
+            raise CommandError("--requests must be at least 1.")
+
+        results = []
+        for name in options['scenarios'] or SCENARIOS:
+            self.stdout.write(f"Running {name}...")
+            results.append(run_scenario(
+                SCENARIOS[name],
+                dataset,
+                requests=options['requests'],
+                concurrency=options['concurrency'],
+                warmup=options['warmup'],
+                seed=options['seed'],
+            ))
+
+        baselines = {} if options['save_baselines'] else load_baselines(options['baselines'])
+        failures = []
+        self.stdout.write(
+            f"\n{'scenario':<16} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8} {'queries':>8} {'errors':>7}"
+        )
+        for result in results:
+            stats = result.as_dict()
+            self.stdout.write(
+                f"{result.name:<16} {stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f} "
+                f"{stats['rps']:>8.1f} {stats['queries']:>8.1f} {result.errors:>7}"
+            )
+            if result.errors:
+                failures.append(f"{result.name}: {result.errors} requests failed")
+            if result.name in baselines:
+                failures.extend(
+                    f"{result.name}: {regression}"
+                    for regression in find_regressions(
+                        stats, baselines[result.name], options['tolerance'], options['query_tolerance']
+                    )
+                )
+
+        if options['save_baselines']:
+            if failures:
+                raise CommandError("Not saving baselines from a run with errors:\n" + "\n".join(failures))
+            save_baselines(options['baselines'], results)
+            self.stdout.write(self.style.SUCCESS(f"Saved baselines to {options['baselines']}"))
+        elif failures:
+            raise CommandError("Benchmarks regressed:\n" + "\n".join(failures))
+        elif not baselines:
+            self.stdout.write(f"No baselines at {options['baselines']}; run with --save-baselines to record them.")
+        else:
+            self.stdout.write(self.style.SUCCESS("No regressions against the baselines."))
@@ -0,0 +1,70 @@
+"""
+Fill a benchmark database with a large, deterministic catalog.
+
+By default this writes 100,000 products with 5 images each (500,000 product
+images) and 100,000 carts of 10 lines (1,000,000 cart items), using bulk
+inserts in batches. The same ``--seed`` and sizes always produce the same
+data. Seed an empty, dedicated database, then run ``manage.py
+run_benchmarks`` against it; see ``store.benchmarks``.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from store.benchmarks.data import SKU_PREFIX, generate_dataset
+from store.models import Product
+
+
+class Command(BaseCommand):
+    help = "Generate a deterministic benchmark dataset of products, images and carts."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100_000, help="Products (default: 100000).")
+        parser.add_argument(
+            '--images-per-product',
+            type=int,
+            default=5,
+            help="Additional images per product (default: 5).",
+        )
+        parser.add_argument('--carts', type=int, default=100_000, help="Carts (default: 100000).")
+        parser.add_argument('--items-per-cart', type=int, default=10, help="Lines per cart (default: 10).")
+        parser.add_argument('--seed', type=int, default=1, help="Random seed (default: 1).")
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help="Rows written per transaction (default: 2000).",
+        )
+
+    def handle(self, *args, **options):
+        if not connection.features.can_return_rows_from_bulk_insert:
+            raise CommandError("The database must return ids from bulk inserts (PostgreSQL or SQLite 3.35+).")
+        if Product.objects.filter(sku__startswith=SKU_PREFIX).exists():
+            raise CommandError("This database already holds benchmark data; seed an empty database instead.")
+        if options['products'] < 1:
+            raise CommandError("--products must be at least 1.")
+
+        self.verbosity = options['verbosity']
+        started = time.monotonic()
+        counts = generate_dataset(
+            products=options['products'],
+            images_per_product=options['images_per_product'],
+            carts=options['carts'],
+            items_per_cart=options['items_per_cart'],
+            seed=options['seed'],
+            batch_size=max(1, options['batch_size']),
+            progress=self.progress,
+        )
+        elapsed = max(time.monotonic() - started, 1e-9)
+        rows = sum(counts.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {counts['products']} products, {counts['images']} images, {counts['carts']} carts and "
+            f"{counts['cart_items']} cart items in {elapsed:.1f}s ({rows / elapsed:.0f} rows/s)"
+        ))
+
+    def progress(self, table, done, total):
+        """Report progress at higher verbosity."""
+        if self.verbosity >= 2:
+            self.stdout.write(f"  {done}/{total} {table}")
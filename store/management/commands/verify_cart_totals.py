@@ -0,0 +1,119 @@
+"""
+Check the totals stored on carts against their lines, and repair drift.
+
+Every cart change updates ``Cart.item_count`` and ``Cart.subtotal`` in the
+same transaction as the lines (see ``store.cart``), and saving a product
+copies its price onto the cart lines holding it. Writes that bypass both,
+such as raw SQL or ``QuerySet.update`` on prices, can still leave carts
+with totals that no longer match their lines, or lines at an old price.
+
+Carts are walked in id order, a batch at a time. Drifted totals are
+reported and, with ``--repair``, recalculated from the lines; lines at an
+old price are repriced, adjusting their carts' subtotals. Without
+``--repair`` the command fails when it finds drift, so it can run from
+cron or a monitoring job.
+"""
+
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import DecimalField, F, Sum
+
+from store.cart import recompute_totals, reprice_lines
+from store.models import Cart, CartItem
+
+
+class Command(BaseCommand):
+    help = "Verify the item counts and subtotals stored on carts, and optionally repair them."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repair',
+            action='store_true',
+            help="Recalculate drifted totals and reprice stale lines instead of only reporting them.",
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help="Carts checked per batch (default: 1000).",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        self.verbosity = options['verbosity']
+        repair = options['repair']
+        checked = drifted = stale = 0
+        started = time.monotonic()
+
+        last_id = 0
+        while True:
+            carts = list(
+                Cart.objects.filter(pk__gt=last_id)
+                .order_by('pk')
+                .values_list('pk', 'item_count', 'subtotal')[:batch_size]
+            )
+            if not carts:
+                break
+            last_id = carts[-1][0]
+            cart_ids = [cart_id for cart_id, _, _ in carts]
+
+            drifted_ids = self.find_drift(carts)
+            stale_products = list(
+                CartItem.objects.filter(cart_id__in=cart_ids)
+                .exclude(unit_price=F('product__price'))
+                .values_list('product_id', flat=True)
+            )
+            if repair:
+                if drifted_ids:
+                    recompute_totals(drifted_ids)
+                if stale_products:
+                    reprice_lines(sorted(set(stale_products)))
+            checked += len(carts)
+            drifted += len(drifted_ids)
+            stale += len(stale_products)
+
+        elapsed = max(time.monotonic() - started, 1e-9)
+        summary = (
+            f"Checked {checked} carts in {elapsed:.1f}s ({checked / elapsed:.0f} carts/s): "
+            f"{drifted} with drifted totals, {stale} lines with stale prices"
+        )
+        if repair:
+            self.stdout.write(self.style.SUCCESS(f"{summary}; all repaired."))
+        elif drifted or stale:
+            raise CommandError(f"{summary}. Re-run with --repair to fix them.")
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
+
+    def find_drift(self, carts):
+        """
+        Compare a batch of carts' stored totals with their lines.
+
+        Args:
+            carts (list): (id, item_count, subtotal) rows
+
+        Returns:
+            list: Ids of the carts whose totals do not match
+        """
+        actual = {
+            cart_id: (item_count, subtotal)
+            for cart_id, item_count, subtotal in CartItem.objects.filter(cart_id__in=[cart[0] for cart in carts])
+            .values('cart_id')
+            .annotate(
+                item_count=Sum('quantity'),
+                subtotal=Sum(F('unit_price') * F('quantity'), output_field=DecimalField(max_digits=12, decimal_places=2)),
+            )
+            .values_list('cart_id', 'item_count', 'subtotal')
+        }
+        drifted = []
+        for cart_id, item_count, subtotal in carts:
+            expected = actual.get(cart_id, (0, Decimal('0.00')))
+            if (item_count, subtotal) != expected:
+                drifted.append(cart_id)
+                if self.verbosity >= 2:
+                    self.stdout.write(
+                        f"  Cart {cart_id}: stored {item_count} items, R{subtotal}; "
+                        f"lines add up to {expected[0]} items, R{expected[1]}"
+                    )
+        return drifted
@@ -0,0 +1,147 @@
+"""
+Middleware for the store application.
+"""
+
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .instrumentation import finish_metrics, get_view_name, should_sample, start_metrics
+from .routers import finish_routing, get_replicas, get_routing_state, start_routing
+
+logger = logging.getLogger('store.instrumentation')
+
+
+class CartCookieMiddleware:
+    """
+    Write the anonymous cart cookie back when a request changed the cart.
+
+    Only requests that used a ``CookieCartStorage`` (see ``store.cart``) are
+    affected; with database cart storage this does nothing. Works in both
+    sync and async middleware chains, so it adds no thread hop under ASGI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        cookie_cart = getattr(request, '_cart_cookie', None)
+        if cookie_cart is not None:
+            cookie_cart.update_response(response)
+        return response
+
+
+class ReplicaPinMiddleware:
+    """
+    Keep a visitor's reads on the primary database for a while after they write.
+
+    Each request starts with a fresh routing state (see ``store.routers``),
+    pinned to the primary if the pin cookie is present. A request that
+    wrote to the database sets the cookie for ``REPLICA_PIN_SECONDS``, so
+    the visitor never reads their own changes back from a lagging replica.
+    Does nothing when no replicas are configured.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.cookie_name = getattr(settings, 'REPLICA_PIN_COOKIE_NAME', 'db_pin')
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not get_replicas():
+            return self.get_response(request)
+        token = start_routing(pinned=self.cookie_name in request.COOKIES)
+        try:
+            return self.process_response(self.get_response(request))
+        finally:
+            finish_routing(token)
+
+    async def __acall__(self, request):
+        if not get_replicas():
+            return await self.get_response(request)
+        token = start_routing(pinned=self.cookie_name in request.COOKIES)
+        try:
+            return self.process_response(await self.get_response(request))
+        finally:
+            finish_routing(token)
+
+    def process_response(self, response):
+        if get_routing_state().wrote:
+            response.set_cookie(
+                self.cookie_name,
+                '1',
+                max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 15),
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+
+class RequestTimingMiddleware:
+    """
+    Measure where a sampled share of requests spend their time.
+
+    Sampled requests (``REQUEST_TIMING_SAMPLE_RATE``) get a
+    ``Server-Timing`` header with SQL, template, view and total times, and
+    a JSON log line; repeated query shapes are logged as likely N+1
+    problems. See ``store.instrumentation``. Should be the first
+    middleware, so its total covers the whole stack.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not should_sample():
+            return self.get_response(request)
+        metrics, token = start_metrics()
+        try:
+            response = self.get_response(request)
+        finally:
+            finish_metrics(metrics, token)
+        return self.process_response(request, response, metrics)
+
+    async def __acall__(self, request):
+        if not should_sample():
+            return await self.get_response(request)
+        metrics, token = start_metrics()
+        try:
+            response = await self.get_response(request)
+        finally:
+            finish_metrics(metrics, token)
+        return self.process_response(request, response, metrics)
+
+    def process_response(self, request, response, metrics):
+        response.headers['Server-Timing'] = metrics.server_timing()
+        logger.info(metrics.as_log_line(request, response))
+        for shape, count in metrics.repeated_queries():
+            logger.warning(f"Possible N+1 in {get_view_name(request)}: {count} x {shape[:500]}")
+        return response
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.1 on 2026-10-17 19:43
+
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    """Backfill search vectors and add the GIN index on PostgreSQL only."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Product = apps.get_model('store', 'Product')
+    Product.objects.update(search_vector=(
+        SearchVector('name', weight='A', config='english')
+        + SearchVector('description', weight='B', config='english')
+    ))
+    schema_editor.execute(
+        'CREATE INDEX store_product_search_vector_gin '
+        'ON store_product USING GIN (search_vector)'
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS store_product_search_vector_gin')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0002_cart_alter_product_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, help_text='Full-text search document, maintained by the search backend', null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.1 on 2026-10-17 19:50
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0004_product_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='upload_status',
+            field=models.CharField(choices=[('ready', 'Ready'), ('pending', 'Pending upload'), ('failed', 'Upload failed')], default='ready', help_text="State of the primary image's background upload", max_length=10),
+        ),
+        migrations.AddField(
+            model_name='productimage',
+            name='upload_status',
+            field=models.CharField(choices=[('ready', 'Ready'), ('pending', 'Pending upload'), ('failed', 'Upload failed')], default='ready', help_text="State of the image's background upload", max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='productimage',
+            name='image_url',
+            field=models.URLField(blank=True, help_text='URL to the image (from ImageKit), empty until uploaded'),
+        ),
+        migrations.CreateModel(
+            name='ImageUploadJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_name', models.CharField(max_length=255)),
+                ('folder', models.CharField(max_length=255)),
+                ('data', models.BinaryField(help_text='Image content, cleared once uploaded')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('product', models.ForeignKey(blank=True, help_text='Product whose primary image is being uploaded', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='upload_jobs', to='store.product')),
+                ('product_image', models.ForeignKey(blank=True, help_text='Additional product image being uploaded', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='upload_jobs', to='store.productimage')),
+            ],
+            options={
+                'verbose_name': 'Image Upload Job',
+                'verbose_name_plural': 'Image Upload Jobs',
+                'ordering': ['next_attempt_at', 'id'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='upload_job_queue_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-17 19:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0005_image_upload_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='sku',
+            field=models.CharField(blank=True, help_text='Optional unique stock-keeping code, used by catalog imports', max_length=64, null=True, unique=True),
+        ),
+    ]
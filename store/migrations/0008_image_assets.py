@@ -0,0 +1,27 @@
+# Generated by Django 5.2.1 on 2026-10-17 19:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0007_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageAsset',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(help_text='SHA-256 hex digest of the original image bytes', max_length=64, unique=True)),
+                ('url', models.URLField(db_index=True, help_text='URL of the uploaded image (from ImageKit)')),
+                ('derivatives', models.JSONField(blank=True, default=dict, help_text='URLs of the resized copies, by size and format')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Image Asset',
+                'verbose_name_plural': 'Image Assets',
+            },
+        ),
+    ]
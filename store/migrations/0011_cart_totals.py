@@ -0,0 +1,54 @@
+# Generated by Django 5.2.1 on 2026-10-17 21:10
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_totals(apps, schema_editor):
+    """Copy product prices onto existing cart lines and total every cart."""
+    Cart = apps.get_model('store', 'Cart')
+    CartItem = apps.get_model('store', 'CartItem')
+    Product = apps.get_model('store', 'Product')
+    CartItem.objects.update(
+        unit_price=Subquery(Product.objects.filter(pk=OuterRef('product_id')).values('price')),
+    )
+    lines = CartItem.objects.filter(cart_id=OuterRef('pk')).values('cart_id')
+    money = DecimalField(max_digits=12, decimal_places=2)
+    Cart.objects.filter(items__isnull=False).update(
+        item_count=Subquery(lines.annotate(total=Sum('quantity')).values('total')),
+        subtotal=Coalesce(
+            Subquery(lines.annotate(total=Sum(F('unit_price') * F('quantity'), output_field=money)).values('total')),
+            Value(Decimal('0.00')),
+            output_field=money,
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0010_orders_and_stock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0, help_text="Total quantity across the cart's items"),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='subtotal',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text="Sum of the items' unit price times quantity", max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='cartitem',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text="The product's price, copied onto the line", max_digits=10),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.1 on 2026-10-17 20:50
+
+from django.db import migrations, models
+
+
+def untrack_unstocked_products(apps, schema_editor):
+    """
+    Stop tracking stock for products that never had any.
+
+    0010 gave every existing product a stock of 0, which made them
+    impossible to order. Products still at 0 that were never ordered
+    were not stocked by anyone, so they go back to untracked stock;
+    products that sold out through checkout keep their 0.
+    """
+    Product = apps.get_model('store', 'Product')
+    Product.objects.filter(stock=0, orderline__isnull=True).update(stock=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0013_product_updated_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='stock',
+            field=models.PositiveIntegerField(blank=True, help_text='Units available to order, reserved at checkout; leave empty not to track stock', null=True),
+        ),
+        migrations.RunPython(untrack_unstocked_products, migrations.RunPython.noop),
+    ]
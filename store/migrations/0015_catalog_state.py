@@ -0,0 +1,24 @@
+# Generated by Django 5.2.1 on 2026-10-17 20:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0014_untracked_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_deletions', models.PositiveBigIntegerField(default=0, help_text='Number of products deleted so far')),
+            ],
+            options={
+                'verbose_name': 'Catalog State',
+                'verbose_name_plural': 'Catalog State',
+            },
+        ),
+    ]
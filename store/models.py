@@ -5,23 +5,87 @@ This module defines the core data models for the e-commerce platform,
 including products and their associated images.
 """
 
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
-from ecommerce.utils.imagekit_uploader import upload_image_to_imagekit
+from django.utils import timezone
+
+
+class UploadStatus(models.TextChoices):
+    """State of a product image's background upload."""
+    READY = 'ready', 'Ready'
+    PENDING = 'pending', 'Pending upload'
+    FAILED = 'failed', 'Upload failed'
+
+
+class ImageDerivativesMixin:
+    """
+    Accessors for the resized copies of a model's image.
+
+    ``image_derivatives`` maps each derivative name (see
+    ``ecommerce.utils.image_pipeline.DERIVATIVE_SIZES``) to its JPEG and
+    WebP URLs. Images uploaded before derivatives existed fall back to the
+    original URL.
+    """
+
+    original_image_field = None
+
+    def get_image(self, size):
+        """
+        Get the URLs of one derivative size.
+
+        Args:
+            size (str): 'thumb', 'card' or 'detail'
+
+        Returns:
+            dict: ``jpeg`` and ``webp`` URLs (``webp`` may be None)
+        """
+        derivative = (self.image_derivatives or {}).get(size) or {}
+        return {
+            'jpeg': derivative.get('jpeg') or getattr(self, self.original_image_field),
+            'webp': derivative.get('webp'),
+        }
+
+    @property
+    def thumb_image(self):
+        return self.get_image('thumb')
+
+    @property
+    def card_image(self):
+        return self.get_image('card')
+
+    @property
+    def detail_image(self):
+        return self.get_image('detail')
 
 
-class Product(models.Model):
+class Product(ImageDerivativesMixin, models.Model):
     """
     Represents a product in the e-commerce store.
     
     Attributes:
+        sku (str): Optional unique stock-keeping code, used by catalog imports
         name (str): The name of the product
         description (str): Detailed description of the product
         price (Decimal): The price of the product
+        stock (int): Units available to order, or None if stock is not tracked
         primary_image_url (str): URL to the main product image
+        image_derivatives (dict): URLs of the resized primary image, by size and format
+        upload_status (str): State of the primary image's background upload
         created_at (datetime): Timestamp of when the product was created
         updated_at (datetime): Timestamp of the last update
+        search_vector (SearchVector): Full-text search document (PostgreSQL only)
     """
     
+    sku = models.CharField(
+        max_length=64,
+        unique=True,
+        null=True,
+        blank=True,
+        help_text="Optional unique stock-keeping code, used by catalog imports"
+    )
     name = models.CharField(
         max_length=255,
         help_text="The name of the product"
@@ -35,11 +99,27 @@ class Product(models.Model):
         decimal_places=2,
         help_text="The price of the product"
     )
+    stock = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Units available to order, reserved at checkout; leave empty not to track stock"
+    )
     primary_image_url = models.URLField(
         blank=True,
         null=True,
         help_text="URL to the main product image (from ImageKit)"
     )
+    image_derivatives = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="URLs of the resized primary image, by size and format"
+    )
+    upload_status = models.CharField(
+        max_length=10,
+        choices=UploadStatus.choices,
+        default=UploadStatus.READY,
+        help_text="State of the primary image's background upload"
+    )
     created_at = models.DateTimeField(
         auto_now_add=True,
         help_text="Timestamp of when the product was created"
@@ -48,39 +128,45 @@ class Product(models.Model):
         auto_now=True,
         help_text="Timestamp of the last update"
     )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        help_text="Full-text search document, maintained by the search backend"
+    )
 
     class Meta:
         """Meta options for the Product model."""
         ordering = ['-created_at']
+        indexes = [
+            # Supports keyset pagination of the shop, newest first
+            models.Index(fields=['-created_at', '-id'], name='product_created_id_idx'),
+            # Supports the catalog version (see store.catalog)
+            models.Index(fields=['updated_at'], name='product_updated_idx'),
+        ]
         verbose_name = "Product"
         verbose_name_plural = "Products"
 
+    original_image_field = 'primary_image_url'
+
     def __str__(self):
         """String representation of the product."""
         return self.name
 
-    def set_primary_image(self, image_file):
-        """
-        Set the primary image for the product.
-        
-        Args:
-            image_file: The image file to be uploaded
-            
-        Returns:
-            None
-        """
-        url = upload_image_to_imagekit(image_file, image_file.name, folder='/products/primary/')
-        self.primary_image_url = url
-        self.save(update_fields=['primary_image_url'])
+    @property
+    def in_stock(self):
+        """Whether the product can be ordered; untracked stock never runs out."""
+        return self.stock is None or self.stock > 0
 
 
-class ProductImage(models.Model):
+class ProductImage(ImageDerivativesMixin, models.Model):
     """
     Represents additional images for a product.
     
     Attributes:
         product (Product): The associated product
         image_url (str): URL to the image (from ImageKit)
+        image_derivatives (dict): URLs of the resized image, by size and format
+        upload_status (str): State of the image's background upload
         order (int): Display order of the image
     """
     
@@ -91,7 +177,19 @@ class ProductImage(models.Model):
         help_text="The associated product"
     )
     image_url = models.URLField(
-        help_text="URL to the image (from ImageKit)"
+        blank=True,
+        help_text="URL to the image (from ImageKit), empty until uploaded"
+    )
+    image_derivatives = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="URLs of the resized image, by size and format"
+    )
+    upload_status = models.CharField(
+        max_length=10,
+        choices=UploadStatus.choices,
+        default=UploadStatus.READY,
+        help_text="State of the image's background upload"
     )
     order = models.PositiveIntegerField(
         help_text="Display order of the image"
@@ -104,6 +202,8 @@ class ProductImage(models.Model):
         verbose_name = "Product Image"
         verbose_name_plural = "Product Images"
 
+    original_image_field = 'image_url'
+
     def __str__(self):
         """String representation of the product image."""
         return f"{self.product.name} Image #{self.order}"
@@ -112,28 +212,42 @@ class ProductImage(models.Model):
 class Cart(models.Model):
     """
     Represents a shopping cart.
+
+    ``item_count`` and ``subtotal`` are kept up to date by every change to
+    the cart's items (see ``store.cart``), so the badge and the totals are
+    read from this row alone. ``manage.py verify_cart_totals`` checks them
+    against the items.
     
     Attributes:
+        item_count (int): Total quantity across the cart's items
+        subtotal (Decimal): Sum of the items' unit price times quantity
         created_at (datetime): Timestamp of when the cart was created
-        updated_at (datetime): Timestamp of the last update
+        updated_at (datetime): Timestamp of the last change to the cart or its items
     """
     
+    item_count = models.PositiveIntegerField(
+        default=0,
+        help_text="Total quantity across the cart's items"
+    )
+    subtotal = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        help_text="Sum of the items' unit price times quantity"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        """Meta options for the Cart model."""
+        indexes = [
+            # Supports finding abandoned carts (see manage.py prune_carts)
+            models.Index(fields=['updated_at', 'id'], name='cart_updated_id_idx'),
+        ]
+
     def __str__(self):
         return f"Cart {self.id}"
 
-    @property
-    def total_price(self):
-        """Calculate the total price of all items in the cart."""
-        return sum(item.total_price for item in self.items.all())
-
-    @property
-    def item_count(self):
-        """Get the total number of items in the cart."""
-        return sum(item.quantity for item in self.items.all())
-
 
 class CartItem(models.Model):
     """
@@ -143,6 +257,7 @@ class CartItem(models.Model):
         cart (Cart): The associated cart
         product (Product): The product in the cart
         quantity (int): The quantity of the product
+        unit_price (Decimal): The product's price, copied onto the line
     """
     
     cart = models.ForeignKey(
@@ -160,6 +275,11 @@ class CartItem(models.Model):
         default=1,
         help_text="The quantity of the product"
     )
+    unit_price = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        help_text="The product's price, copied onto the line"
+    )
 
     class Meta:
         unique_together = ('cart', 'product')
@@ -170,4 +290,278 @@ class CartItem(models.Model):
     @property
     def total_price(self):
         """Calculate the total price for this item."""
-        return self.product.price * self.quantity
+        return self.unit_price * self.quantity
+
+
+class ProductRecommendation(models.Model):
+    """
+    A product often found in the same carts as another.
+
+    Rows are precomputed by ``manage.py build_recommendations`` (see
+    ``store.recommendations``), which keeps the top few for each product.
+
+    Attributes:
+        product (Product): The product the recommendation is shown with
+        recommended (Product): The recommended product
+        score (int): Number of carts holding both products
+        rank (int): Position among the product's recommendations, from 1
+        computed_at (datetime): Start of the run that computed the row
+    """
+
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='recommendations',
+        help_text="The product the recommendation is shown with"
+    )
+    recommended = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='recommended_for',
+        help_text="The recommended product"
+    )
+    score = models.PositiveIntegerField(help_text="Number of carts holding both products")
+    rank = models.PositiveSmallIntegerField(help_text="Position among the product's recommendations, from 1")
+    computed_at = models.DateTimeField(help_text="Start of the run that computed the row")
+
+    class Meta:
+        """Meta options for the ProductRecommendation model."""
+        ordering = ['product', 'rank']
+        # Also the index the product page reads a product's recommendations by
+        unique_together = ('product', 'rank')
+        verbose_name = "Product Recommendation"
+        verbose_name_plural = "Product Recommendations"
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.recommended_id} (#{self.rank})"
+
+
+class Order(models.Model):
+    """
+    An order placed from a cart at checkout.
+
+    Attributes:
+        user (User): The customer, if they were logged in
+        full_name (str): Name of the customer
+        email (str): Email address for order updates
+        shipping_address (str): Where to deliver the order
+        status (str): Fulfilment state of the order
+        total_price (Decimal): Sum of the line totals at checkout
+        created_at (datetime): Timestamp of when the order was placed
+        updated_at (datetime): Timestamp of the last update
+    """
+
+    class Status(models.TextChoices):
+        PLACED = 'placed', 'Placed'
+        PAID = 'paid', 'Paid'
+        SHIPPED = 'shipped', 'Shipped'
+        CANCELLED = 'cancelled', 'Cancelled'
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='orders',
+        help_text="The customer, if they were logged in"
+    )
+    full_name = models.CharField(max_length=255)
+    email = models.EmailField()
+    shipping_address = models.TextField()
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.PLACED
+    )
+    total_price = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        help_text="Sum of the line totals at checkout"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        """Meta options for the Order model."""
+        ordering = ['-created_at']
+        verbose_name = "Order"
+        verbose_name_plural = "Orders"
+
+    def __str__(self):
+        return f"Order {self.id}"
+
+
+class OrderLine(models.Model):
+    """
+    A product in an order, with its name and price as they were at checkout.
+
+    Attributes:
+        order (Order): The order the line belongs to
+        product (Product): The product ordered, if it still exists
+        product_name (str): The product's name at checkout
+        unit_price (Decimal): The product's price at checkout
+        quantity (int): The number of units ordered
+    """
+
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.CASCADE,
+        related_name='lines',
+        help_text="The order the line belongs to"
+    )
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.SET_NULL,
+        null=True,
+        help_text="The product ordered, if it still exists"
+    )
+    product_name = models.CharField(max_length=255)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+    quantity = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f"{self.quantity}x {self.product_name}"
+
+    @property
+    def total_price(self):
+        """Calculate the total price for this line."""
+        return self.unit_price * self.quantity
+
+
+class ImageUploadJob(models.Model):
+    """
+    A queued upload of an image to ImageKit.
+
+    Admin saves store the processed image bytes here and return at once;
+    ``manage.py process_image_uploads`` uploads them in the background and
+    fills in the URL on the target product or product image.
+
+    Attributes:
+        product (Product): Product whose primary image is being uploaded
+        product_image (ProductImage): Additional image being uploaded
+        file_name (str): Name to give the uploaded file
+        folder (str): ImageKit folder to upload into
+        data (bytes): The image content, cleared once uploaded
+        status (str): Queue state of the job
+        attempts (int): Number of upload attempts made so far
+        next_attempt_at (datetime): Earliest time the job may be retried
+        last_error (str): Error message from the last failed attempt
+        created_at (datetime): Timestamp of when the job was queued
+        updated_at (datetime): Timestamp of the last state change
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        PROCESSING = 'processing', 'Processing'
+        DONE = 'done', 'Done'
+        FAILED = 'failed', 'Failed'
+
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='upload_jobs',
+        help_text="Product whose primary image is being uploaded"
+    )
+    product_image = models.ForeignKey(
+        ProductImage,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='upload_jobs',
+        help_text="Additional product image being uploaded"
+    )
+    file_name = models.CharField(max_length=255)
+    folder = models.CharField(max_length=255)
+    data = models.BinaryField(help_text="Image content, cleared once uploaded")
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        """Meta options for the ImageUploadJob model."""
+        ordering = ['next_attempt_at', 'id']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='upload_job_queue_idx'),
+        ]
+        verbose_name = "Image Upload Job"
+        verbose_name_plural = "Image Upload Jobs"
+
+    def __str__(self):
+        return f"Upload {self.file_name} ({self.status})"
+
+    @property
+    def target(self):
+        """The product or product image this upload is for."""
+        return self.product_image if self.product_image_id else self.product
+
+
+class ImageAsset(models.Model):
+    """
+    An image already uploaded to ImageKit, identified by its content.
+
+    Before uploading, the image bytes are hashed and looked up here; if the
+    same content was uploaded before, its URLs are reused instead of
+    uploading it again.
+
+    Attributes:
+        content_hash (str): SHA-256 hex digest of the original image bytes
+        url (str): URL of the uploaded image
+        derivatives (dict): URLs of the resized copies, by size and format
+        created_at (datetime): Timestamp of the first upload
+    """
+
+    content_hash = models.CharField(
+        max_length=64,
+        unique=True,
+        help_text="SHA-256 hex digest of the original image bytes"
+    )
+    url = models.URLField(
+        db_index=True,
+        help_text="URL of the uploaded image (from ImageKit)"
+    )
+    derivatives = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="URLs of the resized copies, by size and format"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        """Meta options for the ImageAsset model."""
+        verbose_name = "Image Asset"
+        verbose_name_plural = "Image Assets"
+
+    def __str__(self):
+        return f"{self.content_hash[:12]} {self.url}"
+
+
+class CatalogState(models.Model):
+    """
+    Catalog-wide counters, kept in a single row.
+
+    Attributes:
+        product_deletions (int): Number of products deleted so far; part of
+            the catalog version (see ``store.catalog``)
+    """
+
+    product_deletions = models.PositiveBigIntegerField(
+        default=0,
+        help_text="Number of products deleted so far"
+    )
+
+    class Meta:
+        """Meta options for the CatalogState model."""
+        verbose_name = "Catalog State"
+        verbose_name_plural = "Catalog State"
+
+    def __str__(self):
+        return f"{self.product_deletions} product deletions"
@@ -0,0 +1,151 @@
+"""
+Checkout for the store application.
+
+``place_order`` turns a cart into an ``Order`` in one transaction. Stock is
+reserved with one conditional statement per line::
+
+    UPDATE product SET stock = stock - qty
+    WHERE id = ... AND (stock IS NULL OR stock >= qty) RETURNING name
+
+so there is no read-then-write window in which two checkouts could both
+see enough stock: the row lock taken by the ``UPDATE`` serializes
+checkouts of the same product only for as long as the short transaction
+runs, and a line that would oversell matches no row. Products whose stock
+is not tracked (``stock`` is NULL) can always be ordered, and stay NULL.
+The returned name is snapshotted onto the order lines.
+
+Lines are charged at the cart line's ``unit_price``, the price the cart and
+checkout pages show, not at whatever ``Product.price`` holds by the time
+the order is submitted. Callers can also pass the total the customer was
+shown; if the cart no longer adds up to it, ``PriceChanged`` is raised and
+nothing is ordered.
+"""
+
+from decimal import Decimal
+
+from django.db import connection, transaction
+
+from .cart import clear_items
+from .models import CartItem, Order, OrderLine, Product
+from .routers import pin_primary
+
+
+class CheckoutError(Exception):
+    """Raised when a cart cannot be turned into an order."""
+
+
+class EmptyCart(CheckoutError):
+    """Raised when checking out a cart without lines."""
+
+
+class OutOfStock(CheckoutError):
+    """
+    Raised when a product does not have enough stock for a line.
+
+    Attributes:
+        product_id (int): The product that ran out
+    """
+
+    def __init__(self, product_id):
+        self.product_id = product_id
+        super().__init__(f"Not enough stock for product {product_id}")
+
+
+class PriceChanged(CheckoutError):
+    """
+    Raised when the cart's total differs from the one the customer saw.
+
+    Attributes:
+        total (Decimal): The cart's current total
+    """
+
+    def __init__(self, total):
+        self.total = total
+        super().__init__(f"The cart total is now {total}")
+
+
+def reserve_stock(product_id, quantity):
+    """
+    Take units of a product out of stock, if enough are left.
+
+    Products that do not track stock are never short.
+
+    Must be called inside a transaction, so the reservation is undone if the
+    checkout fails later on.
+
+    Args:
+        product_id (int): The product to reserve
+        quantity (int): How many units to reserve
+
+    Returns:
+        str: The product's name, or None if it lacks stock or does not exist
+    """
+    qn = connection.ops.quote_name
+    sql = (
+        f"UPDATE {qn(Product._meta.db_table)} SET stock = stock - %s "
+        f"WHERE id = %s AND (stock IS NULL OR stock >= %s) RETURNING name"
+    )
+    pin_primary()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [quantity, product_id, quantity])
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def place_order(cart_id, full_name, email, shipping_address, user=None, expected_total=None):
+    """
+    Turn a cart into an order, reserving stock for every line.
+
+    Either the whole order is placed, stock is reserved for every line and
+    the cart is emptied, or nothing changes.
+
+    Args:
+        cart_id (int): The cart to check out
+        full_name (str): Name of the customer
+        email (str): Email address for order updates
+        shipping_address (str): Where to deliver the order
+        user (User): The logged-in customer, if any
+        expected_total (Decimal): The total shown to the customer, if known
+
+    Returns:
+        Order: The placed order
+
+    Raises:
+        EmptyCart: If the cart has no lines
+        OutOfStock: If a product does not have enough stock
+        PriceChanged: If the total is not ``expected_total``
+    """
+    with transaction.atomic():
+        # Reserving in product order means concurrent checkouts of
+        # overlapping carts always lock rows in the same order and cannot
+        # deadlock.
+        items = list(
+            CartItem.objects.filter(cart_id=cart_id)
+            .order_by('product_id')
+            .values_list('product_id', 'quantity', 'unit_price')
+        )
+        if not items:
+            raise EmptyCart("The cart is empty")
+        total_price = sum((unit_price * quantity for _, quantity, unit_price in items), Decimal('0.00'))
+        if expected_total is not None and total_price != expected_total:
+            raise PriceChanged(total_price)
+
+        lines = []
+        for product_id, quantity, unit_price in items:
+            name = reserve_stock(product_id, quantity)
+            if name is None:
+                raise OutOfStock(product_id)
+            lines.append(OrderLine(product_id=product_id, product_name=name, unit_price=unit_price, quantity=quantity))
+
+        order = Order.objects.create(
+            user=user,
+            full_name=full_name,
+            email=email,
+            shipping_address=shipping_address,
+            total_price=total_price,
+        )
+        for line in lines:
+            line.order = order
+        OrderLine.objects.bulk_create(lines)
+        clear_items(cart_id)
+    return order
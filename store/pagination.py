@@ -0,0 +1,187 @@
+"""
+Keyset (cursor) pagination for the store application.
+
+Instead of ``OFFSET``, each page seeks past the ``(created_at, id)`` of the
+last row shown, using the composite index on those columns. The cost of a
+page is therefore the same at any depth, and no ``COUNT(*)`` is needed.
+"""
+
+import base64
+import binascii
+
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor from the query string cannot be decoded."""
+
+
+def encode_cursor(obj):
+    """
+    Encode an object's position as an opaque cursor.
+
+    Args:
+        obj: A model instance with ``created_at`` and ``id``
+
+    Returns:
+        str: A URL-safe cursor string
+    """
+    raw = f"{obj.created_at.isoformat()}|{obj.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor back into a ``(created_at, id)`` position.
+
+    Args:
+        cursor (str): A cursor produced by ``encode_cursor``
+
+    Returns:
+        tuple: The ``(created_at, id)`` position
+
+    Raises:
+        InvalidCursor: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, pk = base64.urlsafe_b64decode(padded).decode().split('|')
+        position = (parse_datetime(created_at), int(pk))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor(cursor)
+    if position[0] is None:
+        raise InvalidCursor(cursor)
+    return position
+
+
+class CursorPage:
+    """
+    A single page of keyset-paginated results.
+
+    Attributes:
+        object_list (list): The objects on this page, newest first
+        next_cursor (str): Cursor for the following page, or None
+        previous_cursor (str): Cursor for the preceding page, or None
+        estimated_count (int): Approximate total row count, or None
+    """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None, estimated_count=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.estimated_count = estimated_count
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+
+def paginate_by_cursor(queryset, page_size, after=None, before=None):
+    """
+    Fetch one page of a queryset ordered newest first by ``(created_at, id)``.
+
+    Args:
+        queryset: The queryset to paginate
+        page_size (int): Number of objects per page
+        after (str): Cursor of the last object on the previous page
+        before (str): Cursor of the first object on the next page
+
+    Returns:
+        CursorPage: The requested page
+
+    Raises:
+        InvalidCursor: If either cursor is malformed
+    """
+    queryset, backwards = _cursor_queryset(queryset, page_size, after, before)
+    return _cursor_page(list(queryset), page_size, after, backwards)
+
+
+async def apaginate_by_cursor(queryset, page_size, after=None, before=None):
+    """Async version of ``paginate_by_cursor``."""
+    queryset, backwards = _cursor_queryset(queryset, page_size, after, before)
+    return _cursor_page([obj async for obj in queryset], page_size, after, backwards)
+
+
+def _cursor_queryset(queryset, page_size, after, before):
+    """
+    Build the query fetching one page plus one extra row.
+
+    Returns:
+        tuple: (queryset, True if it walks backwards from ``before``)
+    """
+    if before:
+        created_at, pk = decode_cursor(before)
+        queryset = (
+            queryset.filter(Q(created_at__gte=created_at), Q(created_at__gt=created_at) | Q(id__gt=pk))
+            .order_by('created_at', 'id')
+        )
+        return queryset[:page_size + 1], True
+    if after:
+        created_at, pk = decode_cursor(after)
+        queryset = queryset.filter(
+            Q(created_at__lte=created_at), Q(created_at__lt=created_at) | Q(id__lt=pk)
+        )
+    return queryset.order_by('-created_at', '-id')[:page_size + 1], False
+
+
+def _cursor_page(rows, page_size, after, backwards):
+    """Turn the fetched rows into a page, newest first."""
+    if backwards:
+        has_previous = len(rows) > page_size
+        rows = rows[:page_size][::-1]
+        has_next = True
+    else:
+        has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        has_previous = bool(after)
+
+    return CursorPage(
+        rows,
+        next_cursor=encode_cursor(rows[-1]) if rows and has_next else None,
+        previous_cursor=encode_cursor(rows[0]) if rows and has_previous else None,
+    )
+
+
+def estimate_count(queryset):
+    """
+    Estimate the number of rows in a model's table.
+
+    On PostgreSQL the planner's ``reltuples`` statistic is used, which costs
+    a single catalog lookup instead of a table scan. Other databases, and
+    tables that have never been analyzed, fall back to an exact count.
+
+    Args:
+        queryset: An unfiltered queryset over the table
+
+    Returns:
+        int: The approximate number of rows
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        if row and row[0] >= 0:
+            return row[0]
+    return queryset.count()
+
+
+async def aestimate_count(queryset):
+    """Async version of ``estimate_count``."""
+    return await sync_to_async(estimate_count)(queryset)
@@ -0,0 +1,114 @@
+"""
+"Frequently bought together" recommendations for the store application.
+
+Two products co-occur when they are in the same cart. ``manage.py
+build_recommendations`` counts co-occurrences from ``CartItem`` rows and
+stores the top few products for each product as ``ProductRecommendation``
+rows, so the product page reads them with one query on the
+``(product, rank)`` index.
+
+Counting is a set operation in the database: for a batch of products, the
+cart items are joined to the other items of the same carts, grouped by
+product pair, ranked with ``ROW_NUMBER()`` and the top rows inserted, all
+in one ``INSERT ... SELECT``. Only the batch's product ids pass through
+Python, so memory use does not grow with the number of cart lines.
+
+A full build recomputes every product that is in a cart. An incremental
+build only recomputes the products in carts changed since the previous
+run; counts lowered by deleted carts or removed lines are corrected by the
+next full build.
+"""
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max, Q
+
+from .models import CartItem, Product, ProductRecommendation
+
+
+def get_recommended_products(product_id, limit=None):
+    """
+    Get the in-stock products recommended with a product.
+
+    Args:
+        product_id (int): The product being viewed
+        limit (int): Number of products (default: ``RECOMMENDATIONS_SHOWN``)
+
+    Returns:
+        QuerySet: The recommended products, best first
+    """
+    if limit is None:
+        limit = getattr(settings, 'RECOMMENDATIONS_SHOWN', 4)
+    return (
+        Product.objects.filter(Q(stock__isnull=True) | Q(stock__gt=0), recommended_for__product_id=product_id)
+        .order_by('recommended_for__rank')[:limit]
+    )
+
+
+def last_build_started():
+    """
+    Get the start time of the last build that stored recommendations.
+
+    Returns:
+        datetime: The time, or None if nothing has been built yet
+    """
+    return ProductRecommendation.objects.aggregate(started=Max('computed_at'))['started']
+
+
+def products_in_carts(since=None):
+    """
+    Build the query for the products that are in carts.
+
+    Args:
+        since (datetime): Only carts changed at or after this time
+
+    Returns:
+        QuerySet: Distinct product ids, in ascending order
+    """
+    items = CartItem.objects.all()
+    if since is not None:
+        items = items.filter(cart__updated_at__gte=since)
+    return items.order_by('product_id').values_list('product_id', flat=True).distinct()
+
+
+def build_recommendations(product_ids, computed_at, top=10, min_count=2):
+    """
+    Recompute and store the recommendations for a batch of products.
+
+    Args:
+        product_ids (list): The products to recompute
+        computed_at (datetime): Start of the current run
+        top (int): Recommendations kept per product
+        min_count (int): Fewest shared carts for a pair to count
+
+    Returns:
+        int: Number of recommendations stored
+    """
+    qn = connection.ops.quote_name
+    item_table = qn(CartItem._meta.db_table)
+    cart_column = qn(CartItem._meta.get_field('cart').column)
+    product_column = qn(CartItem._meta.get_field('product').column)
+    placeholders = ', '.join(['%s'] * len(product_ids))
+    sql = (
+        f"INSERT INTO {qn(ProductRecommendation._meta.db_table)} "
+        f"({qn(ProductRecommendation._meta.get_field('product').column)}, "
+        f"{qn(ProductRecommendation._meta.get_field('recommended').column)}, score, {qn('rank')}, computed_at) "
+        f"SELECT product_id, recommended_id, score, position, %s FROM ("
+        f"SELECT product_id, recommended_id, score, "
+        f"ROW_NUMBER() OVER (PARTITION BY product_id ORDER BY score DESC, recommended_id) AS position "
+        f"FROM ("
+        f"SELECT a.{product_column} AS product_id, b.{product_column} AS recommended_id, COUNT(*) AS score "
+        f"FROM {item_table} a JOIN {item_table} b "
+        f"ON b.{cart_column} = a.{cart_column} AND b.{product_column} <> a.{product_column} "
+        f"WHERE a.{product_column} IN ({placeholders}) "
+        f"GROUP BY a.{product_column}, b.{product_column} "
+        f"HAVING COUNT(*) >= %s"
+        f") pairs"
+        f") ranked WHERE position <= %s"
+    )
+    params = [connection.ops.adapt_datetimefield_value(computed_at), *product_ids, min_count, top]
+    with transaction.atomic():
+        ProductRecommendation.objects.filter(product_id__in=product_ids).delete()
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.rowcount
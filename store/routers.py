@@ -0,0 +1,121 @@
+"""
+Database routing for the store application.
+
+``ReplicaRouter`` sends reads of the catalog and cart tables to the read
+replicas listed in ``settings.DATABASE_REPLICAS``, and every write to the
+primary (``default``) database. Without replicas it routes nothing.
+
+Replicas lag behind the primary, so a visitor who has just changed their
+cart must not read it back from a replica. Once a request writes, the rest
+of it reads from the primary, and ``store.middleware.ReplicaPinMiddleware``
+sets a short-lived cookie that keeps the visitor's next requests on the
+primary for ``REPLICA_PIN_SECONDS``. Reads inside a transaction on the
+primary always stay on the primary too.
+
+Code that writes with raw SQL on ``django.db.connection`` bypasses the
+router and must call ``pin_primary`` itself.
+"""
+
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Models whose reads may be served by a replica
+REPLICA_MODELS = {
+    'store.product',
+    'store.productimage',
+    'store.imageasset',
+    'store.cart',
+    'store.cartitem',
+}
+
+
+class RoutingState:
+    """
+    Routing decisions for one request (or one management command run).
+
+    Attributes:
+        pinned (bool): Read everything from the primary
+        wrote (bool): Something was written to the primary
+        replica (str): The replica chosen for this request's reads
+    """
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+        self.replica = None
+
+
+_state = ContextVar('store_routing_state', default=None)
+
+
+def get_routing_state():
+    """Get the current context's routing state, creating it if needed."""
+    state = _state.get()
+    if state is None:
+        state = RoutingState()
+        _state.set(state)
+    return state
+
+
+def start_routing(pinned=False):
+    """
+    Give the current request a fresh routing state.
+
+    Args:
+        pinned (bool): Read everything from the primary from the start
+
+    Returns:
+        Token: Pass to ``finish_routing`` when the request is done
+    """
+    return _state.set(RoutingState(pinned=pinned))
+
+
+def finish_routing(token):
+    """Drop the request's routing state, so it cannot leak into the next."""
+    _state.reset(token)
+
+
+def pin_primary():
+    """Record a write, so later reads in this context use the primary."""
+    if get_replicas():
+        state = get_routing_state()
+        state.pinned = state.wrote = True
+
+
+def get_replicas():
+    """Get the aliases of the configured read replicas."""
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+class ReplicaRouter:
+    """
+    Route catalog and cart reads to replicas and all writes to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = get_replicas()
+        if not replicas or model._meta.label_lower not in REPLICA_MODELS:
+            return None
+        state = get_routing_state()
+        if state.pinned or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        if state.replica is None:
+            state.replica = random.choice(replicas)
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        pin_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive schema changes through replication
+        if db in get_replicas():
+            return False
+        return None
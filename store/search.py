@@ -0,0 +1,305 @@
+"""
+Product search backends for the store application.
+
+This module provides a small pluggable interface for full-text product
+search, with two engines:
+
+- ``PostgresSearchBackend`` ranks matches with PostgreSQL full-text search
+  over the GIN-indexed ``Product.search_vector`` column.
+- ``InMemorySearchBackend`` keeps an in-process inverted index, for SQLite
+  and test deployments where PostgreSQL full-text search is unavailable.
+
+The active backend is chosen by the ``SEARCH_BACKEND`` setting, or from the
+database vendor when it is not set. The PostgreSQL index is kept up to date
+one product at a time by the signal handlers in ``store.signals``, and by
+imports. The in-memory index gets the same updates, and catches up with
+changes made by other processes when the catalog version (see
+``store.catalog``) moves.
+"""
+
+import math
+import re
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils.module_loading import import_string
+
+from .catalog import get_catalog_state
+from .models import Product
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """
+    Split text into lowercase search terms.
+
+    Args:
+        text (str): The text to tokenize
+
+    Returns:
+        list: The terms found in the text
+    """
+    return TOKEN_RE.findall((text or '').lower())
+
+
+class BaseSearchBackend:
+    """
+    Interface implemented by every product search backend.
+
+    ``search`` returns a sliceable sequence of products in relevance order,
+    so the result can be handed straight to Django's ``Paginator``.
+    """
+
+    def search(self, query):
+        """
+        Find products matching a query, best matches first.
+
+        Args:
+            query (str): The user's search text
+
+        Returns:
+            A sliceable sequence of Product instances
+        """
+        raise NotImplementedError
+
+    def index_product(self, product):
+        """
+        Add or refresh a single product in the index.
+
+        Args:
+            product (Product): The product that was saved
+        """
+        raise NotImplementedError
+
+    def index_products(self, products):
+        """
+        Add or refresh many products at once, e.g. after a bulk import.
+
+        Args:
+            products: Iterable of saved Product instances
+        """
+        for product in products:
+            self.index_product(product)
+
+    def remove_product(self, product_id):
+        """
+        Remove a single product from the index.
+
+        Args:
+            product_id (int): Primary key of the deleted product
+        """
+        raise NotImplementedError
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    Full-text search using PostgreSQL ``tsvector`` columns.
+
+    Names are weighted above descriptions, and results are ranked with
+    ``ts_rank`` before falling back to newest first.
+    """
+
+    config = 'english'
+
+    def get_vector(self):
+        """Build the weighted search vector stored for each product."""
+        return (
+            SearchVector('name', weight='A', config=self.config)
+            + SearchVector('description', weight='B', config=self.config)
+        )
+
+    def search(self, query):
+        search_query = SearchQuery(query, search_type='websearch', config=self.config)
+        return (
+            Product.objects.filter(search_vector=search_query)
+            .annotate(rank=SearchRank(F('search_vector'), search_query))
+            .order_by('-rank', '-created_at', '-id')
+        )
+
+    def index_product(self, product):
+        Product.objects.filter(pk=product.pk).update(search_vector=self.get_vector())
+
+    def index_products(self, products):
+        Product.objects.filter(pk__in=[product.pk for product in products]).update(
+            search_vector=self.get_vector()
+        )
+
+    def remove_product(self, product_id):
+        # The search vector is stored on the product row and goes with it.
+        pass
+
+
+class RankedProducts:
+    """
+    Lazily loaded products for a list of ranked ids.
+
+    Only the slice that is actually displayed is fetched from the database,
+    in a single query, and returned in rank order.
+    """
+
+    def __init__(self, product_ids):
+        self.product_ids = product_ids
+
+    def __len__(self):
+        return len(self.product_ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            ids = self.product_ids[index]
+            products = Product.objects.in_bulk(ids)
+            return [products[pk] for pk in ids if pk in products]
+        return Product.objects.get(pk=self.product_ids[index])
+
+
+class InMemorySearchBackend(BaseSearchBackend):
+    """
+    Per-process inverted index over product names and descriptions.
+
+    The index is built from the database on the first search. Products
+    saved or deleted in this process are applied to it by the signal and
+    import hooks once their transaction commits. Before each search the
+    catalog state (see ``store.catalog``) is checked: products updated by
+    other processes, or written in bulk without signals, are re-read by
+    their indexed ``updated_at``, and only a product deletion elsewhere,
+    which leaves no row to read, makes it rebuild the whole index. Every
+    query term must match; matches are scored by term frequency and inverse
+    document frequency, with name terms weighted above description terms.
+    """
+
+    name_weight = 3
+    description_weight = 1
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = defaultdict(dict)
+        self._documents = {}
+        # Catalog state the index is up to date with; None until built
+        self._latest = None
+        self._deletions = None
+
+    def _build(self):
+        """Load every product into an empty index."""
+        self._postings = defaultdict(dict)
+        self._documents = {}
+        self._load(Product.objects.all())
+
+    def _load(self, products):
+        """(Re-)index the products of a queryset."""
+        rows = products.values_list('id', 'name', 'description')
+        for product_id, name, description in rows.iterator(chunk_size=2000):
+            self._discard(product_id)
+            self._add(product_id, name, description)
+
+    def _refresh(self):
+        """Bring the index up to date with the catalog."""
+        latest, deletions = get_catalog_state()
+        if deletions != self._deletions:
+            self._build()
+        elif latest != self._latest:
+            changed = Product.objects.all()
+            if self._latest is not None:
+                # Equal timestamps are re-read, since they may be new rows
+                changed = changed.filter(updated_at__gte=self._latest)
+            self._load(changed)
+        self._latest, self._deletions = latest, deletions
+
+    def _add(self, product_id, name, description):
+        """Index a product's text."""
+        weights = defaultdict(int)
+        for term in tokenize(name):
+            weights[term] += self.name_weight
+        for term in tokenize(description):
+            weights[term] += self.description_weight
+        for term, weight in weights.items():
+            self._postings[term][product_id] = weight
+        self._documents[product_id] = tuple(weights)
+
+    def _discard(self, product_id):
+        """Remove a product's text from the index."""
+        for term in self._documents.pop(product_id, ()):
+            postings = self._postings[term]
+            postings.pop(product_id, None)
+            if not postings:
+                del self._postings[term]
+
+    def search(self, query):
+        terms = set(tokenize(query))
+        if not terms:
+            return RankedProducts([])
+        with self._lock:
+            self._refresh()
+            postings = [self._postings.get(term, {}) for term in terms]
+            if not all(postings):
+                return RankedProducts([])
+            total = len(self._documents)
+            # Intersect starting from the rarest term to keep the scan small
+            postings.sort(key=len)
+            scores = {
+                product_id: 0.0 for product_id in postings[0]
+                if all(product_id in other for other in postings[1:])
+            }
+            for term_postings in postings:
+                idf = math.log(1 + total / len(term_postings))
+                for product_id in scores:
+                    scores[product_id] += term_postings[product_id] * idf
+        # Newer products have higher ids, so they win ties
+        ranked = sorted(scores, key=lambda pk: (scores[pk], pk), reverse=True)
+        return RankedProducts(ranked)
+
+    def _apply(self, products=(), removed=None):
+        """Apply saved or deleted products to a built index."""
+        with self._lock:
+            if self._deletions is None:
+                # Not built yet; the first search loads everything
+                return
+            for product in products:
+                self._discard(product.pk)
+                self._add(product.pk, product.name, product.description)
+            if removed is not None:
+                self._discard(removed)
+
+    def index_product(self, product):
+        self.index_products([product])
+
+    def index_products(self, products):
+        products = list(products)
+        # A rolled back save must not reach the index
+        transaction.on_commit(lambda: self._apply(products=products))
+
+    def remove_product(self, product_id):
+        transaction.on_commit(lambda: self._apply(removed=product_id))
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_search_backend():
+    """
+    Get the process-wide search backend.
+
+    Uses the dotted path in ``settings.SEARCH_BACKEND`` when set, otherwise
+    PostgreSQL full-text search on PostgreSQL and the in-memory index on
+    any other database.
+
+    Returns:
+        BaseSearchBackend: The configured search backend
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                path = getattr(settings, 'SEARCH_BACKEND', None)
+                if path:
+                    backend_class = import_string(path)
+                elif connection.vendor == 'postgresql':
+                    backend_class = PostgresSearchBackend
+                else:
+                    backend_class = InMemorySearchBackend
+                _backend = backend_class()
+    return _backend
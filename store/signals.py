@@ -0,0 +1,82 @@
+"""
+Signal handlers for the store application.
+
+These handlers keep derived data, such as the product search index, the
+product's ``updated_at``, the catalog version and the prices copied onto
+cart lines, in step with changes to the catalog, and move an anonymous cookie cart into the
+database when its owner logs in. Workers also log their database pool
+statistics as requests finish, and every database connection gets the
+request instrumentation's query recorder.
+"""
+
+from django.conf import settings
+from django.contrib.auth.signals import user_logged_in
+from django.core.signals import request_finished
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from ecommerce.utils.database import log_pool_stats
+
+from .cart import promote_cart, reprice_lines
+from .catalog import record_product_deletion
+from .instrumentation import record_queries
+from .models import Product, ProductImage
+from .search import get_search_backend
+
+
+@receiver(post_save, sender=Product)
+def index_saved_product(sender, instance, **kwargs):
+    """Refresh a product's entry in the search index after it is saved."""
+    get_search_backend().index_product(instance)
+
+
+@receiver(post_delete, sender=Product)
+def unindex_deleted_product(sender, instance, **kwargs):
+    """Remove a deleted product from the search index."""
+    get_search_backend().remove_product(instance.pk)
+
+
+@receiver(post_delete, sender=Product)
+def count_deleted_product(sender, instance, **kwargs):
+    """Move the catalog version on when a product is deleted."""
+    record_product_deletion()
+
+
+@receiver(post_save, sender=Product)
+def reprice_cart_lines(sender, instance, created, **kwargs):
+    """Keep the cart lines holding a saved product at its current price."""
+    if not created:
+        reprice_lines([instance.pk])
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def touch_product_on_image_change(sender, instance, **kwargs):
+    """
+    Mark a product as updated when one of its images changes.
+
+    Cached fragments, validators and the catalog version (see
+    ``store.catalog``) are derived from ``Product.updated_at``, so bumping
+    it invalidates them.
+    """
+    Product.objects.filter(pk=instance.product_id).update(updated_at=timezone.now())
+
+
+@receiver(user_logged_in)
+def promote_cart_on_login(sender, request, user, **kwargs):
+    """Move a cart kept in the cart cookie into the database at login."""
+    if request is not None and request.COOKIES.get(getattr(settings, 'CART_COOKIE_NAME', 'cart')):
+        promote_cart(request)
+
+
+# Throttled by DB_POOL_STATS_INTERVAL, so most requests only compare a clock
+request_finished.connect(log_pool_stats, dispatch_uid='log_pool_stats')
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    """Record the queries of sampled requests on every connection."""
+    if record_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_queries)
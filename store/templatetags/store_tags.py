@@ -0,0 +1,71 @@
+"""
+Template tags for the store application.
+"""
+
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from ecommerce.utils.imagekit_urls import imagekit_srcset, imagekit_url
+from ..fragments import render_product_cards
+
+register = template.Library()
+
+
+def parse_widths(widths):
+    """Turn a width list such as ``"240,480"`` into a tuple of ints."""
+    if isinstance(widths, str):
+        return tuple(int(width) for width in widths.split(',') if width.strip())
+    return tuple(widths)
+
+
+@register.simple_tag
+def product_cards(products):
+    """
+    Render product cards from the fragment cache.
+
+    Usage: {% load store_tags %}{% product_cards products %}
+    """
+    return render_product_cards(products)
+
+
+@register.filter
+def imagekit(url, width):
+    """
+    Resize an ImageKit image to the given width.
+
+    Usage: <img src="{{ product.primary_image_url|imagekit:160 }}">
+    """
+    return imagekit_url(url or '', int(width))
+
+
+@register.simple_tag(name='imagekit_srcset')
+def imagekit_srcset_tag(url, widths):
+    """
+    Build a srcset with one ImageKit rendition per width.
+
+    Usage: <img srcset="{% imagekit_srcset product.primary_image_url '80,160' %}">
+    """
+    return imagekit_srcset(url, parse_widths(widths))
+
+
+@register.simple_tag
+def responsive_image(url, alt, widths, sizes='100vw', lazy=True, **attrs):
+    """
+    Render an <img> that lets the browser pick a suitably sized rendition.
+
+    The largest width is used as the fallback ``src``. Extra keyword
+    arguments become attributes, with ``class_`` standing in for ``class``.
+
+    Usage: {% responsive_image product.primary_image_url product.name '240,480' sizes='240px' class_='card-img-top' %}
+    """
+    url = url or ''
+    widths = parse_widths(widths)
+    srcset = imagekit_srcset(url, widths)
+    attributes = [('src', imagekit_url(url, widths[-1]) if srcset else url), ('alt', alt)]
+    if srcset:
+        attributes += [('srcset', srcset), ('sizes', sizes)]
+    if lazy:
+        attributes.append(('loading', 'lazy'))
+    attributes.append(('decoding', 'async'))
+    attributes += [(name.rstrip('_'), value) for name, value in attrs.items()]
+    return format_html('<img {}>', format_html_join(' ', '{}="{}"', attributes))
@@ -1,3 +1,1246 @@
-from django.test import TestCase
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from importlib import import_module
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.sessions.models import Session
+from django.core import signing
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, transaction
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from ecommerce.utils.database import database_config, log_pool_stats
+from ecommerce.utils.imagekit_uploader import ImageKitUploadClient, upload_image_to_imagekit
+from ecommerce.utils.imagekit_urls import imagekit_original_url, imagekit_srcset, imagekit_url
+
+from . import async_views
+from .benchmarks.data import generate_dataset
+from .cart import CART_SESSION_KEY, CartSummary, CookieCartStorage, _upsert_item, remove_item
+from .catalog import get_catalog_version
+from .benchmarks.runner import find_regressions
+from .fragments import get_card_cache, get_card_cache_stats, render_product_cards
+from .instrumentation import finish_metrics, query_shape, start_metrics
+from .middleware import ReplicaPinMiddleware
+from .management.commands.process_image_uploads import run_job
+from .models import (
+    Cart, CartItem, ImageAsset, ImageUploadJob, Order, OrderLine, Product, ProductImage, ProductRecommendation,
+    UploadStatus,
+)
+from .orders import EmptyCart, OutOfStock, PriceChanged, place_order
+from .pagination import InvalidCursor, decode_cursor, encode_cursor, paginate_by_cursor
+from .routers import ReplicaRouter, finish_routing, start_routing
+from .search import InMemorySearchBackend
+from .uploads import claim_jobs, enqueue_image_upload, process_job
+
+
+def make_cart(*lines):
+    """Create a cart holding (product, quantity) lines."""
+    cart = Cart.objects.create(
+        item_count=sum(quantity for _, quantity in lines),
+        subtotal=sum((product.price * quantity for product, quantity in lines), Decimal('0.00')),
+    )
+    CartItem.objects.bulk_create([
+        CartItem(cart=cart, product=product, quantity=quantity, unit_price=product.price)
+        for product, quantity in lines
+    ])
+    return cart
+
+
+def checkout(cart, expected_total=None):
+    return place_order(
+        cart.id, full_name="Test Customer", email="test@example.com", shipping_address="1 Main Road",
+        expected_total=expected_total,
+    )
+
+
+class LazyCartTests(TestCase):
+    def test_browsing_creates_no_cart_or_session(self):
+        tap = Product.objects.create(name="Chrome tap", price=Decimal('250.00'), stock=5)
+        for storage in ('database', 'cookie'):
+            with self.subTest(storage=storage), override_settings(CART_STORAGE=storage):
+                for page in ['/shop/', f'/product/{tap.pk}/', '/search/?query=tap']:
+                    response = self.client.get(page)
+                    self.assertContains(response, "Chrome tap")
+                    self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies, page)
+                self.assertFalse(Cart.objects.exists())
+                self.assertFalse(Session.objects.exists())
+
+
+class CartSummaryTests(TestCase):
+    def test_summary_is_loaded_in_one_query(self):
+        parts = [Product.objects.create(name=f"Part {i}", price=Decimal('10.50')) for i in range(3)]
+        cart = make_cart(*((part, quantity) for quantity, part in enumerate(parts, start=1)))
+
+        with self.assertNumQueries(1):
+            summary = CartSummary.for_cart(cart.pk)
+            self.assertEqual([line.product.name for line in summary.lines], ["Part 0", "Part 1", "Part 2"])
+            self.assertEqual([line.line_total for line in summary.lines], [
+                Decimal('10.50'), Decimal('21.00'), Decimal('31.50'),
+            ])
+        self.assertEqual((summary.item_count, summary.total_price), (6, Decimal('63.00')))
+
+
+class SearchTests(TestCase):
+    def test_in_memory_index_follows_catalog_changes(self):
+        backend = InMemorySearchBackend()
+        solar = Product.objects.create(name="Solar geyser", price=Decimal('9000.00'))
+        self.assertEqual(list(backend.search("geyser")[:10]), [solar])
+
+        # Imports and other processes do not reach this process's signals
+        Product.objects.bulk_create([
+            Product(name="Electric geyser", description="150 litre", price=Decimal('5000.00')),
+        ])
+        self.assertEqual(len(backend.search("geyser")), 2)
+        self.assertEqual([p.name for p in backend.search("150 geyser")[:10]], ["Electric geyser"])
+
+        Product.objects.filter(pk=solar.pk).update(name="Solar panel", updated_at=timezone.now())
+        self.assertEqual(len(backend.search("geyser")), 1)
+
+    def test_in_memory_index_is_updated_in_place(self):
+        backend = InMemorySearchBackend()
+        tap = Product.objects.create(name="Chrome tap", price=Decimal('250.00'))
+        Product.objects.create(name="Brass tap", price=Decimal('300.00'))
+        self.assertEqual(len(backend.search("tap")), 2)
+
+        with mock.patch.object(backend, '_build', wraps=backend._build) as build:
+            with self.captureOnCommitCallbacks(execute=True):
+                tap.name = "Chrome mixer"
+                tap.save()
+                backend.index_product(tap)
+            self.assertEqual(list(backend.search("mixer")[:10]), [tap])
+            self.assertEqual(len(backend.search("tap")), 1)
+
+            # Saved elsewhere: only the changed rows are read again
+            Product.objects.bulk_create([Product(name="Garden tap", price=Decimal('90.00'))])
+            with self.assertNumQueries(3):
+                self.assertEqual(len(backend.search("tap")), 2)
+            build.assert_not_called()
+
+            # A deletion elsewhere leaves nothing to read, so the index is rebuilt
+            Product.objects.filter(name="Brass tap").delete()
+            self.assertEqual(len(backend.search("tap")), 1)
+            build.assert_called_once()
+
+
+class AutocompleteTests(TestCase):
+    def test_suggestions_include_products_added_elsewhere(self):
+        Product.objects.create(name="Solar Geyser", price=Decimal('9000.00'))
+        response = self.client.get('/search/autocomplete/', {'query': 'gey'})
+        self.assertEqual([result['name'] for result in response.json()['results']], ["Solar Geyser"])
+
+        # Written like import_products does, without signals
+        Product.objects.bulk_create([Product(name="Geyser Blanket", price=Decimal('300.00'))])
+        response = self.client.get('/search/autocomplete/', {'query': 'gey'})
+        self.assertEqual(
+            [result['name'] for result in response.json()['results']],
+            ["Geyser Blanket", "Solar Geyser"],
+        )
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        self.products = [Product.objects.create(name=f"Part {i}", price=Decimal('10.00')) for i in range(5)]
+        # Imports give a whole batch the same timestamp; ids break the tie
+        Product.objects.update(created_at=timezone.now())
+        self.newest_first = list(Product.objects.order_by('-created_at', '-id'))
+
+    def test_cursor_round_trip(self):
+        product = self.newest_first[0]
+        self.assertEqual(decode_cursor(encode_cursor(product)), (product.created_at, product.pk))
+        # Not base64, no separator, and a non-numeric id
+        for cursor in ["!!!", "not-a-cursor", "MjAyNHxub3QtYW4taWQ"]:
+            with self.assertRaises(InvalidCursor):
+                decode_cursor(cursor)
+
+    def test_pages_walk_forwards_and_backwards(self):
+        queryset = Product.objects.all()
+        first = paginate_by_cursor(queryset, 2)
+        second = paginate_by_cursor(queryset, 2, after=first.next_cursor)
+        last = paginate_by_cursor(queryset, 2, after=second.next_cursor)
+        self.assertEqual(
+            [list(first), list(second), list(last)],
+            [self.newest_first[:2], self.newest_first[2:4], self.newest_first[4:]],
+        )
+        self.assertIsNone(first.previous_cursor)
+        self.assertIsNone(last.next_cursor)
+
+        back = paginate_by_cursor(queryset, 2, before=last.previous_cursor)
+        self.assertEqual(list(back), self.newest_first[2:4])
+        self.assertTrue(back.has_next() and back.has_previous())
+        start = paginate_by_cursor(queryset, 2, before=back.previous_cursor)
+        self.assertEqual(list(start), self.newest_first[:2])
+        self.assertFalse(start.has_previous())
+
+    @override_settings(SHOP_PAGINATION='cursor')
+    def test_shop_rejects_invalid_cursor(self):
+        self.assertEqual(self.client.get('/shop/', {'after': 'not-a-cursor'}).status_code, 404)
+        self.assertEqual(self.client.get('/shop/').context['products'][0], self.newest_first[0])
+
+
+class ProductCardCacheTests(TestCase):
+    def setUp(self):
+        get_card_cache().clear()
+        self.product = Product.objects.create(name="Tap", price=Decimal('250.00'), stock=5)
+
+    def render(self):
+        return render_product_cards(Product.objects.all())
+
+    def test_cards_are_cached_until_the_product_changes(self):
+        self.render()
+        self.assertIn("Tap", self.render())
+        self.assertEqual(get_card_cache_stats(), {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+        self.product.name = "Mixer tap"
+        self.product.save()
+        self.assertIn("Mixer tap", self.render())
+        # Image changes touch the product too (see store.signals)
+        ProductImage.objects.create(product=self.product, image_url="https://example.com/tap.jpg", order=1)
+        self.render()
+        self.assertEqual(get_card_cache_stats()['misses'], 3)
+
+
+def derivative_urls(name):
+    """Derivative URLs as returned by ``upload_derivatives``."""
+    return {size: {'jpeg': f"https://ik.example.com/{name}-{size}.jpg"} for size in ('thumb', 'card', 'detail')}
+
+
+class ImageUploadQueueTests(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(name="Tap", price=Decimal('250.00'))
+
+    def enqueue(self, content):
+        return enqueue_image_upload(self.product, io.BytesIO(content), f"{content.decode()}.jpg", '/products/primary/')
+
+    @mock.patch('store.uploads.upload_derivatives')
+    def test_replaced_image_is_not_overwritten_by_older_upload(self, upload_derivatives):
+        self.enqueue(b'old')
+        [old_job] = claim_jobs(1)
+        self.enqueue(b'new')
+
+        upload_derivatives.return_value = derivative_urls('old')
+        self.assertFalse(process_job(old_job))
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.upload_status, self.product.primary_image_url), (UploadStatus.PENDING, None))
+
+        [new_job] = claim_jobs(1)
+        upload_derivatives.return_value = derivative_urls('new')
+        self.assertTrue(process_job(new_job))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.primary_image_url, "https://ik.example.com/new-detail.jpg")
+
+    @mock.patch('store.uploads.upload_derivatives', return_value=derivative_urls('tap'))
+    def test_job_for_deleted_product_is_discarded(self, upload_derivatives):
+        self.enqueue(b'tap')
+        [job] = claim_jobs(1)
+        self.product.delete()
+        self.assertFalse(process_job(job))
+        self.assertFalse(ImageUploadJob.objects.exists())
+
+    @mock.patch('store.management.commands.process_image_uploads.connection')
+    @mock.patch('store.management.commands.process_image_uploads.process_job', side_effect=RuntimeError("boom"))
+    def test_worker_survives_unexpected_errors(self, process_job, connection):
+        self.enqueue(b'tap')
+        with self.assertLogs('store.management.commands.process_image_uploads', 'ERROR'):
+            self.assertFalse(run_job(claim_jobs(1)[0]))
+
+
+class RecordingReader(io.BytesIO):
+    """File object that records the size of every read."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reads = []
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.reads.append(len(chunk))
+        return chunk
+
+
+class FakeUploadHandler(BaseHTTPRequestHandler):
+    """Stand-in for the ImageKit upload API that records each request."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.requests.append({
+            'client_port': self.client_address[1],
+            'headers': dict(self.headers),
+            'body': body,
+        })
+        status, payload = self.server.responses.pop(0) if self.server.responses else (200, None)
+        if payload is None:
+            payload = {'url': f"https://ik.example.com/{len(self.server.requests)}.jpg"}
+        content = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+class ImageKitUploadClientTests(SimpleTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeUploadHandler)
+        self.server.requests, self.server.responses = [], []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        upload_url = f'http://127.0.0.1:{self.server.server_port}/upload'
+        self.client = ImageKitUploadClient('private_key', upload_url=upload_url)
+        self.addCleanup(self.client.session.close)
+
+    def test_file_is_streamed_as_multipart(self):
+        image = RecordingReader(b'\xff\xd8' + b'x' * 1_000_000)
+        response = self.client.upload(image, 'tap.jpg', '/products/primary/')
+
+        self.assertEqual(response, {'url': "https://ik.example.com/1.jpg"})
+        [request] = self.server.requests
+        self.assertTrue(request['headers']['Content-Type'].startswith('multipart/form-data; boundary='))
+        self.assertEqual(int(request['headers']['Content-Length']), len(request['body']))
+        self.assertIn(b'\xff\xd8' + b'x' * 1_000_000, request['body'])
+        self.assertIn(b'/products/primary/', request['body'])
+        self.assertTrue(request['headers']['Authorization'].startswith('Basic '))
+        # Never read in one go
+        self.assertLess(max(image.reads), 1_000_000)
+
+    def test_uploads_reuse_the_pooled_connection(self):
+        for name in ('a.jpg', 'b.jpg', 'c.jpg'):
+            self.client.upload(io.BytesIO(b'image'), name, '/products/')
+        self.assertEqual(len({request['client_port'] for request in self.server.requests}), 1)
+
+    def test_rejected_upload_raises_and_client_recovers(self):
+        self.server.responses.append((400, {'message': "Invalid file"}))
+        with mock.patch('ecommerce.utils.imagekit_uploader._client', self.client):
+            with self.assertRaisesMessage(RuntimeError, "HTTP 400: Invalid file"), self.assertLogs(
+                'ecommerce.utils.imagekit_uploader', 'ERROR'
+            ):
+                upload_image_to_imagekit(io.BytesIO(b'image'), 'bad.jpg')
+            # A retry, as the upload queue makes after a failure, goes through
+            self.assertEqual(upload_image_to_imagekit(io.BytesIO(b'image'), 'ok.jpg'), "https://ik.example.com/2.jpg")
+
+    def test_network_errors_are_reported(self):
+        self.server.shutdown()
+        self.server.server_close()
+        client = ImageKitUploadClient('private_key', upload_url=self.client.upload_url, connect_timeout=1)
+        with mock.patch('ecommerce.utils.imagekit_uploader._client', client):
+            with self.assertRaisesMessage(RuntimeError, "ImageKit upload failed"), self.assertLogs(
+                'ecommerce.utils.imagekit_uploader', 'ERROR'
+            ):
+                upload_image_to_imagekit(io.BytesIO(b'image'), 'tap.jpg')
+
+
+class ImportProductsTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dir = directory.name
+
+    def write(self, name, content):
+        path = os.path.join(self.dir, name)
+        with open(path, 'w') as handle:
+            handle.write(content)
+        return path
+
+    def run_import(self, path, *args):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        call_command('import_products', path, '--images-dir', self.dir, *args, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_replaying_a_file_updates_in_place(self):
+        path = self.write('products.csv', (
+            "sku,name,description,price,image,images\n"
+            "GY-150,Geyser 150L,Electric geyser,4999.00,https://img.example.com/gy.jpg,"
+            "https://img.example.com/a.jpg|https://img.example.com/b.jpg\n"
+            "TAP-1,Tap,Mixer tap,350,,\n"
+        ))
+        self.run_import(path)
+        self.run_import(path)
+
+        self.assertEqual(Product.objects.count(), 2)
+        geyser = Product.objects.get(sku='GY-150')
+        self.assertEqual(geyser.price, Decimal('4999.00'))
+        self.assertEqual(geyser.primary_image_url, "https://img.example.com/gy.jpg")
+        self.assertEqual(
+            list(geyser.images.order_by('order').values_list('image_url', flat=True)),
+            ["https://img.example.com/a.jpg", "https://img.example.com/b.jpg"],
+        )
+
+    def test_new_primary_image_drops_old_derivatives(self):
+        derivatives = {'card': {'jpeg': "https://ik.example.com/old-card.jpg", 'webp': None}}
+        Product.objects.create(
+            sku='GY-150', name="Geyser", price=Decimal('10.00'),
+            primary_image_url="https://img.example.com/old.jpg", image_derivatives=derivatives,
+        )
+        path = self.write('products.csv', "sku,name,price,image\nGY-150,Geyser,10,https://img.example.com/old.jpg\n")
+        self.run_import(path)
+        self.assertEqual(Product.objects.get(sku='GY-150').image_derivatives, derivatives)
+
+        self.write('products.csv', "sku,name,price,image\nGY-150,Geyser,10,https://img.example.com/new.jpg\n")
+        self.run_import(path)
+
+        geyser = Product.objects.get(sku='GY-150')
+        self.assertEqual(geyser.image_derivatives, {})
+        self.assertEqual(geyser.get_image('card')['jpeg'], "https://img.example.com/new.jpg")
+
+    def test_stock_column_is_optional(self):
+        Product.objects.create(sku='TAP-1', name="Tap", price=Decimal('10.00'), stock=7)
+        path = self.write('products.csv', "sku,name,price,stock\nTAP-1,Tap,10,\nTAP-2,Tap,10,\nTAP-3,Tap,10,4\n")
+        self.run_import(path)
+
+        self.assertEqual(
+            dict(Product.objects.values_list('sku', 'stock')), {'TAP-1': 7, 'TAP-2': None, 'TAP-3': 4},
+        )
+        self.write('products.csv', "sku,name,price,stock\nTAP-1,Tap,10,0\nTAP-2,Tap,10,-1\nTAP-3,Tap,10,many\n")
+        _, stderr = self.run_import(path)
+        self.assertEqual(
+            dict(Product.objects.values_list('sku', 'stock')), {'TAP-1': 0, 'TAP-2': None, 'TAP-3': 4},
+        )
+        self.assertIn("Row 2 skipped: invalid stock '-1'", stderr)
+        self.assertIn("Row 3 skipped: invalid stock 'many'", stderr)
+
+    def test_invalid_rows_are_skipped(self):
+        path = self.write('products.jsonl', "\n".join([
+            '{"sku": "TAP-1", "name": "Tap", "price": "350"}',
+            '{"sku": "TAP-2", "name": "Tap",',
+            '{"name": "No sku", "price": "10"}',
+            '{"sku": "TAP-3", "name": "Tap", "price": "cheap"}',
+            '["TAP-4"]',
+            '{"sku": "TAP-5", "name": "Tap", "price": 99.5}',
+            '{"sku": "TAP-6", "name": "Tap", "price": "-1"}',
+            '{"sku": "TAP-7", "name": "Tap", "price": "100000000"}',
+            '{"sku": "TAP-8", "name": "Tap", "price": "NaN"}',
+            '{"sku": "TAP-9", "name": "Tap", "price": "10", "images": {"a": "b"}}',
+            '{"sku": "TAP-10", "name": "%s", "price": "10"}' % ('x' * 300),
+            '{"sku": "TAP-11", "name": "Tap", "price": "99999999.99", '
+            '"images": "https://img.example.com/a.jpg|https://img.example.com/b.jpg"}',
+        ]))
+        stdout, stderr = self.run_import(path)
+
+        self.assertEqual(set(Product.objects.values_list('sku', flat=True)), {'TAP-1', 'TAP-5', 'TAP-11'})
+        self.assertIn("Row 2 skipped: invalid JSON", stderr)
+        self.assertIn("Row 4 skipped: invalid price 'cheap'", stderr)
+        self.assertIn("Row 7 skipped: price '-1' out of range", stderr)
+        self.assertIn("Row 8 skipped: price '100000000' out of range", stderr)
+        self.assertIn("Row 10 skipped: images must be a list", stderr)
+        self.assertIn("Row 11 skipped: name is too long", stderr)
+        self.assertIn("9 skipped", stdout)
+        images = ProductImage.objects.filter(product__sku='TAP-11').order_by('order')
+        self.assertEqual(list(images.values_list('image_url', flat=True)), [
+            "https://img.example.com/a.jpg", "https://img.example.com/b.jpg",
+        ])
+
+    def test_resume_continues_after_the_last_committed_batch(self):
+        path = self.write('products.csv', "sku,name,price,image\n" + "".join(
+            f"SKU-{n},Product {n},10,{'missing.jpg' if n == 3 else ''}\n" for n in range(1, 6)
+        ))
+        with self.assertRaisesMessage(CommandError, "Batch starting at row 3 failed: cannot read image 'missing.jpg'"):
+            self.run_import(path, '--batch-size', '2')
+        self.assertEqual(set(Product.objects.values_list('sku', flat=True)), {'SKU-1', 'SKU-2'})
+
+        self.write('missing.jpg', 'image')
+        Product.objects.filter(sku='SKU-1').update(name="Edited")
+        with mock.patch(
+            'store.management.commands.import_products.upload_original',
+            return_value="https://ik.example.com/missing.jpg",
+        ):
+            stdout, _ = self.run_import(path, '--batch-size', '2', '--resume')
+
+        self.assertIn("Resuming after row 2", stdout)
+        self.assertEqual(Product.objects.count(), 5)
+        self.assertEqual(Product.objects.get(sku='SKU-1').name, "Edited")
+        self.assertEqual(Product.objects.get(sku='SKU-3').primary_image_url, "https://ik.example.com/missing.jpg")
+
+
+@override_settings(CART_STORAGE='database')
+class CartUpdateTests(TestCase):
+    def setUp(self):
+        self.tap = Product.objects.create(name="Tap", price=Decimal('250.00'), stock=10)
+        self.pipe = Product.objects.create(name="Pipe", price=Decimal('40.50'), stock=10)
+        self.client.post(f'/cart/add/{self.tap.pk}/', {'quantity': 2})
+        self.client.post(f'/cart/add/{self.pipe.pk}/', {'quantity': 3})
+        self.cart_id = self.client.session[CART_SESSION_KEY]
+        self.tap_line = CartItem.objects.get(product=self.tap)
+        self.pipe_line = CartItem.objects.get(product=self.pipe)
+
+    def update(self, body):
+        return self.client.post('/cart/update/', body, content_type='application/json')
+
+    def lines(self):
+        return dict(CartItem.objects.filter(cart_id=self.cart_id).values_list('product__name', 'quantity'))
+
+    def cart_totals(self):
+        return Cart.objects.values_list('item_count', 'subtotal').get(pk=self.cart_id)
+
+    def test_adding_again_increments_the_line(self):
+        self.client.post(f'/cart/add/{self.tap.pk}/', {'quantity': 4})
+
+        self.assertEqual(self.lines(), {"Tap": 6, "Pipe": 3})
+        self.assertEqual(self.cart_totals(), (9, Decimal('1621.50')))
+        response = self.client.post('/cart/add/999999/', {'quantity': 1})
+        self.assertEqual(response.status_code, 404)
+
+    def test_batch_update(self):
+        response = self.update({'items': {str(self.tap_line.pk): 5, str(self.pipe_line.pk): 0}})
+
+        self.assertEqual(response.json(), {'success': True, 'total_price': '1250.00', 'item_count': 5})
+        self.assertEqual(self.lines(), {"Tap": 5})
+        self.assertEqual(self.cart_totals(), (5, Decimal('1250.00')))
+
+    def test_batch_update_is_all_or_nothing(self):
+        other = make_cart((self.tap, 1)).items.get()
+
+        response = self.update({'items': {str(self.tap_line.pk): 5, str(other.pk): 2}})
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.lines(), {"Tap": 2, "Pipe": 3})
+        self.assertEqual(self.cart_totals(), (5, Decimal('621.50')))
+        self.assertEqual(CartItem.objects.get(pk=other.pk).quantity, 1)
+
+    def test_bad_input(self):
+        for body in ['not json', {'lines': {}}, {'items': []}, {'items': {'x': 1}}, {'items': {}},
+                     {'items': {str(self.tap_line.pk): 'many'}}]:
+            with self.subTest(body=body):
+                self.assertEqual(self.update(body).status_code, 400)
+        self.assertEqual(self.client.get('/cart/update/').status_code, 400)
+        self.assertEqual(
+            self.client.post(f'/cart/update/{self.tap_line.pk}/', {'quantity': 'many'}).status_code, 400,
+        )
+        self.assertEqual(self.lines(), {"Tap": 2, "Pipe": 3})
+
+    def test_removing_a_line_reads_it_without_a_join(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(remove_item(self.cart_id, self.pipe_line.pk), "Pipe")
+
+        line_query = next(query['sql'] for query in queries if 'store_cartitem' in query['sql'])
+        self.assertNotIn('JOIN', line_query.upper())
+        self.assertEqual(self.lines(), {"Tap": 2})
+        self.assertEqual(self.cart_totals(), (2, Decimal('500.00')))
+        self.assertIsNone(remove_item(self.cart_id, self.pipe_line.pk))
+
+    def test_quantity_zero_removes_the_line(self):
+        response = self.client.post(f'/cart/update/{self.pipe_line.pk}/', {'quantity': 0})
+
+        self.assertEqual(response.json()['item_count'], 2)
+        self.assertEqual(self.lines(), {"Tap": 2})
+        self.assertEqual(self.cart_totals(), (2, Decimal('500.00')))
+        self.assertEqual(self.client.post(f'/cart/update/{self.pipe_line.pk}/', {'quantity': 1}).status_code, 404)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', "needs concurrent writers (PostgreSQL)")
+class ConcurrentCartAddTests(TransactionTestCase):
+    """Many simultaneous adds of one product to one cart."""
+
+    adds = 200
+    workers = 16
+
+    def test_concurrent_adds_are_not_lost(self):
+        product = Product.objects.create(name="Tap", price=Decimal('12.50'), stock=1000)
+        cart = Cart.objects.create()
+
+        def run(quantity):
+            try:
+                with transaction.atomic():
+                    return _upsert_item(cart.pk, product.pk, quantity)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            self.assertTrue(all(pool.map(run, [1, 2] * (self.adds // 2))))
+
+        expected = 3 * self.adds // 2
+        self.assertEqual(CartItem.objects.get(cart=cart).quantity, expected)
+        cart.refresh_from_db()
+        self.assertEqual((cart.item_count, cart.subtotal), (expected, Decimal('12.50') * expected))
+
+
+class FakeDeliveryHandler(BaseHTTPRequestHandler):
+    """Stand-in for ImageKit delivery, which re-encodes unless asked for the original."""
+
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        content = b'original' if '/tr:orig-true/' in self.path else b're-encoded'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+class BackfillImageAssetsTests(TestCase):
+    def test_hashes_the_uploaded_original(self):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), FakeDeliveryHandler)
+        server.paths = []
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        endpoint = f'http://127.0.0.1:{server.server_port}/demo'
+        Product.objects.create(name="Tap", price=Decimal('10.00'), primary_image_url=f'{endpoint}/tap.jpg')
+
+        with override_settings(IMAGEKIT_URL_ENDPOINT=endpoint):
+            call_command('backfill_image_assets', stdout=io.StringIO())
+
+        self.assertEqual(server.paths, ['/demo/tr:orig-true/tap.jpg'])
+        asset = ImageAsset.objects.get()
+        self.assertEqual(asset.url, f'{endpoint}/tap.jpg')
+        self.assertEqual(asset.content_hash, hashlib.sha256(b'original').hexdigest())
+
+
+@override_settings(IMAGEKIT_URL_ENDPOINT='https://ik.imagekit.io/demo/', IMAGEKIT_IMAGE_QUALITY=75)
+class ImageKitURLTests(SimpleTestCase):
+    url = 'https://ik.imagekit.io/demo/products/tap.jpg'
+
+    def test_transformation_urls(self):
+        self.assertEqual(
+            imagekit_url(self.url, 480), 'https://ik.imagekit.io/demo/tr:w-480,q-75,f-auto/products/tap.jpg',
+        )
+        self.assertEqual(imagekit_url(self.url), 'https://ik.imagekit.io/demo/tr:q-75,f-auto/products/tap.jpg')
+        self.assertEqual(
+            imagekit_url('https://ik.imagekit.io/demo/tr:w-100/products/tap.jpg', 240, quality=60),
+            'https://ik.imagekit.io/demo/tr:w-240,q-60,f-auto/products/tap.jpg',
+        )
+        self.assertEqual(
+            imagekit_url(f'{self.url}?v=2', 240),
+            'https://ik.imagekit.io/demo/products/tap.jpg?v=2&tr=w-240,q-75,f-auto',
+        )
+        self.assertEqual(imagekit_original_url(self.url), 'https://ik.imagekit.io/demo/tr:orig-true/products/tap.jpg')
+
+    def test_other_urls_are_unchanged(self):
+        for url in ['https://cdn.example.com/tap.jpg', 'https://ik.imagekit.io/demo-other/tap.jpg', '', None]:
+            with self.subTest(url=url):
+                self.assertEqual(imagekit_url(url, 480), url)
+                self.assertEqual(imagekit_srcset(url, [240, 480]), '')
+
+    def test_responsive_image_tag(self):
+        template = Template(
+            "{% load store_tags %}{% responsive_image url 'Tap & Die' '240,480' sizes='240px' class_='card-img-top' %}"
+        )
+        self.assertHTMLEqual(template.render(Context({'url': self.url})), (
+            '<img src="https://ik.imagekit.io/demo/tr:w-480,q-75,f-auto/products/tap.jpg" alt="Tap &amp; Die" '
+            'srcset="https://ik.imagekit.io/demo/tr:w-240,q-75,f-auto/products/tap.jpg 240w, '
+            'https://ik.imagekit.io/demo/tr:w-480,q-75,f-auto/products/tap.jpg 480w" '
+            'sizes="240px" loading="lazy" decoding="async" class="card-img-top">'
+        ))
+        self.assertHTMLEqual(
+            template.render(Context({'url': 'https://cdn.example.com/tap.jpg'})),
+            '<img src="https://cdn.example.com/tap.jpg" alt="Tap &amp; Die" loading="lazy" decoding="async" '
+            'class="card-img-top">',
+        )
+
+
+@override_settings(CART_STORAGE='cookie')
+class CookieCartTests(TestCase):
+    def setUp(self):
+        self.tap = Product.objects.create(name="Tap", price=Decimal('250.00'), stock=10)
+        self.pipe = Product.objects.create(name="Pipe", price=Decimal('40.50'), stock=10)
+
+    def cookie_value(self):
+        cookie = self.client.cookies['cart']
+        return signing.get_cookie_signer(salt='cart' + CookieCartStorage.salt).unsign(cookie.value)
+
+    def test_cart_is_kept_in_a_signed_cookie(self):
+        self.client.post(f'/cart/add/{self.tap.pk}/', {'quantity': 2})
+        self.client.post(f'/cart/add/{self.pipe.pk}/', {'quantity': 1})
+        self.client.post(f'/cart/add/{self.tap.pk}/', {'quantity': 1})
+
+        self.assertEqual(self.cookie_value(), f"{self.tap.pk}:3,{self.pipe.pk}:1")
+        self.assertFalse(Cart.objects.exists())
+        response = self.client.get('/cart/')
+        self.assertEqual(response.context['summary'].item_count, 4)
+        self.assertEqual(response.context['summary'].total_price, Decimal('790.50'))
+
+    def test_tampered_cookie_is_ignored(self):
+        self.client.post(f'/cart/add/{self.tap.pk}/', {'quantity': 1})
+        value = self.client.cookies['cart'].value
+        self.client.cookies['cart'] = value.replace(f"{self.tap.pk}:1", f"{self.tap.pk}:9", 1)
+
+        response = self.client.get('/cart/')
+        self.assertEqual(response.context['summary'].item_count, 0)
+
+    @override_settings(CART_COOKIE_MAX_LINES=2)
+    def test_large_cart_moves_to_the_database(self):
+        valve = Product.objects.create(name="Valve", price=Decimal('99.00'), stock=10)
+        for product in (self.tap, self.pipe, valve):
+            self.client.post(f'/cart/add/{product.pk}/', {'quantity': 1})
+
+        cart = Cart.objects.get(pk=self.client.session[CART_SESSION_KEY])
+        self.assertEqual((cart.item_count, cart.subtotal), (3, Decimal('389.50')))
+        self.assertEqual(self.client.cookies['cart'].value, '')
+        self.client.post(f'/cart/add/{valve.pk}/', {'quantity': 1})
+        self.assertEqual(CartItem.objects.get(cart=cart, product=valve).quantity, 2)
+
+    def test_checkout_promotes_the_cart(self):
+        self.client.post(f'/cart/add/{self.tap.pk}/', {'quantity': 2})
+
+        response = self.client.post('/checkout/', {
+            'full_name': "Test Customer", 'email': "test@example.com", 'shipping_address': "1 Main Road",
+        })
+
+        order = Order.objects.get()
+        self.assertRedirects(response, f'/orders/{order.pk}/')
+        self.assertEqual(list(order.lines.values_list('product_name', 'quantity')), [("Tap", 2)])
+        self.assertEqual(self.client.cookies['cart'].value, '')
+        self.assertEqual(self.client.get('/cart/').context['summary'].item_count, 0)
+
+    def test_login_promotes_the_cart(self):
+        User.objects.create_user('staff', password='secret', is_staff=True)
+        self.client.post(f'/cart/add/{self.pipe.pk}/', {'quantity': 3})
+
+        self.client.post('/admin/login/', {'username': 'staff', 'password': 'secret'})
+
+        cart = Cart.objects.get(pk=self.client.session[CART_SESSION_KEY])
+        self.assertEqual(list(cart.items.values_list('product__name', 'quantity')), [("Pipe", 3)])
+        self.assertEqual(self.client.cookies['cart'].value, '')
+
+
+class PruneCartsTests(TestCase):
+    def setUp(self):
+        self.tap = Product.objects.create(name="Tap", price=Decimal('250.00'), stock=10)
+
+    def make_aged_cart(self, days, *lines):
+        cart = make_cart(*lines)
+        Cart.objects.filter(pk=cart.pk).update(updated_at=timezone.now() - timedelta(days=days))
+        return cart
+
+    def prune(self, *args):
+        stdout = io.StringIO()
+        call_command('prune_carts', '--batch-size', '2', *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_prunes_only_abandoned_carts(self):
+        abandoned = [self.make_aged_cart(45, (self.tap, 1)) for _ in range(3)] + [self.make_aged_cart(31)]
+        recent = [self.make_aged_cart(29, (self.tap, 2)), make_cart((self.tap, 1))]
+
+        output = self.prune('--days', '30', '--skip-sessions')
+
+        self.assertIn("Deleted 4 carts and 3 cart items", output)
+        self.assertEqual(set(Cart.objects.values_list('pk', flat=True)), {cart.pk for cart in recent})
+        self.assertFalse(CartItem.objects.filter(cart__in=[cart.pk for cart in abandoned]).exists())
+        self.assertEqual(CartItem.objects.count(), 2)
+
+    def test_orders_placed_from_pruned_carts_are_kept(self):
+        cart = make_cart((self.tap, 2))
+        order = checkout(cart)
+        make_cart((self.tap, 1))
+        Cart.objects.update(updated_at=timezone.now() - timedelta(days=60))
+
+        self.prune()
+
+        self.assertFalse(Cart.objects.exists())
+        order.refresh_from_db()
+        self.assertEqual(order.total_price, Decimal('500.00'))
+        self.assertEqual(list(order.lines.values_list('product_name', 'quantity')), [("Tap", 2)])
+
+    def test_prunes_expired_sessions(self):
+        now = timezone.now()
+        for key, expires in [('a' * 32, now - timedelta(days=1)), ('b' * 32, now - timedelta(seconds=1)),
+                             ('c' * 32, now + timedelta(days=1))]:
+            Session.objects.create(session_key=key, session_data='', expire_date=expires)
+
+        output = self.prune()
+
+        self.assertIn("Deleted 2 expired sessions", output)
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['c' * 32])
+        self.assertNotIn("sessions", self.prune('--skip-sessions'))
+
+
+class PlaceOrderTests(TestCase):
+    def setUp(self):
+        self.geyser = Product.objects.create(name="Geyser", price=Decimal('4999.00'), stock=3)
+        self.valve = Product.objects.create(name="Valve", price=Decimal('120.50'), stock=10)
+
+    def test_reserves_stock_and_snapshots_prices(self):
+        cart = make_cart((self.geyser, 2), (self.valve, 4))
+
+        order = checkout(cart)
+
+        self.geyser.refresh_from_db()
+        self.valve.refresh_from_db()
+        self.assertEqual((self.geyser.stock, self.valve.stock), (1, 6))
+        self.assertEqual(order.total_price, Decimal('10480.00'))
+        self.assertFalse(CartItem.objects.filter(cart=cart).exists())
+
+        # Later price changes do not touch the order
+        Product.objects.filter(pk=self.geyser.pk).update(price=Decimal('1.00'), name="Renamed")
+        line = order.lines.get(product=self.geyser)
+        self.assertEqual((line.product_name, line.unit_price, line.quantity), ("Geyser", Decimal('4999.00'), 2))
+
+    def test_out_of_stock_changes_nothing(self):
+        cart = make_cart((self.geyser, 4), (self.valve, 1))
+
+        with self.assertRaises(OutOfStock) as raised:
+            checkout(cart)
+
+        self.assertEqual(raised.exception.product_id, self.geyser.pk)
+        self.valve.refresh_from_db()
+        self.assertEqual(self.valve.stock, 10)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(CartItem.objects.filter(cart=cart).count(), 2)
+
+    def test_empty_cart(self):
+        with self.assertRaises(EmptyCart):
+            checkout(Cart.objects.create())
+
+    def test_lines_are_charged_at_the_cart_price(self):
+        cart = make_cart((self.geyser, 1))
+        # Bypasses the signal that reprices cart lines
+        Product.objects.filter(pk=self.geyser.pk).update(price=Decimal('5999.00'))
+
+        with self.assertRaises(PriceChanged) as raised:
+            checkout(cart, Decimal('4000.00'))
+        self.assertEqual(raised.exception.total, Decimal('4999.00'))
+        self.assertFalse(Order.objects.exists())
+        self.geyser.refresh_from_db()
+        self.assertEqual(self.geyser.stock, 3)
+
+        order = checkout(cart, Decimal('4999.00'))
+        self.assertEqual(order.total_price, Decimal('4999.00'))
+        self.assertEqual(order.lines.get().unit_price, Decimal('4999.00'))
+
+    @override_settings(CART_STORAGE='database')
+    def test_checkout_page_refuses_a_changed_total(self):
+        self.client.post(f'/cart/add/{self.valve.pk}/', {'quantity': 2})
+        response = self.client.get('/checkout/')
+        self.assertContains(response, 'name="expected_total" value="241.00"')
+
+        self.valve.price = Decimal('150.00')
+        self.valve.save()
+        details = {'full_name': "Test Customer", 'email': "test@example.com", 'shipping_address': "1 Main Road"}
+        response = self.client.post('/checkout/', {**details, 'expected_total': '241.00'})
+
+        self.assertRedirects(response, '/cart/')
+        self.assertFalse(Order.objects.exists())
+        response = self.client.post('/checkout/', {**details, 'expected_total': '300.00'})
+        self.assertEqual(Order.objects.get().total_price, Decimal('300.00'))
+
+    def test_untracked_stock_never_runs_out(self):
+        hose = Product.objects.create(name="Hose", price=Decimal('80.00'))
+        self.assertIsNone(hose.stock)
+
+        checkout(make_cart((hose, 500)))
+
+        hose.refresh_from_db()
+        self.assertIsNone(hose.stock)
+        response = self.client.get(f'/product/{hose.pk}/')
+        self.assertContains(response, "In stock")
+        self.assertNotContains(response, " disabled>")
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', "needs row-level locking (PostgreSQL)")
+class ConcurrentCheckoutTests(TransactionTestCase):
+    """Hundreds of simultaneous checkouts of one hot product."""
+
+    checkouts = 300
+    stock = 100
+    workers = 32
+
+    def test_hot_product_is_never_oversold(self):
+        product = Product.objects.create(name="Hot deal", price=Decimal('99.99'), stock=self.stock)
+        carts = [make_cart((product, 1)) for _ in range(self.checkouts)]
+
+        def run(cart):
+            began = time.monotonic()
+            try:
+                checkout(cart)
+                placed = True
+            except OutOfStock:
+                placed = False
+            finally:
+                connection.close()
+            return placed, time.monotonic() - began
+
+        began = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            results = list(pool.map(run, carts))
+        elapsed = time.monotonic() - began
+
+        product.refresh_from_db()
+        placed = sum(1 for ok, _ in results if ok)
+        self.assertEqual(placed, self.stock)
+        self.assertEqual(product.stock, 0)
+        self.assertEqual(Order.objects.count(), self.stock)
+        self.assertEqual(sum(OrderLine.objects.values_list('quantity', flat=True)), self.stock)
+
+        # Each checkout holds the product's row lock only for its own short
+        # transaction, so latency stays flat instead of piling up.
+        latencies = sorted(duration for _, duration in results)
+        p50 = latencies[len(latencies) // 2]
+        p99 = latencies[int(len(latencies) * 0.99) - 1]
+        self.assertLess(p99, max(20 * p50, 1.0))
+        self.assertGreater(self.checkouts / elapsed, 20)
+
+
+class CatalogAPITests(TestCase):
+    def setUp(self):
+        self.tap = Product.objects.create(name="Tap", description="Chrome", price=Decimal('250.00'), stock=5)
+        ProductImage.objects.create(product=self.tap, image_url="https://example.com/tap-2.jpg", order=2)
+        ProductImage.objects.create(product=self.tap, image_url="https://example.com/tap-1.jpg", order=1)
+
+    def test_products_return_requested_fields(self):
+        response = self.client.get('/api/v1/products/?fields=id,name,price')
+        self.assertEqual(response.json()['results'], [{'id': self.tap.pk, 'name': "Tap", 'price': '250.00'}])
+
+        product = self.client.get(f'/api/v1/products/{self.tap.pk}/').json()
+        self.assertEqual([image['order'] for image in product['images']], [1, 2])
+        self.assertTrue(product['url'].endswith(f'/api/v1/products/{self.tap.pk}/'))
+
+    def test_catalog_etag_follows_catalog_changes(self):
+        response = self.client.get('/api/v1/products/')
+        self.assertIn('public', response['Cache-Control'])
+        etag = response['ETag']
+        self.assertEqual(self.client.get('/api/v1/products/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # A bulk import in another process sends no signals
+        Product.objects.bulk_create([Product(name="Pipe", price=Decimal('40.00'))])
+        response = self.client.get('/api/v1/products/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        # Deleting an older product leaves the newest updated_at as it was
+        self.tap.delete()
+        self.assertEqual(self.client.get('/api/v1/products/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_catalog_version_does_not_count_products(self):
+        with CaptureQueriesContext(connection) as queries:
+            get_catalog_version()
+        self.assertEqual(len(queries), 2)
+        self.assertFalse(any('COUNT(' in query['sql'].upper() for query in queries))
+
+    def test_product_images_are_listed_per_product(self):
+        self.assertEqual(self.client.get('/api/v1/product-images/').status_code, 400)
+
+        response = self.client.get(f'/api/v1/product-images/?product={self.tap.pk}')
+        self.assertEqual([image['image_url'] for image in response.json()], [
+            "https://example.com/tap-1.jpg",
+            "https://example.com/tap-2.jpg",
+        ])
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(name="Tap", price=Decimal('250.00'), stock=5)
+
+    def test_shop_revalidates_after_changes_from_other_processes(self):
+        etag = self.client.get('/shop/')['ETag']
+        self.assertEqual(self.client.get('/shop/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Imports and the upload worker write without signals, in other processes
+        Product.objects.bulk_create([Product(name="Pipe", price=Decimal('40.00'))])
+        response = self.client.get('/shop/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response['ETag']
+        Product.objects.filter(pk=self.product.pk).update(name="Mixer tap", updated_at=timezone.now())
+        self.assertEqual(self.client.get('/shop/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        product = Product.objects.create(name="Tap", price=Decimal('250.00'), stock=5)
+        self.product = product
+        cart = make_cart((product, 2))
+        # Sessions from before the badge count was stored only hold the cart id
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[CART_SESSION_KEY] = cart.pk
+        session.create()
+        self.session_key = session.session_key
+
+    def request(self, path):
+        request = AsyncRequestFactory().get(path)
+        request.COOKIES[settings.SESSION_COOKIE_NAME] = self.session_key
+        request.session = import_module(settings.SESSION_ENGINE).SessionStore(self.session_key)
+        request.user = AnonymousUser()
+        return request
+
+    async def test_pages_for_session_without_stored_count(self):
+        response = await async_views.shop(self.request('/shop/'))
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response.content.decode(), r'badge[^>]*>\s*2\s*<')
+
+        response = await async_views.product_detail(self.request(f'/product/{self.product.pk}/'), self.product.pk)
+        self.assertEqual(response.status_code, 200)
+
+
+class PoolMetricsTests(TestCase):
+    def setUp(self):
+        pool = mock.Mock(get_stats=mock.Mock(return_value={'requests_num': 12, 'pool_size': 3, 'pool_max': 4}))
+        patcher = mock.patch.object(connections['default'], 'pool', pool, create=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_database_config(self):
+        config = database_config('postgres://shop:p%40ss@db:6432/shop?pool_max_size=8&pool_timeout=5&sslmode=require')
+        self.assertEqual((config['USER'], config['PASSWORD'], config['PORT']), ('shop', 'p@ss', 6432))
+        self.assertEqual(config['OPTIONS']['sslmode'], 'require')
+        self.assertEqual(config['OPTIONS']['pool'], {
+            'min_size': 1, 'max_size': 8, 'timeout': 5.0, 'max_lifetime': 1800.0, 'max_idle': 300.0,
+        })
+        self.assertEqual(config['CONN_MAX_AGE'], 0)
+
+        config = database_config('postgres://shop@db/shop?pool=false&conn_max_age=60')
+        self.assertNotIn('pool', config['OPTIONS'])
+        self.assertEqual(config['CONN_MAX_AGE'], 60)
+        with self.assertRaises(ValueError):
+            database_config('postgres://shop@db/shop?pool_max_size=many')
+
+    @override_settings(METRICS_TOKEN='s3cret', DB_POOL_STATS_INTERVAL=0)
+    def test_metrics_need_staff_or_token(self):
+        self.assertEqual(self.client.get('/metrics/db-pool/').status_code, 404)
+        self.assertEqual(self.client.get('/metrics/db-pool/', HTTP_AUTHORIZATION='Bearer wrong').status_code, 404)
+
+        response = self.client.get('/metrics/db-pool/', HTTP_AUTHORIZATION='Bearer s3cret')
+        stats = response.json()['pools']['default']
+        self.assertEqual((stats['checkouts'], stats['size'], stats['max_size'], stats['waits']), (12, 3, 4, 0))
+
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        self.assertEqual(self.client.get('/metrics/db-pool/').status_code, 200)
+
+    @override_settings(DB_POOL_STATS_INTERVAL=60)
+    def test_pool_stats_are_logged_once_per_interval(self):
+        with mock.patch('ecommerce.utils.database._last_logged', 0.0):
+            with self.assertLogs('ecommerce.utils.database', 'INFO') as logs:
+                log_pool_stats()
+            self.assertIn("DB pool default", logs.output[0])
+            self.assertIn("checkouts=12", logs.output[0])
+            with self.assertNoLogs('ecommerce.utils.database', 'INFO'):
+                log_pool_stats()
+
+    @override_settings(DB_POOL_STATS_INTERVAL=0)
+    def test_pool_stats_logging_can_be_turned_off(self):
+        with mock.patch('ecommerce.utils.database._last_logged', 0.0):
+            with self.assertNoLogs('ecommerce.utils.database', 'INFO'):
+                log_pool_stats()
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], REPLICA_PIN_SECONDS=15)
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.token = start_routing()
+        self.addCleanup(finish_routing, self.token)
+
+    def test_catalog_and_cart_reads_use_replica(self):
+        self.assertEqual(self.router.db_for_read(Product), 'replica1')
+        self.assertEqual(self.router.db_for_read(CartItem), 'replica1')
+        self.assertIsNone(self.router.db_for_read(Order))
+
+    def test_reads_after_a_write_use_primary(self):
+        self.assertEqual(self.router.db_for_write(CartItem), 'default')
+        self.assertEqual(self.router.db_for_read(CartItem), 'default')
+        self.assertEqual(self.router.db_for_read(Product), 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        self.assertIsNone(self.router.db_for_read(Product))
+        self.assertIsNone(self.router.allow_migrate('default', 'store'))
+
+    def test_replicas_are_not_migrated(self):
+        self.assertIs(self.router.allow_migrate('replica1', 'store'), False)
+
+    def test_writing_request_pins_visitor_to_primary(self):
+        factory = RequestFactory()
+        seen = []
+
+        def view(request):
+            seen.append(self.router.db_for_read(Cart))
+            if request.method == 'POST':
+                self.router.db_for_write(Cart)
+            return HttpResponse()
+
+        middleware = ReplicaPinMiddleware(view)
+        response = middleware(factory.post('/cart/add/1/'))
+        self.assertEqual(response.cookies['db_pin']['max-age'], 15)
+
+        middleware(factory.get('/cart/', HTTP_COOKIE='db_pin=1'))
+        response = middleware(factory.get('/cart/'))
+        self.assertEqual(seen, ['replica1', 'default', 'replica1'])
+        self.assertNotIn('db_pin', response.cookies)
+
+
+class RequestMetricsTests(TestCase):
+    def test_query_shape_ignores_values(self):
+        self.assertEqual(
+            query_shape("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'x' LIMIT 21"),
+            query_shape("SELECT * FROM t WHERE id IN (%s) AND name = 'y' LIMIT 12"),
+        )
+
+    @override_settings(N_PLUS_ONE_THRESHOLD=5)
+    def test_repeated_queries_are_flagged(self):
+        for i in range(6):
+            product = Product.objects.create(name=f"Tap {i}", price=Decimal('10.00'))
+            ProductImage.objects.create(product=product, image_url=f"https://example.com/{i}.jpg", order=1)
+
+        metrics, token = start_metrics()
+        for product in Product.objects.all():
+            list(product.images.all())
+        finish_metrics(metrics, token)
+
+        self.assertEqual(metrics.sql_count, 7)
+        [(shape, count)] = metrics.repeated_queries()
+        self.assertEqual(count, 6)
+        self.assertIn('store_productimage', shape)
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=1.0)
+    def test_sampled_request_gets_server_timing(self):
+        with self.assertLogs('store.instrumentation', 'INFO'):
+            response = self.client.get('/shop/')
+        self.assertRegex(response['Server-Timing'], r'sql;dur=[\d.]+;desc="\d+ queries", tpl;dur=')
+
+
+class BenchmarkTests(TestCase):
+    def snapshot(self):
+        products = list(Product.objects.order_by('sku').values_list('sku', 'name', 'price', 'stock'))
+        images = list(ProductImage.objects.order_by('product__sku', 'order').values_list('product__sku', 'order'))
+        items = list(CartItem.objects.order_by('cart_id', 'product__sku').values_list('product__sku', 'quantity'))
+        return products, images, items
+
+    def test_dataset_is_deterministic(self):
+        counts = generate_dataset(products=20, images_per_product=2, carts=4, items_per_cart=3, seed=7, batch_size=8)
+        self.assertEqual(counts, {'products': 20, 'images': 40, 'carts': 4, 'cart_items': 12})
+        first = self.snapshot()
+
+        Cart.objects.all().delete()
+        Product.objects.all().delete()
+        generate_dataset(products=20, images_per_product=2, carts=4, items_per_cart=3, seed=7, batch_size=8)
+
+        self.assertEqual(self.snapshot(), first)
+
+    def test_regressions_against_baseline(self):
+        baseline = {'p95_ms': 100.0, 'rps': 50.0, 'queries': 4.0}
+        self.assertEqual(find_regressions({'p95_ms': 120.0, 'rps': 40.0, 'queries': 4.4}, baseline), [])
+        self.assertEqual(
+            find_regressions({'p95_ms': 130.0, 'rps': 30.0, 'queries': 5.0}, baseline),
+            ["p95_ms 130.0 (baseline 100.0)", "rps 30.0 (baseline 50.0)", "queries 5.0 (baseline 4.0)"],
+        )
+
+
+class CartTotalsTests(TestCase):
+    def setUp(self):
+        self.tap = Product.objects.create(name="Tap", price=Decimal('250.00'), stock=10)
+        self.pipe = Product.objects.create(name="Pipe", price=Decimal('40.50'), stock=10)
+
+    def cart_totals(self):
+        return Cart.objects.values_list('item_count', 'subtotal').get(pk=self.client.session[CART_SESSION_KEY])
+
+    @override_settings(CART_STORAGE='database')
+    def test_mutations_update_totals(self):
+        self.client.post(f'/cart/add/{self.tap.pk}/', {'quantity': 2})
+        self.client.post(f'/cart/add/{self.pipe.pk}/', {'quantity': 1})
+        self.client.post(f'/cart/add/{self.tap.pk}/', {'quantity': 1})
+        self.assertEqual(self.cart_totals(), (4, Decimal('790.50')))
+
+        line = CartItem.objects.get(product=self.tap)
+        response = self.client.post(f'/cart/update/{line.pk}/', {'quantity': 1})
+        self.assertEqual(response.json()['total_price'], '290.50')
+        self.assertEqual(self.cart_totals(), (2, Decimal('290.50')))
+
+        self.client.post(f'/cart/remove/{line.pk}/')
+        self.assertEqual(self.cart_totals(), (1, Decimal('40.50')))
+
+        self.client.post('/cart/clear/')
+        self.assertEqual(self.cart_totals(), (0, Decimal('0.00')))
+
+    @override_settings(CART_STORAGE='database')
+    def test_cart_page_shows_line_prices(self):
+        self.client.post(f'/cart/add/{self.tap.pk}/', {'quantity': 2})
+        # Bypasses the signal that reprices cart lines
+        Product.objects.filter(pk=self.tap.pk).update(price=Decimal('300.00'))
+
+        response = self.client.get('/cart/')
+        self.assertContains(response, "R250.00")
+        self.assertContains(response, "R500.00")
+        self.assertNotContains(response, "R300.00")
+
+    def test_price_change_reprices_cart_lines(self):
+        cart = make_cart((self.tap, 2), (self.pipe, 1))
+
+        self.tap.price = Decimal('200.00')
+        self.tap.save()
+
+        cart.refresh_from_db()
+        self.assertEqual(cart.subtotal, Decimal('440.50'))
+        self.assertEqual(CartItem.objects.get(product=self.tap).unit_price, Decimal('200.00'))
+
+    def test_verify_command_repairs_drift(self):
+        cart = make_cart((self.tap, 2), (self.pipe, 1))
+        Cart.objects.filter(pk=cart.pk).update(item_count=7, subtotal=Decimal('1.00'))
+        Product.objects.filter(pk=self.pipe.pk).update(price=Decimal('50.00'))
+
+        with self.assertRaises(CommandError):
+            call_command('verify_cart_totals', stdout=io.StringIO())
+        call_command('verify_cart_totals', '--repair', stdout=io.StringIO())
+
+        cart.refresh_from_db()
+        self.assertEqual((cart.item_count, cart.subtotal), (3, Decimal('550.00')))
+        call_command('verify_cart_totals', stdout=io.StringIO())
+
+
+class RecommendationTests(TestCase):
+    def setUp(self):
+        self.tap, self.pipe, self.valve, self.hose = (
+            Product.objects.create(name=name, price=Decimal('10.00'), stock=5)
+            for name in ("Tap", "Pipe", "Valve", "Hose")
+        )
+        for _ in range(2):
+            make_cart((self.tap, 1), (self.pipe, 1))
+        for _ in range(3):
+            make_cart((self.tap, 1), (self.valve, 2))
+        make_cart((self.pipe, 1), (self.hose, 1))
+
+    def recommended(self, product):
+        return list(
+            ProductRecommendation.objects.filter(product=product)
+            .values_list('recommended__name', 'score', 'rank')
+        )
+
+    def test_build_ranks_products_sharing_carts(self):
+        call_command('build_recommendations', '--full', '--batch-size', '2', stdout=io.StringIO())
+
+        self.assertEqual(self.recommended(self.tap), [("Valve", 3, 1), ("Pipe", 2, 2)])
+        self.assertEqual(self.recommended(self.pipe), [("Tap", 2, 1)])
+        # Sharing a single cart is not enough
+        self.assertEqual(self.recommended(self.hose), [])
+
+    def test_incremental_build_only_recomputes_changed_carts(self):
+        call_command('build_recommendations', stdout=io.StringIO())
+        first_build = ProductRecommendation.objects.get(product=self.tap, rank=1).computed_at
+
+        make_cart((self.pipe, 1), (self.hose, 1))
+        call_command('build_recommendations', stdout=io.StringIO())
+
+        self.assertEqual(self.recommended(self.pipe), [("Tap", 2, 1), ("Hose", 2, 2)])
+        self.assertEqual(self.recommended(self.hose), [("Pipe", 2, 1)])
+        self.assertEqual(
+            set(ProductRecommendation.objects.filter(product=self.tap).values_list('computed_at', flat=True)),
+            {first_build},
+        )
+
+    def test_product_page_shows_recommendations(self):
+        call_command('build_recommendations', stdout=io.StringIO())
+        Product.objects.filter(pk=self.valve.pk).update(stock=0)
+        Product.objects.filter(pk=self.pipe.pk).update(stock=None)
+
+        response = self.client.get(f'/product/{self.tap.pk}/')
+        self.assertEqual(list(response.context['recommendations']), [self.pipe])
+        self.assertContains(response, "Frequently bought together")
@@ -0,0 +1,351 @@
+"""
+Background image upload queue for the store application.
+
+Admin forms call ``enqueue_image_upload`` instead of uploading to ImageKit
+inside the request. Jobs are rows in ``ImageUploadJob``; the
+``process_image_uploads`` management command claims them, renders the
+image derivatives in a process pool, uploads them on a thread pool and
+retries failures with exponential backoff.
+
+Images are identified by a hash of their content. Bytes that were uploaded
+before, for another product or by an earlier save, reuse the stored
+``ImageAsset`` URLs instead of being processed and uploaded again.
+"""
+
+import hashlib
+import io
+import logging
+import os
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from ecommerce.utils.image_pipeline import render_derivatives
+from ecommerce.utils.imagekit_uploader import upload_image_to_imagekit
+from .models import ImageAsset, ImageUploadJob, Product, ProductImage, UploadStatus
+
+logger = logging.getLogger(__name__)
+
+
+def uploads_are_async():
+    """Check whether admin image uploads should go through the queue."""
+    return getattr(settings, 'IMAGE_UPLOAD_ASYNC', True)
+
+
+def content_hash(file):
+    """
+    Compute the digest that identifies an image's content.
+
+    Args:
+        file: The image as bytes, or a seekable file-like object, which is
+            read from the start in chunks
+
+    Returns:
+        str: SHA-256 hex digest of the content
+    """
+    digest = hashlib.sha256()
+    if isinstance(file, (bytes, bytearray, memoryview)):
+        digest.update(file)
+    else:
+        file.seek(0)
+        for chunk in iter(lambda: file.read(64 * 1024), b''):
+            digest.update(chunk)
+        file.seek(0)
+    return digest.hexdigest()
+
+
+def find_derivatives(digest):
+    """
+    Get the derivative URLs of previously uploaded content, if any.
+
+    Args:
+        digest (str): Digest returned by ``content_hash``
+
+    Returns:
+        dict: The derivative URLs, or None if they have not been uploaded
+    """
+    asset = ImageAsset.objects.filter(content_hash=digest).only('derivatives').first()
+    return asset.derivatives if asset and asset.derivatives else None
+
+
+def upload_original(file, file_name, folder):
+    """
+    Upload an image to ImageKit as is, unless the same content already was.
+
+    Args:
+        file: A readable, seekable file-like object
+        file_name (str): The name to give the uploaded file
+        folder (str): The ImageKit folder to upload into
+
+    Returns:
+        str: The URL of the uploaded image
+
+    Raises:
+        RuntimeError: If the upload fails
+    """
+    digest = content_hash(file)
+    url = ImageAsset.objects.filter(content_hash=digest).values_list('url', flat=True).first()
+    if url:
+        return url
+    url = upload_image_to_imagekit(file, file_name, folder=folder)
+    asset, _ = ImageAsset.objects.get_or_create(content_hash=digest, defaults={'url': url})
+    return asset.url
+
+
+def upload_derivatives(data, file_name, folder):
+    """
+    Render an image's derivatives and upload each of them to ImageKit.
+
+    Content that was uploaded before is neither rendered nor uploaded
+    again; its stored URLs are returned instead.
+
+    Args:
+        data (bytes): The original image file content
+        file_name (str): Base name for the uploaded files
+        folder (str): The ImageKit folder to upload into
+
+    Returns:
+        dict: For each derivative size, the URL of each format
+
+    Raises:
+        ValueError: If the data is not a readable image
+        RuntimeError: If an upload fails
+    """
+    digest = content_hash(data)
+    urls = find_derivatives(digest)
+    if urls:
+        return urls
+
+    derivatives = render_derivatives(data, max_workers=getattr(settings, 'IMAGE_PROCESS_WORKERS', 2))
+    stem = os.path.splitext(file_name)[0]
+    urls = {}
+    for size, encoded in derivatives.items():
+        urls[size] = {}
+        for image_format, content in encoded.items():
+            extension = 'jpg' if image_format == 'jpeg' else image_format
+            urls[size][image_format] = upload_image_to_imagekit(
+                io.BytesIO(content), f"{stem}-{size}.{extension}", folder=folder
+            )
+    ImageAsset.objects.update_or_create(
+        content_hash=digest,
+        defaults={'derivatives': urls},
+        create_defaults={'url': urls['detail']['jpeg'], 'derivatives': urls},
+    )
+    return urls
+
+
+def apply_derivatives(instance, urls):
+    """
+    Store uploaded derivative URLs on a Product or ProductImage.
+
+    The detail-size JPEG becomes the image's main URL. The instance is not
+    saved.
+
+    Args:
+        instance: The Product or ProductImage
+        urls (dict): URLs returned by ``upload_derivatives``
+
+    Returns:
+        list: The names of the fields that were changed
+    """
+    setattr(instance, instance.original_image_field, urls['detail']['jpeg'])
+    instance.image_derivatives = urls
+    instance.upload_status = UploadStatus.READY
+    return [instance.original_image_field, 'image_derivatives', 'upload_status']
+
+
+def save_derivatives(instance, urls):
+    """Store uploaded derivative URLs on a saved Product or ProductImage."""
+    update_fields = apply_derivatives(instance, urls)
+    if isinstance(instance, Product):
+        update_fields.append('updated_at')
+    instance.save(update_fields=update_fields)
+
+
+def enqueue_image_upload(instance, image_file, file_name, folder):
+    """
+    Queue an image for upload to ImageKit and mark its target as pending.
+
+    Any jobs still waiting for, or being processed for, the same target are
+    dropped, so the most recently saved image always wins: a worker that
+    finishes a dropped job discards its result (see ``process_job``). If the
+    same content was uploaded before, its URLs are applied at once and
+    nothing is queued.
+
+    Args:
+        instance: The saved Product or ProductImage the image belongs to
+        image_file: A file-like object with the processed image content
+        file_name (str): The name to give the uploaded file
+        folder (str): The ImageKit folder to upload into
+
+    Returns:
+        ImageUploadJob: The queued job, or None if the image was already uploaded
+    """
+    image_file.seek(0)
+    data = image_file.read()
+    if not data:
+        raise ValueError("Empty file content")
+
+    if isinstance(instance, ProductImage):
+        target = {'product_image': instance}
+    else:
+        target = {'product': instance}
+
+    urls = find_derivatives(content_hash(data))
+    with transaction.atomic():
+        ImageUploadJob.objects.filter(
+            status__in=[ImageUploadJob.Status.PENDING, ImageUploadJob.Status.PROCESSING],
+            **target
+        ).delete()
+        if urls:
+            save_derivatives(instance, urls)
+            return None
+        job = ImageUploadJob.objects.create(
+            file_name=file_name,
+            folder=folder,
+            data=data,
+            **target
+        )
+        type(instance).objects.filter(pk=instance.pk).update(upload_status=UploadStatus.PENDING)
+    instance.upload_status = UploadStatus.PENDING
+    return job
+
+
+def claim_jobs(limit):
+    """
+    Atomically claim a batch of jobs that are due.
+
+    Jobs left in ``processing`` longer than ``IMAGE_UPLOAD_STALE_AFTER``
+    seconds (for example by a crashed worker) are claimed again. On
+    databases that support it, ``SKIP LOCKED`` lets several workers claim
+    jobs concurrently without blocking each other.
+
+    Args:
+        limit (int): Maximum number of jobs to claim
+
+    Returns:
+        list: The claimed jobs, now marked as processing
+    """
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=getattr(settings, 'IMAGE_UPLOAD_STALE_AFTER', 600))
+    due = (
+        Q(status=ImageUploadJob.Status.PENDING, next_attempt_at__lte=now)
+        | Q(status=ImageUploadJob.Status.PROCESSING, updated_at__lt=stale_before)
+    )
+    with transaction.atomic():
+        queryset = ImageUploadJob.objects.filter(due)
+        if connection.features.has_select_for_update_skip_locked:
+            queryset = queryset.select_for_update(skip_locked=True)
+        elif connection.features.has_select_for_update:
+            queryset = queryset.select_for_update()
+        jobs = list(queryset.order_by('next_attempt_at', 'id')[:limit])
+        if jobs:
+            ImageUploadJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                status=ImageUploadJob.Status.PROCESSING,
+                updated_at=now,
+            )
+    return jobs
+
+
+def backoff_delay(attempts):
+    """
+    Get the delay before the next attempt, with exponential backoff.
+
+    Args:
+        attempts (int): Number of attempts made so far
+
+    Returns:
+        timedelta: Time to wait before retrying
+    """
+    base = getattr(settings, 'IMAGE_UPLOAD_RETRY_DELAY', 30)
+    ceiling = getattr(settings, 'IMAGE_UPLOAD_MAX_RETRY_DELAY', 3600)
+    delay = min(ceiling, base * 2 ** (attempts - 1))
+    # Jitter spreads out retries of jobs that failed together
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def process_job(job):
+    """
+    Render and upload a claimed job's image and record the result.
+
+    On success the URLs are stored on the target and the image bytes are
+    cleared. Upload failures are rescheduled with backoff, or marked failed
+    once ``IMAGE_UPLOAD_MAX_ATTEMPTS`` is reached; images that cannot be
+    decoded fail at once.
+
+    A job may disappear while it is processed: deleting its product or
+    image deletes it, and saving a newer image drops it. Its result is then
+    discarded, so an older upload never overwrites a newer image.
+
+    Args:
+        job (ImageUploadJob): A job returned by ``claim_jobs``
+
+    Returns:
+        bool: True if the upload succeeded and was stored
+    """
+    job.attempts += 1
+    try:
+        urls = upload_derivatives(bytes(job.data), job.file_name, job.folder)
+    except Exception as e:
+        logger.warning(f"Upload of {job.file_name} failed (attempt {job.attempts}): {str(e)}")
+        job.last_error = str(e)
+        permanent = isinstance(e, ValueError)
+        with transaction.atomic():
+            if not _lock_claimed_job(job):
+                return False
+            if permanent or job.attempts >= getattr(settings, 'IMAGE_UPLOAD_MAX_ATTEMPTS', 5):
+                job.status = ImageUploadJob.Status.FAILED
+                job.save(update_fields=['attempts', 'last_error', 'status', 'updated_at'])
+                _set_target_status(job, UploadStatus.FAILED)
+            else:
+                job.status = ImageUploadJob.Status.PENDING
+                job.next_attempt_at = timezone.now() + backoff_delay(job.attempts)
+                job.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at', 'updated_at'])
+        return False
+
+    with transaction.atomic():
+        if not _lock_claimed_job(job):
+            return False
+        save_derivatives(job.target, urls)
+        job.status = ImageUploadJob.Status.DONE
+        job.data = b''
+        job.last_error = ''
+        job.save(update_fields=['attempts', 'status', 'data', 'last_error', 'updated_at'])
+    return True
+
+
+def _lock_claimed_job(job):
+    """
+    Lock a job being processed, checking that it is still wanted.
+
+    Deleting the job's target, or saving a newer image for it, deletes the
+    job; the row lock keeps that from happening until the result is stored.
+
+    Args:
+        job (ImageUploadJob): A job returned by ``claim_jobs``
+
+    Returns:
+        bool: False if the job was dropped and its result must be discarded
+    """
+    claimed = (
+        ImageUploadJob.objects.select_for_update()
+        .filter(pk=job.pk, status=ImageUploadJob.Status.PROCESSING)
+        .values_list('pk', flat=True)
+        .first()
+    )
+    if claimed is None:
+        logger.info(f"Upload of {job.file_name} discarded: its image was replaced or deleted")
+        return False
+    return True
+
+
+def _set_target_status(job, status):
+    """Record an upload state on the job's product or product image."""
+    if job.product_image_id:
+        ProductImage.objects.filter(pk=job.product_image_id).update(upload_status=status)
+    elif job.product_id:
+        Product.objects.filter(pk=job.product_id).update(upload_status=status)
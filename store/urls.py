@@ -12,11 +12,29 @@ URL Patterns:
     - /cart/add/<id>/: Add product to cart
     - /cart/remove/<id>/: Remove item from cart
     - /cart/update/<id>/: Update cart item quantity
+    - /cart/update/: Update several cart item quantities at once (JSON)
     - /cart/clear/: Clear cart
+    - /checkout/: Checkout form; places the order
+    - /orders/<id>/: Order confirmation
+    - /search/: Product search results
+    - /search/autocomplete/: Product name suggestions (JSON)
+
+With ``settings.ASYNC_VIEWS`` enabled, the catalog, search and cart pages
+are served by the async views in ``store.async_views`` instead.
 """
 
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+if getattr(settings, 'ASYNC_VIEWS', False):
+    page_views = async_views
+    shop_view = async_views.shop
+    product_detail_view = async_views.product_detail
+else:
+    page_views = views
+    shop_view = views.ProductListView.as_view()
+    product_detail_view = views.ProductDetailView.as_view()
 
 # URL patterns for the store application
 urlpatterns = [
@@ -24,26 +42,38 @@ urlpatterns = [
     path('', views.home, name='home'),
     
     # Product listing page
-    path('shop/', views.ProductListView.as_view(), name='shop'),
+    path('shop/', shop_view, name='shop'),
     
     # Individual product detail page
-    path('product/<int:pk>/', views.ProductDetailView.as_view(), name='product_detail'),
+    path('product/<int:pk>/', product_detail_view, name='product_detail'),
     
     # Shopping cart page
-    path('cart/', views.cart_view, name='cart'),
+    path('cart/', page_views.cart_view, name='cart'),
     
     # Add product to cart
-    path('cart/add/<int:product_id>/', views.add_to_cart, name='add_to_cart'),
+    path('cart/add/<int:product_id>/', page_views.add_to_cart, name='add_to_cart'),
     
     # Remove item from cart
-    path('cart/remove/<int:item_id>/', views.remove_from_cart, name='remove_from_cart'),
+    path('cart/remove/<int:item_id>/', page_views.remove_from_cart, name='remove_from_cart'),
     
     # Update cart item quantity
-    path('cart/update/<int:item_id>/', views.update_cart_item, name='update_cart_item'),
+    path('cart/update/<int:item_id>/', page_views.update_cart_item, name='update_cart_item'),
+    
+    # Update several cart item quantities in one request
+    path('cart/update/', page_views.update_cart_items, name='update_cart_items'),
     
     # Clear cart
-    path('cart/clear/', views.clear_cart, name='clear_cart'),
+    path('cart/clear/', page_views.clear_cart, name='clear_cart'),
+    
+    # Checkout
+    path('checkout/', views.checkout, name='checkout'),
+    
+    # Order confirmation
+    path('orders/<int:pk>/', views.order_confirmation, name='order_confirmation'),
     
     # Search products
-    path('search/', views.search_products, name='search_products'),
+    path('search/', page_views.search_products, name='search_products'),
+    
+    # Product name suggestions for the search box
+    path('search/autocomplete/', views.autocomplete_products, name='autocomplete_products'),
 ]
\ No newline at end of file
@@ -5,12 +5,26 @@ This module contains the view logic for displaying products and handling
 user interactions in the e-commerce platform.
 """
 
-from django.shortcuts import render, get_object_or_404, redirect
+import json
+
+from django.shortcuts import get_object_or_404, render, redirect
+from django.urls import reverse
 from django.contrib import messages
-from .models import Product, Cart, CartItem
+from .models import Order, Product
 from django.views.generic import ListView, DetailView
-from django.http import JsonResponse
-from django.db.models import Q
+from django.conf import settings
+from django.http import Http404, JsonResponse
+from django.core.paginator import Paginator
+from django.db.models import Max
+from .catalog import get_catalog_version
+from .conditional import ConditionalGetMixin
+from .cart import get_cart_storage, get_cart_summary, promote_cart, refresh_cart_summary
+from .forms import CheckoutForm
+from .orders import EmptyCart, OutOfStock, PriceChanged, place_order
+from .search import get_search_backend
+from .autocomplete import get_name_index
+from .pagination import InvalidCursor, estimate_count, paginate_by_cursor
+from .recommendations import get_recommended_products
 
 # Create your views here.
 def home(request):
@@ -25,19 +39,55 @@ def home(request):
     """
     return render(request, 'home.html')
 
-class ProductListView(ListView):
+class ProductListView(ConditionalGetMixin, ListView):
     """
     View for displaying a list of products.
     
     This view displays products in a paginated list, ordered by creation date.
-    Each page shows 12 products.
+    Each page shows 12 products. Pages are revalidated by an ETag derived
+    from the catalog version, so unchanged pages are answered with 304.
+    
+    With ``settings.SHOP_PAGINATION = 'cursor'`` pages are fetched by keyset
+    pagination on ``(created_at, id)`` instead of ``OFFSET``, so every page
+    costs the same regardless of depth. ``settings.SHOP_ESTIMATED_COUNT``
+    additionally shows an approximate product count from planner statistics.
     """
     
     model = Product
     template_name = 'store/shop.html'
     context_object_name = 'products'
     paginate_by = 12  # Show 12 products per page
-    ordering = ['-created_at']  # Order by newest first
+    ordering = ['-created_at', '-id']  # Order by newest first
+
+    def get_etag_key(self):
+        """Any catalog change, or a different page, changes the ETag."""
+        return f"shop|{get_catalog_version()}|{self.request.get_full_path()}"
+
+    def uses_cursor_pagination(self):
+        """Check whether the shop is configured for cursor pagination."""
+        return getattr(settings, 'SHOP_PAGINATION', 'offset') == 'cursor'
+
+    def paginate_queryset(self, queryset, page_size):
+        """
+        Paginate the queryset by cursor when cursor mode is enabled.
+        
+        Returns:
+            tuple: (paginator, page, object_list, is_paginated)
+        """
+        if not self.uses_cursor_pagination():
+            return super().paginate_queryset(queryset, page_size)
+        try:
+            page = paginate_by_cursor(
+                queryset,
+                page_size,
+                after=self.request.GET.get('after'),
+                before=self.request.GET.get('before'),
+            )
+        except InvalidCursor:
+            raise Http404("Invalid page cursor.")
+        if getattr(settings, 'SHOP_ESTIMATED_COUNT', False):
+            page.estimated_count = estimate_count(Product.objects.all())
+        return (None, page, page.object_list, page.has_other_pages())
 
     def get_context_data(self, **kwargs):
         """
@@ -51,20 +101,40 @@ class ProductListView(ListView):
         """
         context = super().get_context_data(**kwargs)
         context['title'] = 'Shop'
+        context['cursor_pagination'] = self.uses_cursor_pagination()
         return context
 
-class ProductDetailView(DetailView):
+class ProductDetailView(ConditionalGetMixin, DetailView):
     """
     View for displaying detailed information about a single product.
     
-    This view shows all product details including its images and
-    related information.
+    This view shows all product details including its images and the
+    products frequently bought with it. ``updated_at`` (which image changes
+    also bump), the stock level and the time its recommendations were last
+    built drive the ETag and Last-Modified validators.
     """
     
     model = Product
     template_name = 'store/product_detail.html'
     context_object_name = 'product'
 
+    def get_etag_key(self):
+        """Look up the product's version with a single narrow query."""
+        self.version = (
+            Product.objects.filter(pk=self.kwargs['pk'])
+            .annotate(recommended_at=Max('recommendations__computed_at'))
+            .values_list('updated_at', 'stock', 'recommended_at')
+            .first()
+        )
+        if self.version is None:
+            # Let DetailView raise the 404
+            return None
+        updated_at, stock, recommended_at = self.version
+        return f"product|{self.kwargs['pk']}|{updated_at.isoformat()}|{stock}|{recommended_at}"
+
+    def get_last_modified(self):
+        return self.version[0]
+
     def get_context_data(self, **kwargs):
         """
         Add additional context data for the template.
@@ -77,108 +147,223 @@ class ProductDetailView(DetailView):
         """
         context = super().get_context_data(**kwargs)
         # Get all images for the product, ordered by their display order
-        context['product_images'] = self.object.images.all()
+        # Images still waiting for their background upload have no URL yet
+        context['product_images'] = self.object.images.exclude(image_url='')
+        context['recommendations'] = get_recommended_products(self.object.pk)
         context['title'] = self.object.name
         return context
 
-def get_or_create_cart(request):
-    """Get the current cart from session or create a new one."""
-    cart_id = request.session.get('cart_id')
-    if cart_id:
-        try:
-            cart = Cart.objects.get(id=cart_id)
-        except Cart.DoesNotExist:
-            cart = Cart.objects.create()
-            request.session['cart_id'] = cart.id
-    else:
-        cart = Cart.objects.create()
-        request.session['cart_id'] = cart.id
-    return cart
+def parse_quantity(value, default=None):
+    """
+    Parse a quantity from request data.
+    
+    Args:
+        value: The submitted value
+        default: Value to use when nothing was submitted
+        
+    Returns:
+        int: The quantity, or None if it is not a whole number
+    """
+    if value in (None, ''):
+        return default
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
 
 def add_to_cart(request, product_id):
     """Add a product to the cart."""
     if request.method == 'POST':
-        product = get_object_or_404(Product, id=product_id)
-        cart = get_or_create_cart(request)
-        quantity = int(request.POST.get('quantity', 1))
+        product_name = Product.objects.filter(id=product_id).values_list('name', flat=True).first()
+        if product_name is None:
+            raise Http404("No Product matches the given query.")
+        quantity = parse_quantity(request.POST.get('quantity'), default=1)
+        if quantity is None or quantity < 1:
+            quantity = 1
         
-        cart_item, created = CartItem.objects.get_or_create(
-            cart=cart,
-            product=product,
-            defaults={'quantity': quantity}
-        )
-        
-        if not created:
-            cart_item.quantity += quantity
-            cart_item.save()
+        get_cart_storage(request).add(product_id, quantity)
+        refresh_cart_summary(request)
         
-        messages.success(request, f"{product.name} added to cart!")
+        messages.success(request, f"{product_name} added to cart!")
         return redirect('cart')
     
-    return redirect('product_detail', product_id=product_id)
+    return redirect('product_detail', pk=product_id)
 
 def remove_from_cart(request, item_id):
     """Remove an item from the cart."""
-    cart = get_or_create_cart(request)
-    cart_item = get_object_or_404(CartItem, id=item_id, cart=cart)
-    product_name = cart_item.product.name
-    cart_item.delete()
+    product_name = get_cart_storage(request).remove(item_id)
+    if product_name is None:
+        raise Http404("No CartItem matches the given query.")
+    refresh_cart_summary(request)
     messages.success(request, f"{product_name} removed from cart!")
     return redirect('cart')
 
 def update_cart_item(request, item_id):
     """Update the quantity of a cart item."""
     if request.method == 'POST':
-        cart = get_or_create_cart(request)
-        cart_item = get_object_or_404(CartItem, id=item_id, cart=cart)
-        quantity = int(request.POST.get('quantity', 1))
-        
-        if quantity > 0:
-            cart_item.quantity = quantity
-            cart_item.save()
-        else:
-            cart_item.delete()
+        quantity = parse_quantity(request.POST.get('quantity'), default=1)
+        if quantity is None:
+            return JsonResponse({'success': False, 'error': 'Invalid quantity'}, status=400)
+        if not get_cart_storage(request).set_quantity(item_id, quantity):
+            raise Http404("No CartItem matches the given query.")
+        summary = refresh_cart_summary(request)
             
         return JsonResponse({
             'success': True,
-            'total_price': cart.total_price,
-            'item_count': cart.item_count
+            'total_price': summary.total_price,
+            'item_count': summary.item_count
         })
     
     return JsonResponse({'success': False}, status=400)
 
+def update_cart_items(request):
+    """
+    Apply several quantity changes to the cart in one request.
+    
+    Expects a JSON body such as ``{"items": {"12": 3, "15": 0}}`` mapping
+    cart item ids to new quantities; a quantity of 0 removes the item. The
+    changes are applied in one transaction: if any item is not in the
+    visitor's cart, nothing is changed.
+    
+    Returns:
+        JsonResponse: The updated cart totals
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False}, status=400)
+    try:
+        items = json.loads(request.body)['items']
+        quantities = {int(item_id): parse_quantity(quantity) for item_id, quantity in items.items()}
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return JsonResponse({'success': False, 'error': 'Invalid request body'}, status=400)
+    if not quantities or None in quantities.values():
+        return JsonResponse({'success': False, 'error': 'Invalid quantity'}, status=400)
+
+    if not get_cart_storage(request).set_quantities(quantities):
+        return JsonResponse({'success': False, 'error': 'Item not in cart'}, status=404)
+    summary = refresh_cart_summary(request)
+
+    return JsonResponse({
+        'success': True,
+        'total_price': summary.total_price,
+        'item_count': summary.item_count
+    })
+
 def clear_cart(request):
     """Clear all items from the cart."""
-    cart = get_or_create_cart(request)
-    cart.items.all().delete()
+    get_cart_storage(request).clear()
+    refresh_cart_summary(request)
     messages.success(request, "Cart cleared!")
     return redirect('cart')
 
 def cart_view(request):
     """Display the cart page."""
-    cart = get_or_create_cart(request)
     return render(request, 'store/cart.html', {
-        'cart': cart,
+        'summary': get_cart_summary(request),
         'title': 'Shopping Cart'
     })
 
+# Session key listing the orders placed in this session
+ORDER_SESSION_KEY = 'order_ids'
+
+def checkout(request):
+    """
+    Collect the customer's details and turn their cart into an order.
+    
+    Stock is reserved for every line when the order is placed; if any
+    product has run out, or the cart's total is no longer the one shown on
+    the checkout page, nothing is ordered and the customer is sent back to
+    the cart.
+    """
+    summary = get_cart_summary(request)
+    if not summary.lines:
+        messages.info(request, "Your cart is empty.")
+        return redirect('cart')
+
+    user = request.user if request.user.is_authenticated else None
+    if request.method == 'POST':
+        form = CheckoutForm(request.POST)
+        if form.is_valid():
+            cart_id = promote_cart(request)
+            try:
+                order = place_order(cart_id, user=user, **form.cleaned_data)
+            except OutOfStock as e:
+                product_name = next(
+                    (line.product.name for line in summary.lines if line.product.pk == e.product_id),
+                    "A product",
+                )
+                messages.error(request, f"{product_name} does not have enough stock left for your order.")
+                return redirect('cart')
+            except PriceChanged:
+                messages.error(request, "Prices in your cart have changed. Please review them before ordering.")
+                return redirect('cart')
+            except EmptyCart:
+                messages.info(request, "Your cart is empty.")
+                return redirect('cart')
+            refresh_cart_summary(request)
+            request.session[ORDER_SESSION_KEY] = request.session.get(ORDER_SESSION_KEY, []) + [order.id]
+            return redirect('order_confirmation', pk=order.pk)
+    else:
+        initial = {'email': user.email, 'full_name': user.get_full_name()} if user else {}
+        form = CheckoutForm(initial={**initial, 'expected_total': summary.total_price})
+
+    return render(request, 'store/checkout.html', {
+        'form': form,
+        'summary': summary,
+        'title': 'Checkout'
+    })
+
+def order_confirmation(request, pk):
+    """Show an order to the session or customer that placed it."""
+    order = get_object_or_404(Order.objects.prefetch_related('lines'), pk=pk)
+    placed_here = order.id in request.session.get(ORDER_SESSION_KEY, [])
+    if not placed_here and not (request.user.is_authenticated and order.user_id == request.user.id):
+        raise Http404("No Order matches the given query.")
+    return render(request, 'store/order_confirmation.html', {
+        'order': order,
+        'title': f'Order {order.id}'
+    })
+
 def search_products(request):
     """
     View for searching products.
     
-    This view handles product search functionality, searching through
-    product names and descriptions using case-insensitive matching.
+    This view hands the query to the configured search backend and shows
+    the relevance-ranked matches 12 per page.
     """
-    query = request.GET.get('query', '')
+    query = request.GET.get('query', '').strip()
+    page_obj = None
     products = []
     
     if query:
-        products = Product.objects.filter(
-            Q(name__icontains=query) | Q(description__icontains=query)
-        ).order_by('-created_at')
+        results = get_search_backend().search(query)
+        paginator = Paginator(results, 12)
+        page_obj = paginator.get_page(request.GET.get('page'))
+        products = page_obj.object_list
     
     return render(request, 'store/search_results.html', {
         'products': products,
+        'page_obj': page_obj,
+        'is_paginated': page_obj is not None and page_obj.has_other_pages(),
         'query': query,
         'title': f'Search Results for "{query}"' if query else 'Search'
     })
+
+def autocomplete_products(request):
+    """
+    Suggest product names for the search box.
+    
+    Answers prefix lookups from the in-memory product name index. The only
+    query is the catalog version check, unless the catalog has changed.
+    
+    Returns:
+        JsonResponse: Up to 8 matching products with their detail URLs
+    """
+    query = request.GET.get('query', '')
+    suggestions = get_name_index().lookup(query, limit=8) if len(query.strip()) >= 2 else []
+    return JsonResponse({
+        'query': query,
+        'results': [
+            {'id': product_id, 'name': name, 'url': reverse('product_detail', args=[product_id])}
+            for product_id, name in suggestions
+        ]
+    })